@@ -45,11 +45,13 @@ INSTALLED_APPS = [
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
 MIDDLEWARE = [
+    'e_clinic_app.middleware.RequestStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'e_clinic_app.middleware.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -115,6 +117,45 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Alias of cache (from CACHES) used by e_clinic_app
+E_CLINIC_CACHE = 'default'
+
+# Time (in seconds) after which cached list of specializations expires, None means it's invalidated only by signals
+SPECIALIZATIONS_CACHE_TIMEOUT = None
+
+# Time (in seconds) after which cached fragments of catalog pages expire (they are also invalidated by signals)
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+# Timeout (in seconds) of cached week schedules of specializations, they're invalidated when terms or visits change
+WEEK_SCHEDULE_CACHE_TIMEOUT = 60 * 60
+# How long (in seconds) clients and proxies may cache responses of availability API
+AVAILABILITY_API_MAX_AGE = 30
+# Number of processes hashing passwords of signups (0 hashes in the request thread) and max number of passwords
+# hashed or waiting in the pool at a time (further signups wait for a free slot)
+PASSWORD_HASHING_WORKERS = 2
+PASSWORD_HASHING_QUEUE = 16
+# Number of threads running database queries of async views (per process), every thread keeps its own connection
+ASYNC_DATABASE_WORKERS = 4
+
+# Request stats (see e_clinic_app.middleware.RequestStatsMiddleware)
+
+# Number of the last requests which stats are kept (per process)
+REQUEST_STATS_WINDOW = 1000
+
+# Number of the slowest queries kept for every request
+REQUEST_STATS_SLOWEST_QUERIES = 5
+
+# If True, stats of every request are logged as json by 'e_clinic_app.request_stats' logger
+REQUEST_STATS_LOG = False
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -129,3 +170,8 @@ try:
 except ModuleNotFoundError:
     print("No database configuration in local_settings.py!")
     exit(0)
+
+# Connections are kept open for a minute (unless local settings say otherwise), so requests and threads running
+# queries of async views don't connect to database every time
+for database in DATABASES.values():
+    database.setdefault('CONN_MAX_AGE', 60)
@@ -22,6 +22,8 @@ from e_clinic_app import views
 from django.contrib.auth import views as auth_views
 
 urlpatterns = [
+    path('admin/request_stats/', admin.site.admin_view(views.RequestStats.as_view()), name="request-stats"),
+    path('admin/report/', admin.site.admin_view(views.Report.as_view()), name="report"),
     path('admin/', admin.site.urls),
     path('', views.LandingPage.as_view(), name="main-page"),
     path('specializations/', views.SpecializationList.as_view(), name="specializations"),
@@ -29,6 +31,7 @@ urlpatterns = [
     path('procedures/', views.ProcedureList.as_view(), name="procedures"),
     path('procedure/<int:pk>/', views.ProcedureDetails.as_view(), name="procedure-detail"),
     path('doctor/<int:pk>/', views.DoctorDetails.as_view(), name="doctor-detail"),
+    path('find_term/', views.FreeTermSearch.as_view(), name="free-term-search"),
     path('register_visit/<int:doc_id>/<str:date>/<str:hour>/', views.VisitAdd.as_view(), name="register_visit"),
 
     path('login/', auth_views.LoginView.as_view(redirect_authenticated_user=True), name="login-page"),
@@ -40,9 +43,22 @@ urlpatterns = [
     path('yourvisits/', views.UserVisits.as_view(), name="user-visits"),
     path('visit/<int:pk>/', views.VisitDetails.as_view(), name="visit-details"),
     path('visit/<int:pk>/cancel/', views.VisitCancel.as_view(), name="visit-cancel"),
+    path('export/visits/', views.VisitExport.as_view(), name="visit-export"),
 
     path('add_term/', views.TermAdd.as_view(), name="add-term"),
     path('add_multiple_term/', views.MultipleTermAdd.as_view(), name="add-multiple-term"),
-    path('cancel_term/<int:pk>/', views.TermCancel.as_view(), name="cancel-term")
+    path('cancel_term/<int:pk>/', views.TermCancel.as_view(), name="cancel-term"),
+
+    path('api/specialization/<int:pk>/availability/', views.SpecializationAvailability.as_view(),
+         name="api-specialization-availability"),
+    path('api/doctor/<int:pk>/availability/', views.DoctorAvailability.as_view(), name="api-doctor-availability"),
+    path('api/report/', views.ReportApi.as_view(), name="api-report"),
+
+    path('async/specialization/<int:pk>/', views.async_specialization_details, name="async-specialization-detail"),
+    path('async/yourvisits/', views.async_user_visits, name="async-user-visits"),
+    path('async/api/specialization/<int:pk>/availability/', views.async_specialization_availability,
+         name="async-api-specialization-availability"),
+    path('async/api/doctor/<int:pk>/availability/', views.async_doctor_availability,
+         name="async-api-doctor-availability"),
 
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
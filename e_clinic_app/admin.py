@@ -8,3 +8,7 @@ admin.site.register(models.Office)
 admin.site.register(models.Procedure)
 admin.site.register(models.Term)
 admin.site.register(models.Visit)
+admin.site.register(models.ScheduleTemplate)
+admin.site.register(models.ArchivedVisit)
+admin.site.register(models.DailyRevenue)
+admin.site.register(models.DailyUtilization)
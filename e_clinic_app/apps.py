@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class EClinicAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'e_clinic_app'
+
+    def ready(self):
+        """Connects signal receivers (f.e. cache invalidation) and registers system checks."""
+        from e_clinic_app import checks, signals  # noqa: F401
@@ -0,0 +1,20 @@
+from django.core.checks import Warning, register
+from django.db import connections
+
+
+@register()
+def check_persistent_connections(app_configs, **kwargs):
+    """
+    Warns if database connections aren't persistent. Async views run queries in threads of a shared pool (see
+    database_sync_to_async), which would open a new connection for every query then.
+    """
+    return [
+        Warning(
+            f"Database '{alias}' has CONN_MAX_AGE = 0, so async views open a new connection for every query.",
+            hint="Set CONN_MAX_AGE of the database to number of seconds (or None for unlimited persistent "
+                 "connections).",
+            id='e_clinic_app.W001',
+        )
+        for alias, database in connections.databases.items()
+        if database.get('CONN_MAX_AGE') == 0
+    ]
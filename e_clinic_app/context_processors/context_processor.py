@@ -1,9 +1,14 @@
-from e_clinic_app.models import Specialization
+from django.utils.functional import SimpleLazyObject
+
+from e_clinic_app.functions.cache_functions import get_specializations
 
 
 def specializations_ctxp(request):
+  """
+  Adds list of specializations (needed by navbar) to context. The list is lazy: cache (or database on cache miss)
+  is touched only when template really uses it.
+  """
   context = {
-    "specializations_ctxp": Specialization.objects.all()
+    "specializations_ctxp": SimpleLazyObject(get_specializations)
   }
   return context
-
@@ -2,9 +2,11 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.db.models import Q
 
 
-from e_clinic_app.models import Visit, Patient, Term
+from e_clinic_app.functions.term_functions import find_colliding_slots, generate_slots, get_dates_between
+from e_clinic_app.models import Visit, Patient, Term, VISIT_TIMES, Specialization, Procedure, Doctor
 from e_clinic_app.validators import person_name_validator
 
 
@@ -85,21 +87,23 @@ class TermAddForm(forms.ModelForm):
         hour_to = data.get('hour_to')
         office = data.get('office')
 
-        if hour_from > hour_to:
+        if None in (date, hour_from, hour_to):
+            return
+
+        if hour_from >= hour_to:
             raise ValidationError(f"End must be after beginning of visit!")
 
         if date.weekday() + 1 == 7:
             raise ValidationError(f"Clinic is closed on Sundays!")
 
-        possible_term = Term.objects.filter(date=date)
-        pt = possible_term.filter(hour_from__lte=hour_from, hour_to__gte=hour_to)
-        pt |= possible_term.filter(hour_from__lte=hour_from, hour_to__gt=hour_from, hour_to__lte=hour_to)
-        pt |= possible_term.filter(hour_from__gte=hour_from, hour_from__lte=hour_to, hour_to__gte=hour_to)
-        pt |= possible_term.filter(hour_from__gte=hour_from, hour_to__lte=hour_to)
-        pt2 = pt.filter(office=office)
-        pt2 |= pt.filter(doctor=self.user.doctor)
+        self.check_collisions(date, hour_from, hour_to, office)
+
+    def check_collisions(self, date, hour_from, hour_to, office):
+        """Validate if new term doesn't intersect with terms of the same office or doctor."""
+        possible_term = Term.objects.filter(date=date).overlapping(hour_from, hour_to)
+        possible_term = possible_term.filter(Q(office=office) | Q(doctor=self.user.doctor))
 
-        if pt2.exists():
+        if possible_term.exists():
             raise ValidationError(f"Office is already occupied in this term!")
 
     class Meta:
@@ -114,8 +118,73 @@ class TermAddForm(forms.ModelForm):
 
 
 class MultipleTermAddForm(TermAddForm):
-    """Is extension of TermAddForm. The form is extended by visit_time field needed to auto add  multiple terms."""
-    visit_time = forms.ChoiceField(choices={(20, "20 minutes"), (30, "30 minutes"), (60, "1 hour")})
+    """
+    Is extension of TermAddForm. The form is extended by visit_time field needed to auto add multiple terms and
+    optional date_to field which allows to repeat the terms every day (except Sundays) until given date.
+    """
+    MAX_DAYS = 62
+
+    visit_time = forms.ChoiceField(choices=VISIT_TIMES)
+    date_to = forms.DateField(
+        required=False, label="Repeat until (optional)", widget=forms.TextInput(attrs={'type': 'date'})
+    )
+
+    def check_collisions(self, date, hour_from, hour_to, office):
+        """
+        Validate all slots generated from the interval at once and list the ones which intersect with terms
+        of the same office or doctor. Generated slots are kept in self.slots.
+        """
+        date_to = self.cleaned_data.get('date_to')
+        visit_time = self.cleaned_data.get('visit_time')
+        if not visit_time:
+            return
+        visit_time = int(visit_time)
+
+        if date_to and date_to < date:
+            raise ValidationError(f"Repeat date must be after the first date!")
+        if date_to and (date_to - date).days >= self.MAX_DAYS:
+            raise ValidationError(f"Terms can be added for up to {self.MAX_DAYS} days at once!")
+
+        self.slots = generate_slots(get_dates_between(date, date_to), hour_from, hour_to, visit_time)
+        if not self.slots:
+            raise ValidationError(f"Visit time is longer than the given hours, no terms can be added!")
+        collisions = find_colliding_slots(self.slots, self.user.doctor, office)
+        if collisions:
+            raise ValidationError([
+                ValidationError(f"Office is already occupied in this term: {day} {slot_from:%H:%M}-{slot_to:%H:%M}")
+                for day, slot_from, slot_to in collisions
+            ])
+
+
+class DateRangeForm(forms.Form):
+    """Takes optional date range."""
+    date_from = forms.DateField(required=False, label="From date", widget=forms.TextInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(required=False, label="To date", widget=forms.TextInput(attrs={'type': 'date'}))
+
+    def clean(self):
+        """Validate if end of date range is after its beginning."""
+        data = super().clean()
+        date_from = data.get('date_from')
+        date_to = data.get('date_to')
+
+        if date_from and date_to and date_to < date_from:
+            raise ValidationError(f"End date must be after start date!")
+        return data
+
+
+class FreeTermSearchForm(DateRangeForm):
+    """Takes optional filters of search of the earliest free term."""
+    specialization = forms.ModelChoiceField(queryset=Specialization.objects.order_by('name'), required=False)
+    procedure = forms.ModelChoiceField(queryset=Procedure.objects.order_by('name'), required=False)
+    doctor = forms.ModelChoiceField(
+        queryset=Doctor.objects.select_related('user').order_by('user__last_name', 'user__first_name'), required=False
+    )
+    field_order = ['specialization', 'procedure', 'doctor', 'date_from', 'date_to']
 
 
+class VisitExportForm(FreeTermSearchForm):
+    """Takes format and optional filters (the same as filters of free term search) of visits export."""
+    format = forms.ChoiceField(choices=[('csv', 'CSV'), ('jsonl', 'JSONL')], required=False)
 
+    def clean_format(self):
+        return self.cleaned_data.get('format') or 'csv'
@@ -0,0 +1,51 @@
+from django.db import router, transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.deletion import Collector
+
+from e_clinic_app.models import ArchivedVisit, Term, Visit
+
+
+def archive_visits(before, batch_size):
+    """
+    Moves at most batch_size visits with terms before the given date (the oldest first) into ArchivedVisit table
+    and deletes them together with their terms, in a single transaction. Returns number of archived visits, 0 means
+    there's nothing left to archive. Interrupted archival can be simply run again: every batch is committed as
+    a whole, and archived visits aren't in Visit table anymore.
+    """
+    with transaction.atomic():
+        visits = list(
+            Visit.objects.filter(date__date__lt=before).select_related('date__office', 'procedure')
+            .order_by('date__date', 'id')[:batch_size]
+        )
+        if not visits:
+            return 0
+
+        ArchivedVisit.objects.bulk_create([
+            ArchivedVisit(
+                visit_id=visit.id, patient_id=visit.patient_id, doctor_id=visit.doctor_id,
+                procedure_id=visit.procedure_id, date=visit.date.date, hour_from=visit.date.hour_from,
+                hour_to=visit.date.hour_to, office_number=visit.date.office.number, price=visit.procedure.price,
+            ) for visit in visits
+        ], ignore_conflicts=True)
+
+        # Loaded visits (with their terms) are deleted directly, so delete signals don't have to query terms again
+        collector = Collector(using=router.db_for_write(Visit))
+        collector.collect(visits)
+        collector.delete()
+        Term.objects.filter(pk__in=[visit.date_id for visit in visits]).delete()
+    return len(visits)
+
+
+def delete_free_terms(before, batch_size):
+    """
+    Deletes at most batch_size terms without visits before the given date in a single transaction. Returns number of
+    deleted terms, 0 means there's nothing left to delete.
+    """
+    with transaction.atomic():
+        term_ids = list(
+            Term.objects.filter(date__lt=before).filter(~Exists(Visit.objects.filter(date=OuterRef('pk'))))
+            .order_by('date', 'hour_from').values_list('id', flat=True)[:batch_size]
+        )
+        if term_ids:
+            Term.objects.filter(pk__in=term_ids).delete()
+    return len(term_ids)
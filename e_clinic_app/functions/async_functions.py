@@ -0,0 +1,85 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+
+from e_clinic_app.middleware import current_recorder
+
+# Pool of threads running database calls of async views, shared by requests of the current process. Threads live as
+# long as the pool, so every thread keeps its own connection open between calls (for CONN_MAX_AGE seconds) and
+# number of connections is limited by ASYNC_DATABASE_WORKERS.
+database_executor = None
+database_executor_lock = threading.Lock()
+database_workers = 0
+
+
+def count_database_worker():
+    """Counts threads started by the pool, so each of them can be reached when the pool is closed."""
+    global database_workers
+    with database_executor_lock:
+        database_workers += 1
+
+
+def get_database_executor():
+    """Returns pool of ASYNC_DATABASE_WORKERS threads for database calls of async views, created on first use."""
+    global database_executor
+    with database_executor_lock:
+        if database_executor is None:
+            database_executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ASYNC_DATABASE_WORKERS', 4), thread_name_prefix='async-database',
+                initializer=count_database_worker
+            )
+        return database_executor
+
+
+def close_database_executor():
+    """
+    Closes connections of all threads of the pool and shuts it down (next call creates a new one). Threads wait for
+    each other, so every thread closes its own connections (f.e. before test database is dropped).
+    """
+    global database_executor, database_workers
+    with database_executor_lock:
+        executor, workers = database_executor, database_workers
+        database_executor, database_workers = None, 0
+    if executor is None:
+        return
+    if workers:
+        barrier = threading.Barrier(workers)
+
+        def close_connections():
+            connections.close_all()
+            barrier.wait()
+
+        for _ in range(workers):
+            executor.submit(close_connections)
+    executor.shutdown(wait=True)
+
+
+def database_sync_to_async(function):
+    """
+    Wraps function which uses database, so it can be awaited in async views. Unlike default sync_to_async, calls
+    are not serialized in one thread, so independent queries awaited together (f.e. with asyncio.gather) run
+    concurrently in threads of the shared pool (see get_database_executor). Connections of the threads are reused
+    and closed according to CONN_MAX_AGE, like in request threads, so persistent connections are needed (see
+    e_clinic_app.checks). Queries are recorded by RequestStatsMiddleware of the current request.
+    """
+    def run(recorder, *args, **kwargs):
+        close_old_connections()
+        try:
+            if recorder is None:
+                return function(*args, **kwargs)
+            with connection.execute_wrapper(recorder):
+                return function(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        call = functools.partial(run, current_recorder.get(), *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(get_database_executor(), call)
+
+    return wrapper
+
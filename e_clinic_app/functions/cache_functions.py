@@ -0,0 +1,131 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from e_clinic_app.functions.schedule_functions import (
+    build_week_schedule, normalize_dates, week_schedule_from_data, week_schedule_to_data
+)
+from e_clinic_app.models import Doctor, Specialization, Term
+
+SPECIALIZATIONS_CACHE_KEY = 'e_clinic:specializations'
+CATALOG_VERSION_CACHE_KEY = 'e_clinic:catalog_version'
+WEEK_SCHEDULE_CACHE_KEY = 'e_clinic:week_schedule:{specialization_id}:{week_start}'
+WEEK_SCHEDULE_STATS_CACHE_KEY = 'e_clinic:week_schedule_stats:{name}'
+
+
+def get_cache():
+    """Returns cache selected by E_CLINIC_CACHE setting (cache alias from CACHES)."""
+    return caches[getattr(settings, 'E_CLINIC_CACHE', 'default')]
+
+
+def get_specializations():
+    """Returns list of all specializations (ordered by name) from cache. Database is queried only on cache miss."""
+    cache = get_cache()
+    specializations = cache.get(SPECIALIZATIONS_CACHE_KEY)
+    if specializations is None:
+        specializations = list(Specialization.objects.order_by('name'))
+        cache.set(SPECIALIZATIONS_CACHE_KEY, specializations, getattr(settings, 'SPECIALIZATIONS_CACHE_TIMEOUT', None))
+    return specializations
+
+
+def invalidate_specializations():
+    """Removes list of specializations from cache. Called by signals after specialization is saved or deleted."""
+    get_cache().delete(SPECIALIZATIONS_CACHE_KEY)
+
+
+def get_catalog_version():
+    """
+    Returns version of public catalog (specializations, procedures and doctors) which is timestamp of its last change.
+    Version is a part of keys of cached catalog fragments and it's used for conditional GET (ETag, Last-Modified).
+    """
+    cache = get_cache()
+    version = cache.get(CATALOG_VERSION_CACHE_KEY)
+    if version is None:
+        version = time.time()
+        cache.add(CATALOG_VERSION_CACHE_KEY, version, None)
+    return version
+
+
+def bump_catalog_version():
+    """Changes catalog version, so cached fragments are not used anymore. Called by signals after catalog changes."""
+    get_cache().set(CATALOG_VERSION_CACHE_KEY, time.time(), None)
+
+
+def catalog_etag(request, *args, **kwargs):
+    """Returns ETag of catalog page. Page contains user specific navbar, so ETag depends on user too."""
+    return f"{get_catalog_version()}-{request.user.pk or 'anonymous'}"
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    """Returns date and time of the last change of catalog."""
+    return datetime.datetime.fromtimestamp(get_catalog_version(), tz=datetime.timezone.utc)
+
+
+def get_week_start(date):
+    """Returns date of monday of the week which contains the given date."""
+    return date - datetime.timedelta(days=date.weekday())
+
+
+def count_week_schedule_cache(name):
+    """Increments counter of week schedule cache hits or misses (shared by all processes which use the cache)."""
+    cache = get_cache()
+    key = WEEK_SCHEDULE_STATS_CACHE_KEY.format(name=name)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def get_week_schedule_stats():
+    """Returns dictionary with numbers of week schedule cache hits and misses."""
+    cache = get_cache()
+    return {name: cache.get(WEEK_SCHEDULE_STATS_CACHE_KEY.format(name=name), 0) for name in ('hits', 'misses')}
+
+
+def get_week_schedule(specialization, doctors, dates, now=None):
+    """
+    Returns week schedule (see build_week_schedule) of specialization's doctors. Terms of the week are taken from cache
+    (keyed by specialization and week), so database is queried only on cache miss or when some doctor is not cached
+    yet. Cache stores plain data only, values which depend on user or time of request are computed for each request.
+    """
+    doctors = list(doctors)
+    dates = normalize_dates(dates)
+    if not dates:
+        return build_week_schedule(doctors, dates, now)
+
+    cache = get_cache()
+    key = WEEK_SCHEDULE_CACHE_KEY.format(specialization_id=specialization.id, week_start=get_week_start(dates[0]))
+    data = cache.get(key)
+    if data is not None and all(doctor.id in data for doctor in doctors):
+        count_week_schedule_cache('hits')
+        return week_schedule_from_data(doctors, data, now)
+
+    count_week_schedule_cache('misses')
+    schedule = build_week_schedule(doctors, dates, now)
+    cache.set(key, week_schedule_to_data(schedule), getattr(settings, 'WEEK_SCHEDULE_CACHE_TIMEOUT', None))
+    return schedule
+
+
+def invalidate_week_schedules(doctor_id, dates):
+    """
+    Removes cached week schedules which contain terms of the doctor in the given dates (only weeks of these dates and
+    only specializations of the doctor). Called by signals after term or visit is saved or deleted. Weeks before
+    the current one can't be displayed, so changes of older terms (f.e. archival) don't query database at all.
+    Dates may be strings if term was created by form.
+    """
+    current_week_start = get_week_start(datetime.date.today())
+    week_starts = {get_week_start(Term._meta.get_field('date').to_python(date)) for date in dates}
+    week_starts = {week_start for week_start in week_starts if week_start >= current_week_start}
+    if not week_starts:
+        return
+
+    specialization_ids = Doctor.specializations.through.objects.filter(
+        doctor_id=doctor_id
+    ).values_list('specialization_id', flat=True)
+    get_cache().delete_many([
+        WEEK_SCHEDULE_CACHE_KEY.format(specialization_id=specialization_id, week_start=week_start)
+        for specialization_id in specialization_ids for week_start in week_starts
+    ])
@@ -34,5 +34,11 @@ def get_week_start_and_end(week_offset=0):
     return offset_monday, offset_saturday
 
 
+def get_week_dates(week_offset=0):
+    """Returns list of dates (from monday to saturday) of the week selected by week_offset."""
+    start, end = get_week_start_and_end(week_offset)
+    return [start.date() + timedelta(days=n) for n in range((end - start).days + 1)]
+
+
 if __name__ == '__main__':
     print(get_week_start_and_end(1))
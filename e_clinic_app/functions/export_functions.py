@@ -0,0 +1,90 @@
+import csv
+import json
+from itertools import chain
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Value
+from django.db.models.functions import Concat
+
+from e_clinic_app.functions.import_functions import get_chunks
+from e_clinic_app.models import ArchivedVisit, Doctor, Visit
+
+EXPORT_FIELDS = [
+    'visit_id', 'date', 'hour_from', 'hour_to', 'doctor', 'patient', 'procedure', 'price', 'office', 'archived'
+]
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+# Number of rows fetched from database (and written to output) at a time
+EXPORT_CHUNK_SIZE = 2000
+
+
+def get_full_name(person):
+    """Returns expression concatenating first and last name of user of the person (path to Doctor or Patient)."""
+    return Concat(f'{person}__user__first_name', Value(' '), f'{person}__user__last_name')
+
+
+def filter_visits(visits, date_field, specialization=None, procedure=None, doctor=None, date_from=None, date_to=None):
+    """Filters visits (or archived visits) by date range (of date_field), doctor, specialization and procedure."""
+    if date_from:
+        visits = visits.filter(**{f'{date_field}__gte': date_from})
+    if date_to:
+        visits = visits.filter(**{f'{date_field}__lte': date_to})
+    if doctor:
+        visits = visits.filter(doctor=doctor)
+    if specialization:
+        visits = visits.filter(doctor_id__in=Doctor.specializations.through.objects.filter(
+            specialization=specialization
+        ).values('doctor_id'))
+    if procedure:
+        visits = visits.filter(procedure=procedure)
+    return visits
+
+
+def get_visit_rows(chunk_size=EXPORT_CHUNK_SIZE, **filters):
+    """
+    Generates rows (tuples of EXPORT_FIELDS values) of archived and then current visits matching filters, ordered by
+    date and hour. Rows are fetched with .iterator() in chunks (with server-side cursor on PostgreSQL) as plain
+    values, so memory use doesn't grow with number of exported visits.
+    """
+    archived_visits = filter_visits(ArchivedVisit.objects.all(), 'date', **filters).order_by(
+        'date', 'hour_from', 'id'
+    ).values_list(
+        'visit_id', 'date', 'hour_from', 'hour_to', get_full_name('doctor'), get_full_name('patient'),
+        'procedure__name', 'price', 'office_number', Value(True)
+    )
+    visits = filter_visits(Visit.objects.all(), 'date__date', **filters).order_by(
+        'date__date', 'date__hour_from', 'id'
+    ).values_list(
+        'id', 'date__date', 'date__hour_from', 'date__hour_to', get_full_name('doctor'), get_full_name('patient'),
+        'procedure__name', 'procedure__price', 'date__office__number', Value(False)
+    )
+    return chain(archived_visits.iterator(chunk_size=chunk_size), visits.iterator(chunk_size=chunk_size))
+
+
+class Echo:
+    """Pseudo-buffer for csv.writer, which returns written line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def to_csv(rows, fields, chunk_size=EXPORT_CHUNK_SIZE):
+    """Generates CSV file (header and then chunks of lines) of rows, without keeping it in memory."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for chunk in get_chunks(rows, chunk_size):
+        yield ''.join(writer.writerow(row) for row in chunk)
+
+
+def to_jsonl(rows, fields, chunk_size=EXPORT_CHUNK_SIZE):
+    """Generates JSONL file (chunks of lines with one object per row) of rows, without keeping it in memory."""
+    for chunk in get_chunks(rows, chunk_size):
+        yield ''.join(json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder) + '\n' for row in chunk)
+
+
+def export_visits(file_format, chunk_size=EXPORT_CHUNK_SIZE, **filters):
+    """Generates chunks of CSV or JSONL file with visits matching filters (see get_visit_rows)."""
+    writer = to_csv if file_format == 'csv' else to_jsonl
+    return writer(get_visit_rows(chunk_size, **filters), EXPORT_FIELDS, chunk_size)
@@ -0,0 +1,248 @@
+import csv
+import json
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from e_clinic_app.functions.cache_functions import bump_catalog_version
+from e_clinic_app.models import (
+    Doctor, IDENTIFICATION, Patient, Procedure, Specialization, TITLES, update_primary_specializations
+)
+from e_clinic_app.validators import (
+    default_error_messages, person_name_validator, phone_error_messages, pwz_error_messages, validate_pesels,
+    validate_phone_numbers, validate_pwz_numbers
+)
+
+REQUIRED_FIELDS = {
+    'patient': ['username', 'first_name', 'last_name', 'email', 'pesel', 'identification_type', 'phone_number'],
+    'doctor': ['username', 'first_name', 'last_name', 'email', 'pesel', 'pwz', 'title_or_degree'],
+}
+UNIQUE_FIELDS = {
+    'patient': ['username', 'pesel', 'phone_number'],
+    'doctor': ['username', 'pesel', 'pwz'],
+}
+REQUIRED_MESSAGE = "This field is required."
+MALFORMED_MESSAGE = "Malformed row: {error}"
+# Names of specializations and procedures of doctor in CSV file are separated by semicolons
+NAMES_SEPARATOR = ';'
+
+
+class MalformedRow(dict):
+    """
+    Row of file which can't be read (f.e. invalid JSON line), with its line number, raw content and error. It's empty
+    dictionary, so it's passed along with other rows, but it's always rejected (see validate_people).
+    """
+
+    def __init__(self, line_number, content, error):
+        super().__init__()
+        self.line_number = line_number
+        self.content = content
+        self.error = MALFORMED_MESSAGE.format(error=error)
+
+
+def read_rows(path, file_format=None):
+    """
+    Generates rows (dictionaries) of CSV file (with header) or JSONL file (one object per line) one by one, so files
+    of any size can be imported. Format is taken from file extension if it's not given. Lines which can't be read
+    as rows are generated as MalformedRow, so they are rejected without stopping the import.
+    """
+    file_format = file_format or Path(path).suffix.lstrip('.').lower()
+    with open(path, newline='', encoding='utf-8') as file:
+        if file_format == 'csv':
+            reader = csv.DictReader(file)
+            for row in reader:
+                if None in row:
+                    yield MalformedRow(reader.line_num, row, "more values than columns in header.")
+                else:
+                    yield row
+        elif file_format in ('jsonl', 'json'):
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as error:
+                    yield MalformedRow(line_number, line.rstrip('\r\n'), f"invalid JSON ({error.msg}).")
+                    continue
+                if isinstance(row, dict):
+                    yield row
+                else:
+                    yield MalformedRow(line_number, line.rstrip('\r\n'), "JSON object expected.")
+        else:
+            raise ValueError(f"Unsupported file format: {file_format}")
+
+
+def get_reject(number, row, errors):
+    """Returns record of rejects file with number of the row (and line of malformed row), its data and errors."""
+    if isinstance(row, MalformedRow):
+        return {'row': number, 'line': row.line_number, 'data': row.content, 'errors': errors}
+    return {'row': number, 'data': row, 'errors': errors}
+
+
+def get_chunks(rows, size):
+    """Generates lists of at most size consecutive rows."""
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def get_value(row, field):
+    """Returns value of the field as stripped string ('' if it's missing)."""
+    value = row.get(field)
+    return '' if value is None else str(value).strip()
+
+
+def get_names(row, field):
+    """Returns list of names (of specializations or procedures) from list or from semicolon separated string."""
+    value = row.get(field) or []
+    if isinstance(value, str):
+        value = value.split(NAMES_SEPARATOR)
+    return [name.strip() for name in value if name.strip()]
+
+
+def add_batch_errors(errors, rows, field, batch_validator, error_messages):
+    """Validates the field of all rows with batch validator and adds errors of invalid values."""
+    indexes = [index for index, row in enumerate(rows) if field not in errors[index]]
+    codes = batch_validator([get_value(rows[index], field) for index in indexes])
+    for index, code in zip(indexes, codes):
+        if code:
+            errors[index][field] = error_messages[code]
+
+
+def add_uniqueness_errors(errors, rows, field, queryset):
+    """
+    Adds errors to rows whose (otherwise valid) value of the field is already taken by existing object. Queryset is
+    filtered with one query for all rows.
+    """
+    values = {index: get_value(row, field) for index, row in enumerate(rows) if field not in errors[index]}
+    taken = queryset.filter(**{f'{field}__in': set(values.values())}).values_list(field, flat=True)
+    taken = {str(value) for value in taken}
+    for index, value in values.items():
+        if value in taken:
+            errors[index][field] = f"Value {value} is already taken."
+
+
+def add_duplicate_errors(errors, rows, fields):
+    """
+    Adds errors to valid rows which repeat value of unique field of previous valid row of the chunk. Rejected rows
+    don't take values, so the first valid row with the value is imported.
+    """
+    taken = {field: set() for field in fields}
+    for index, row in enumerate(rows):
+        if errors[index]:
+            continue
+        for field in fields:
+            if get_value(row, field) in taken[field]:
+                errors[index][field] = f"Value {get_value(row, field)} is repeated in the file."
+        if not errors[index]:
+            for field in fields:
+                taken[field].add(get_value(row, field))
+
+
+def add_choice_errors(errors, rows, field, choices):
+    """Adds errors to rows whose value of the field isn't one of the choices (integers)."""
+    valid_values = {str(value) for value, _ in choices}
+    for index, row in enumerate(rows):
+        if field not in errors[index] and get_value(row, field) not in valid_values:
+            errors[index][field] = f"Choose one of: {', '.join(sorted(valid_values))}."
+
+
+def add_names_errors(errors, rows, field, model):
+    """Adds errors to rows with names (of specializations or procedures) which don't exist. Returns name -> id dict."""
+    names = {name for row in rows for name in get_names(row, field)}
+    ids = dict(model.objects.filter(name__in=names).values_list('name', 'id'))
+    for index, row in enumerate(rows):
+        unknown = [name for name in get_names(row, field) if name not in ids]
+        if unknown:
+            errors[index][field] = f"Unknown names: {', '.join(unknown)}."
+    return ids
+
+
+def validate_people(kind, rows):
+    """
+    Validates chunk of rows with patients or doctors (kind is 'patient' or 'doctor'). Identifiers are checked with
+    batch validators and uniqueness with one query per unique field for the whole chunk. Returns list of errors
+    (dictionaries field -> message, empty for valid rows) and dictionary with ids of specializations and procedures
+    (by name) used by the rows. Malformed rows get only 'row' error.
+    """
+    indexes = [index for index, row in enumerate(rows) if not isinstance(row, MalformedRow)]
+    errors = [{'row': row.error} if isinstance(row, MalformedRow) else {} for row in rows]
+    row_errors, ids = validate_rows(kind, [rows[index] for index in indexes])
+    for index, error in zip(indexes, row_errors):
+        errors[index] = error
+    return errors, ids
+
+
+def validate_rows(kind, rows):
+    """Validates well-formed rows of the chunk (see validate_people)."""
+    errors = [{} for _ in rows]
+    for index, row in enumerate(rows):
+        for field in REQUIRED_FIELDS[kind]:
+            if not get_value(row, field):
+                errors[index][field] = REQUIRED_MESSAGE
+        for field, validator in [('first_name', person_name_validator), ('last_name', person_name_validator),
+                                 ('username', User.username_validator), ('email', validate_email)]:
+            if field not in errors[index]:
+                try:
+                    validator(get_value(row, field))
+                except ValidationError as error:
+                    errors[index][field] = ' '.join(error.messages)
+
+    model = Patient if kind == 'patient' else Doctor
+    add_batch_errors(errors, rows, 'pesel', validate_pesels, default_error_messages)
+    add_uniqueness_errors(errors, rows, 'username', User.objects.all())
+    add_uniqueness_errors(errors, rows, 'pesel', model.objects.all())
+    ids = {}
+    if kind == 'patient':
+        add_batch_errors(errors, rows, 'phone_number', validate_phone_numbers, phone_error_messages)
+        add_uniqueness_errors(errors, rows, 'phone_number', Patient.objects.all())
+        add_choice_errors(errors, rows, 'identification_type', IDENTIFICATION)
+    else:
+        add_batch_errors(errors, rows, 'pwz', validate_pwz_numbers, pwz_error_messages)
+        add_uniqueness_errors(errors, rows, 'pwz', Doctor.objects.all())
+        add_choice_errors(errors, rows, 'title_or_degree', TITLES)
+        ids['specializations'] = add_names_errors(errors, rows, 'specializations', Specialization)
+        ids['procedures'] = add_names_errors(errors, rows, 'procedures', Procedure)
+    add_duplicate_errors(errors, rows, UNIQUE_FIELDS[kind])
+    return errors, ids
+
+
+def create_people(kind, rows, password_hashes, ids):
+    """
+    Creates users, patients or doctors (with links to their specializations and procedures) of valid rows with bulk
+    inserts, in a single transaction. Bulk inserts don't send signals, so primary specializations of doctors are
+    updated and cached catalog fragments are invalidated here.
+    """
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(username=get_value(row, 'username'), first_name=get_value(row, 'first_name'),
+                 last_name=get_value(row, 'last_name'), email=get_value(row, 'email'), password=password_hash)
+            for row, password_hash in zip(rows, password_hashes)
+        ])
+        if kind == 'patient':
+            Patient.objects.bulk_create([
+                Patient(user=user, pesel=get_value(row, 'pesel'), phone_number=get_value(row, 'phone_number'),
+                        identification_type=int(get_value(row, 'identification_type')))
+                for row, user in zip(rows, users)
+            ])
+            return
+
+        doctors = Doctor.objects.bulk_create([
+            Doctor(user=user, pesel=get_value(row, 'pesel'), pwz=int(get_value(row, 'pwz')),
+                   title_or_degree=int(get_value(row, 'title_or_degree')))
+            for row, user in zip(rows, users)
+        ])
+        Doctor.specializations.through.objects.bulk_create([
+            Doctor.specializations.through(doctor=doctor, specialization_id=ids['specializations'][name])
+            for row, doctor in zip(rows, doctors) for name in set(get_names(row, 'specializations'))
+        ])
+        Doctor.procedures.through.objects.bulk_create([
+            Doctor.procedures.through(doctor=doctor, procedure_id=ids['procedures'][name])
+            for row, doctor in zip(rows, doctors) for name in set(get_names(row, 'procedures'))
+        ])
+        update_primary_specializations(Doctor.objects.filter(pk__in=[doctor.pk for doctor in doctors]))
+    bump_catalog_version()
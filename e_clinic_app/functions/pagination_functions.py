@@ -0,0 +1,60 @@
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+CURSOR_SEPARATOR = '_'
+
+
+def get_field_value(obj, field):
+    """Gets value of (possibly related, f.e. 'date__hour_from') field of object."""
+    return reduce(getattr, field.split('__'), obj)
+
+
+def get_model_field(model, field):
+    """Gets model field of (possibly related, f.e. 'date__hour_from') field path."""
+    *relations, name = field.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def decode_cursor(model, cursor, fields):
+    """
+    Returns values of fields (converted to Python types by model fields) from cursor string, or None if cursor is
+    missing or invalid (f.e. edited by user).
+    """
+    values = cursor.split(CURSOR_SEPARATOR) if cursor else []
+    if len(values) != len(fields):
+        return None
+    try:
+        values = [get_model_field(model, field).to_python(value) for field, value in zip(fields, values)]
+    except (ValidationError, ValueError, TypeError):
+        return None
+    return None if None in values else values
+
+
+def encode_cursor(obj, fields):
+    """Makes cursor string (f.e. '2022-07-08_08:00:00_15') from values of fields of the last object on the page."""
+    return CURSOR_SEPARATOR.join(str(get_field_value(obj, field)) for field in fields)
+
+
+def keyset_page(queryset, fields, cursor=None, size=20, descending=False):
+    """
+    Returns page of objects (list) which are after the cursor in order of given fields and cursor of the next page
+    (None if it's the last page). Instead of OFFSET it uses "seek" condition on the fields (which should end with
+    unique one, f.e. 'id'), so deep pages are as fast as the first one. Invalid cursor is treated as no cursor.
+    """
+    queryset = queryset.order_by(*(f'-{field}' if descending else field for field in fields))
+
+    values = decode_cursor(queryset.model, cursor, fields)
+    if values:
+        lookup = 'lt' if descending else 'gt'
+        condition = Q()
+        for n, field in enumerate(fields):
+            condition |= Q(**dict(zip(fields[:n], values[:n])), **{f'{field}__{lookup}': values[n]})
+        queryset = queryset.filter(condition)
+    objects = list(queryset[:size + 1])
+
+    next_cursor = encode_cursor(objects[size - 1], fields) if len(objects) > size else None
+    return objects[:size], next_cursor
@@ -0,0 +1,76 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+# Pool shared by requests of the current process, created on first use (so every WSGI worker has its own)
+hashing_pool = None
+hashing_pool_lock = threading.Lock()
+hashing_slots = None
+
+
+def create_hashing_pool(workers=None):
+    """
+    Creates pool of worker processes for password hashing. Hashing (PBKDF2) is CPU bound, so threads would be
+    serialized by GIL. Workers are spawned (forking a process with running threads isn't safe) and set Django up, so
+    they use PASSWORD_HASHERS setting of the project.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=django.setup)
+
+
+def hash_passwords(passwords, pool=None):
+    """
+    Returns list of password hashes computed in the pool of worker processes (or in the current process if pool is
+    None). Empty passwords get unusable password hashes, like in User.set_unusable_password.
+    """
+    passwords = [password or None for password in passwords]
+    if pool is None:
+        return [make_password(password) for password in passwords]
+    return list(pool.map(make_password, passwords))
+
+
+def get_hashing_pool():
+    """
+    Returns pool of PASSWORD_HASHING_WORKERS processes shared by requests of the current process and semaphore
+    limiting number of passwords in the pool to PASSWORD_HASHING_QUEUE. Returns (None, None) if the setting is 0.
+    """
+    global hashing_pool, hashing_slots
+    workers = getattr(settings, 'PASSWORD_HASHING_WORKERS', 0)
+    if not workers:
+        return None, None
+    with hashing_pool_lock:
+        if hashing_pool is None:
+            hashing_pool = create_hashing_pool(workers)
+            hashing_slots = threading.BoundedSemaphore(getattr(settings, 'PASSWORD_HASHING_QUEUE', workers))
+    return hashing_pool, hashing_slots
+
+
+def reset_hashing_pool():
+    """Shuts the shared pool down, next hashing creates a new one."""
+    global hashing_pool
+    with hashing_pool_lock:
+        if hashing_pool is not None:
+            hashing_pool.shutdown(wait=False)
+        hashing_pool = None
+
+
+def hash_password(password):
+    """
+    Returns hash of the password computed in the shared pool, the request thread just waits for the result without
+    holding GIL. When the pool is full, the thread waits for a free slot, so spikes of signups can't queue unlimited
+    work. Password is hashed in the current thread if the pool is disabled or broken (f.e. worker was killed).
+    """
+    pool, slots = get_hashing_pool()
+    if pool is None:
+        return make_password(password)
+    with slots:
+        try:
+            return pool.submit(make_password, password).result()
+        except BrokenProcessPool:
+            reset_hashing_pool()
+            return make_password(password)
@@ -0,0 +1,130 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Func, Min, Sum, Window
+from django.db.models.functions import Cast, Rank, TruncMonth
+
+from e_clinic_app.functions.export_functions import get_full_name
+from e_clinic_app.models import ArchivedVisit, DailyRevenue, DailyUtilization, Term, Visit
+
+REVENUE_GROUPS = {
+    'doctor': ('doctor_id', get_full_name('doctor')),
+    'procedure': ('procedure_id', F('procedure__name')),
+    'specialization': ('specialization_id', F('specialization__name')),
+}
+UTILIZATION_GROUPS = {
+    'doctor': ('doctor_id', get_full_name('doctor')),
+    'office': ('office_id', F('office__number')),
+}
+
+
+class WindowSum(Func):
+    """SUM window function over aggregated values (aggregate Sum can't take another aggregate as its argument)."""
+    function = 'SUM'
+    window_compatible = True
+
+
+def aggregate_revenue(date_from, date_to):
+    """
+    Returns dictionary (date, doctor id, procedure id) -> [primary specialization id, visits, revenue] with revenue
+    of current and archived visits of the days, aggregated by database (one grouped query per table).
+    """
+    current = Visit.objects.filter(date__date__range=(date_from, date_to)).values_list(
+        'date__date', 'doctor_id', 'procedure_id', 'doctor__primary_specialization'
+    ).annotate(Count('id'), Sum('procedure__price'))
+    archived = ArchivedVisit.objects.filter(date__range=(date_from, date_to)).values_list(
+        'date', 'doctor_id', 'procedure_id', 'doctor__primary_specialization'
+    ).annotate(Count('id'), Sum('price'))
+
+    # Day can have both current and archived visits only while it's being archived
+    revenue = defaultdict(lambda: [None, 0, 0])
+    for date, doctor_id, procedure_id, specialization_id, visits, total in [*current, *archived]:
+        row = revenue[date, doctor_id, procedure_id]
+        row[0] = specialization_id
+        row[1] += visits
+        row[2] += total
+    return revenue
+
+
+def build_daily_rollups(date_from, date_to):
+    """
+    Recomputes rollups of days from date_from to date_to (both included) in a single transaction: rollups of the days
+    are deleted and inserted again from grouped queries. Utilization is recomputed only from the oldest existing term
+    on, because "archive_past" command deletes past terms, and rollups of archived days have to be kept.
+    Returns numbers of revenue and utilization rollups.
+    """
+    utilization_from = max(date_from, Term.objects.aggregate(Min('date'))['date__min'] or date_from)
+
+    with transaction.atomic():
+        DailyRevenue.objects.filter(date__range=(date_from, date_to)).delete()
+        revenue = DailyRevenue.objects.bulk_create([
+            DailyRevenue(date=date, doctor_id=doctor_id, procedure_id=procedure_id, specialization_id=specialization_id,
+                         visits=visits, revenue=total)
+            for (date, doctor_id, procedure_id), (specialization_id, visits, total)
+            in aggregate_revenue(date_from, date_to).items()
+        ])
+
+        DailyUtilization.objects.filter(date__range=(utilization_from, date_to)).delete()
+        utilization = DailyUtilization.objects.bulk_create([
+            DailyUtilization(date=date, doctor_id=doctor_id, office_id=office_id, terms=terms, booked=booked)
+            for date, doctor_id, office_id, terms, booked in Term.objects.filter(
+                date__range=(utilization_from, date_to)
+            ).values_list('date', 'doctor_id', 'office_id').annotate(Count('id'), Count('visit'))
+        ])
+    return len(revenue), len(utilization)
+
+
+def filter_dates(rollups, date_from=None, date_to=None):
+    """Filters rollups by optional date range."""
+    if date_from:
+        rollups = rollups.filter(date__gte=date_from)
+    if date_to:
+        rollups = rollups.filter(date__lte=date_to)
+    return rollups
+
+
+def get_revenue_report(group_by, date_from=None, date_to=None):
+    """
+    Returns revenue per month and doctor, procedure or specialization (group_by) from daily rollups, ordered by month
+    and revenue. Rows are dictionaries with month, id (group_id) and name of the group, visits and revenue. Total
+    revenue of the month, rank in the month and running total of the group (since the first month) are computed by
+    window functions, so the whole report is a single query.
+    """
+    group_id, group_name = REVENUE_GROUPS[group_by]
+    return list(filter_dates(DailyRevenue.objects.all(), date_from, date_to).values(
+        month=TruncMonth('date'), group_id=F(group_id), name=group_name
+    ).annotate(
+        # Annotations named like fields replace them in later expressions, so they're added last
+        month_revenue=Window(WindowSum(Sum('revenue')), partition_by=[TruncMonth('date')]),
+        rank=Window(Rank(), partition_by=[TruncMonth('date')], order_by=Sum('revenue').desc()),
+        running_revenue=Window(WindowSum(Sum('revenue')), partition_by=[F(group_id)],
+                               order_by=TruncMonth('date').asc()),
+        visits=Sum('visits'),
+        revenue=Sum('revenue'),
+    ).order_by('month', 'rank', 'group_id'))
+
+
+def get_utilization_report(group_by, date_from=None, date_to=None):
+    """
+    Returns utilization of terms (booked / all terms) of doctors or offices (group_by) from daily rollups, ordered
+    by utilization. Rows are dictionaries with id (group_id) and name of the group, terms, booked terms, utilization
+    and rank.
+    """
+    group_id, group_name = UTILIZATION_GROUPS[group_by]
+    utilization = Cast(Sum('booked'), FloatField()) / Sum('terms')
+    return list(filter_dates(DailyUtilization.objects.all(), date_from, date_to).values(
+        group_id=F(group_id), name=group_name
+    ).annotate(
+        utilization=utilization,
+        rank=Window(Rank(), order_by=utilization.desc()),
+        terms=Sum('terms'),
+        booked=Sum('booked'),
+    ).order_by('rank', 'group_id'))
+
+
+def get_report(date_from=None, date_to=None):
+    """Returns dictionary with revenue and utilization reports of all groups, for the optional date range."""
+    return {
+        'revenue': {group: get_revenue_report(group, date_from, date_to) for group in REVENUE_GROUPS},
+        'utilization': {group: get_utilization_report(group, date_from, date_to) for group in UTILIZATION_GROUPS},
+    }
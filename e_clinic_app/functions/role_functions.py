@@ -0,0 +1,90 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ObjectDoesNotExist
+
+from e_clinic_app.functions.cache_functions import get_cache
+
+ROLE_SESSION_KEY = '_e_clinic_role'
+ROLE_VERSION_CACHE_KEY = 'e_clinic:role_version:{user_id}'
+
+
+def get_user_role(user):
+    """
+    Returns (role, profile id) of the user: ('doctor', doctor id), ('patient', patient id) or ('', None) for anonymous
+    users and users without profile (f.e. admins). Both reverse one-to-one relations are checked with a single query.
+    """
+    if not user.is_authenticated:
+        return '', None
+
+    doctor_id, patient_id = User.objects.filter(pk=user.pk).values_list('doctor', 'patient').get()
+    if doctor_id:
+        return 'doctor', doctor_id
+    if patient_id:
+        return 'patient', patient_id
+    return '', None
+
+
+def get_role_version(user_id):
+    """
+    Returns version of role of the user, which is timestamp of the last creation or deletion of user's profile.
+    Roles cached in sessions with other version are resolved again.
+    """
+    cache = get_cache()
+    key = ROLE_VERSION_CACHE_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        version = time.time()
+        cache.add(key, version, None)
+    return version
+
+
+def bump_role_version(user_id):
+    """Changes version of role of the user. Called by signals after Doctor or Patient is created or deleted."""
+    get_cache().set(ROLE_VERSION_CACHE_KEY.format(user_id=user_id), time.time(), None)
+
+
+def cache_role(request, user):
+    """
+    Resolves role of the user and stores it in the session (together with id of the user it belongs to and version
+    of the role).
+    """
+    if user.is_authenticated:
+        version = get_role_version(user.pk)
+        role, profile_id = get_user_role(user)
+        request.session[ROLE_SESSION_KEY] = [user.pk, role, profile_id, version]
+        return role, profile_id
+    return get_user_role(user)
+
+
+def resolve_role(request):
+    """
+    Returns (role, profile id) of the request user. Role is cached in the session (after login), so database is
+    queried once per session instead of on every role check. Role is resolved again when user's profile is created
+    or deleted (see get_role_version).
+    """
+    if not hasattr(request, '_cached_role'):
+        cached = request.session.get(ROLE_SESSION_KEY)
+        if request.user.is_authenticated and cached and cached[0] == request.user.pk and \
+                cached[3:] == [get_role_version(request.user.pk)]:
+            request._cached_role = (cached[1], cached[2])
+        else:
+            request._cached_role = cache_role(request, request.user)
+    return request._cached_role
+
+
+def get_profile(request):
+    """
+    Returns Doctor or Patient object of the request user (or None). It's cached on the user object. If the profile
+    was deleted since the role was cached (f.e. version of the role was bumped in cache of another process), role is
+    resolved again.
+    """
+    role, _ = resolve_role(request)
+    if not role:
+        return None
+    try:
+        return getattr(request.user, role)
+    except ObjectDoesNotExist:
+        request._cached_role = cache_role(request, request.user)
+        role, _ = request._cached_role
+        return getattr(request.user, role) if role else None
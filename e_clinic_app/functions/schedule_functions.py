@@ -0,0 +1,101 @@
+import datetime
+
+from e_clinic_app.models import Term
+
+
+def normalize_dates(dates):
+    """Converts datetime objects (f.e. returned by get_week_start_and_end) into plain dates."""
+    return [date.date() if isinstance(date, datetime.datetime) else date for date in dates]
+
+
+def build_week_schedule(doctors, dates, now=None):
+    """
+    Builds doctor x day grid of terms for the given doctors and dates in a constant number of queries (one for
+    doctors and one for terms) no matter how many doctors and terms there are. Returns dictionary with doctors as keys
+    and list of days (list of terms ordered by hour) as values. Terms are annotated by
+    TermQuerySet.with_availability (for the same "now" snapshot), so the template doesn't have to query database.
+    """
+    doctors = list(doctors)
+    dates = normalize_dates(dates)
+    schedule = {doctor: [[] for _ in dates] for doctor in doctors}
+
+    if not doctors or not dates:
+        return schedule
+
+    doctors_by_id = {doctor.id: doctor for doctor in doctors}
+    day_index = {date: index for index, date in enumerate(dates)}
+    terms = Term.objects.filter(
+        doctor__in=doctors_by_id.keys(), date__in=dates
+    ).with_availability(now).order_by('date', 'hour_from')
+
+    for term in terms:
+        doctor = doctors_by_id[term.doctor_id]
+        term.doctor = doctor
+        schedule[doctor][day_index[term.date]].append(term)
+
+    return schedule
+
+
+def week_schedule_to_data(schedule):
+    """
+    Converts week schedule (see build_week_schedule) into plain data which can be cached: dictionary with doctor ids
+    as keys and list of days (list of (id, date, hour_from, hour_to, office_id, visit_id) tuples) as values. Values
+    which depend on user or on time of request (f.e. if term is from the past) are not stored.
+    """
+    return {
+        doctor.id: [
+            [(term.id, term.date, term.hour_from, term.hour_to, term.office_id, term.visit_id) for term in day]
+            for day in days
+        ]
+        for doctor, days in schedule.items()
+    }
+
+
+def week_schedule_from_data(doctors, data, now=None):
+    """
+    Rebuilds week schedule of the given doctors from data returned by week_schedule_to_data without querying
+    database. Terms get the same attributes as ones annotated by TermQuerySet.with_availability, "is_past" is
+    computed for the given "now" snapshot.
+    """
+    now = now or datetime.datetime.now()
+    schedule = {}
+    for doctor in doctors:
+        schedule[doctor] = []
+        for day in data[doctor.id]:
+            terms = []
+            for term_id, date, hour_from, hour_to, office_id, visit_id in day:
+                term = Term(id=term_id, date=date, hour_from=hour_from, hour_to=hour_to, doctor=doctor,
+                            office_id=office_id)
+                term.visit_id = visit_id
+                term.is_booked = visit_id is not None
+                term.is_past = term.is_from_past(now)
+                terms.append(term)
+            schedule[doctor].append(terms)
+    return schedule
+
+
+def get_minutes(time):
+    """Returns number of minutes from midnight to the given time."""
+    return time.hour * 60 + time.minute
+
+
+def week_schedule_to_columns(schedule, dates):
+    """
+    Converts week schedule (see build_week_schedule) into compact, json serializable data for API clients. Terms of
+    every doctor are stored in columns (lists of the same length): term ids, indexes of days in "dates" list, start
+    and end as minutes from midnight and booked flags.
+    """
+    dates = normalize_dates(dates)
+    doctors = []
+    for doctor, days in schedule.items():
+        terms = [(index, term) for index, day in enumerate(days) for term in day]
+        doctors.append({
+            'id': doctor.id,
+            'name': f"{doctor.get_title_or_degree_display()} {doctor.name}",
+            'term_ids': [term.id for _, term in terms],
+            'days': [index for index, _ in terms],
+            'starts': [get_minutes(term.hour_from) for _, term in terms],
+            'ends': [get_minutes(term.hour_to) for _, term in terms],
+            'booked': [term.is_booked for _, term in terms],
+        })
+    return {'dates': [date.isoformat() for date in dates], 'doctors': doctors}
@@ -0,0 +1,96 @@
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Subquery
+
+from e_clinic_app.functions.cache_functions import invalidate_week_schedules
+from e_clinic_app.models import Doctor, Term, Visit
+
+
+def get_dates_between(date_from, date_to=None):
+    """Generates list of dates from date_from to date_to (both included) without Sundays, when clinic is closed."""
+    date_to = date_to or date_from
+    dates = (date_from + datetime.timedelta(days=n) for n in range((date_to - date_from).days + 1))
+    return [date for date in dates if date.weekday() != 6]
+
+
+def generate_slots(dates, hour_from, hour_to, visit_time):
+    """
+    Splits hour_from - hour_to interval of every date into consecutive slots visit_time minutes long. Returns list of
+    (date, slot_hour_from, slot_hour_to) tuples. The remainder of interval shorter than visit_time is skipped.
+    """
+    day_hour_from = datetime.datetime.combine(datetime.date.today(), hour_from)
+    day_hour_to = datetime.datetime.combine(datetime.date.today(), hour_to)
+    slots_count = int((day_hour_to - day_hour_from).total_seconds() / 60.0 / visit_time)
+    hours = [(day_hour_from + datetime.timedelta(minutes=n * visit_time)).time() for n in range(slots_count + 1)]
+
+    return [(date, hours[n], hours[n + 1]) for date in dates for n in range(slots_count)]
+
+
+def find_colliding_slots(slots, doctor, office):
+    """
+    Checks all slots against terms of the doctor or in the office with a single query. Returns list of slots which
+    intersect with already existing terms.
+    """
+    if not slots:
+        return []
+
+    dates = {date for date, _, _ in slots}
+    min_hour = min(hour_from for _, hour_from, _ in slots)
+    max_hour = max(hour_to for _, _, hour_to in slots)
+    existing = Term.objects.filter(date__in=dates).overlapping(min_hour, max_hour).filter(
+        Q(office=office) | Q(doctor=doctor)
+    ).values_list('date', 'hour_from', 'hour_to')
+
+    existing_by_date = defaultdict(list)
+    for date, hour_from, hour_to in existing:
+        existing_by_date[date].append((hour_from, hour_to))
+
+    return [
+        (date, hour_from, hour_to) for date, hour_from, hour_to in slots
+        if any(term_from < hour_to and term_to > hour_from for term_from, term_to in existing_by_date[date])
+    ]
+
+
+def create_terms(slots, doctor, office):
+    """
+    Creates Term objects for all slots with bulk insert in a single transaction. Bulk insert doesn't send post_save
+    signals, so cached week schedules of the doctor are invalidated here.
+    """
+    with transaction.atomic():
+        terms = Term.objects.bulk_create([
+            Term(date=date, hour_from=hour_from, hour_to=hour_to, office=office, doctor=doctor)
+            for date, hour_from, hour_to in slots
+        ])
+    invalidate_week_schedules(doctor.id, {date for date, _, _ in slots})
+    return terms
+
+
+def find_earliest_free_term(specialization=None, procedure=None, doctor=None, date_from=None, date_to=None, now=None):
+    """
+    Returns the earliest future term without visit (or None) of doctors matching given filters, within optional
+    date range. It's a single query: terms are scanned in (date, hour_from) index order and the first one without
+    a visit (anti-join on unique Visit.date) is returned, so the cost doesn't grow with number of weeks ahead.
+    """
+    now = now or datetime.datetime.now()
+    date_from = max(date_from, now.date()) if date_from else now.date()
+
+    terms = Term.objects.filter(date__gte=date_from).exclude(date=now.date(), hour_from__lt=now.time())
+    if date_to:
+        terms = terms.filter(date__lte=date_to)
+    if doctor:
+        terms = terms.filter(doctor=doctor)
+    # Subqueries (instead of joins) let database scan terms in index order and stop at the first match
+    if specialization:
+        terms = terms.filter(doctor_id__in=Doctor.specializations.through.objects.filter(
+            specialization=specialization
+        ).values('doctor_id'))
+    if procedure:
+        terms = terms.filter(doctor_id__in=Doctor.procedures.through.objects.filter(
+            procedure=procedure
+        ).values('doctor_id'))
+
+    terms = terms.filter(~Exists(Visit.objects.filter(date=OuterRef('pk')))).order_by('date', 'hour_from')
+    # Search is a subquery, so joins needed to display the term don't change its plan
+    return Term.objects.filter(pk=Subquery(terms.values('pk')[:1])).select_related('doctor__user', 'office').first()
@@ -0,0 +1,22 @@
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from e_clinic_app.models import Term, Visit
+
+TERM_TAKEN_MESSAGE = "This term has already been taken. Please choose another one."
+
+
+def book_visit(patient, doctor, term, procedure):
+    """
+    Creates Visit object on the term as an atomic operation. Term row is locked (on backends which support
+    SELECT ... FOR UPDATE) until the end of transaction, and the unique constraint on Visit.date guarantees that only
+    one of concurrent bookings wins. Raises ValidationError if the term is already booked or is from the past.
+    """
+    try:
+        with transaction.atomic():
+            term = Term.objects.select_for_update().get(pk=term.pk)
+            if not term.is_available():
+                raise ValidationError(TERM_TAKEN_MESSAGE, code='taken')
+            return Visit.objects.create(patient=patient, doctor=doctor, date=term, procedure=procedure)
+    except IntegrityError:
+        raise ValidationError(TERM_TAKEN_MESSAGE, code='taken')
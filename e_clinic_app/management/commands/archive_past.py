@@ -0,0 +1,32 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from e_clinic_app.functions.archive_functions import archive_visits, delete_free_terms
+
+
+class Command(BaseCommand):
+    """
+    Keeps Term and Visit tables limited to the active horizon: visits older than given number of days are moved
+    to ArchivedVisit table and past terms without visits are deleted. Work is done in batches, each in its own
+    transaction, so transactions stay small and interrupted command continues where it stopped when run again.
+    It's meant to be run periodically (f.e. daily by cron).
+    """
+    help = "Archives past visits and deletes past free terms older than the given number of days."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help="Number of past days to keep in Visit and Term.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Number of rows moved in one transaction.")
+
+    def handle(self, *args, **options):
+        before = datetime.date.today() - datetime.timedelta(days=options['days'])
+        archived = deleted = 0
+
+        while batch := archive_visits(before, options['batch_size']):
+            archived += batch
+        while batch := delete_free_terms(before, options['batch_size']):
+            deleted += batch
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived} visits and deleted {deleted} free terms before {before}."
+        ))
@@ -0,0 +1,28 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from e_clinic_app.functions.report_functions import build_daily_rollups
+
+
+class Command(BaseCommand):
+    """
+    Recomputes daily revenue and utilization rollups (see DailyRevenue and DailyUtilization) of recent past days and
+    of upcoming days, which can still change because of new visits and cancellations. It's meant to be run
+    periodically (f.e. daily by cron, before "archive_past"), rollups of older days stay untouched.
+    """
+    help = "Recomputes daily revenue and utilization rollups of recent and upcoming days."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help="Number of past days to recompute.")
+        parser.add_argument('--ahead', type=int, default=28, help="Number of upcoming days to recompute.")
+
+    def handle(self, *args, **options):
+        today = datetime.date.today()
+        date_from = today - datetime.timedelta(days=options['days'])
+        date_to = today + datetime.timedelta(days=options['ahead'])
+        revenue, utilization = build_daily_rollups(date_from, date_to)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Built {revenue} revenue and {utilization} utilization rollups from {date_from} to {date_to}."
+        ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from e_clinic_app.forms import VisitExportForm
+from e_clinic_app.functions.export_functions import export_visits
+
+
+class Command(BaseCommand):
+    """
+    Exports visits (archived and current ones) matching filters to CSV or JSONL file (or standard output). Filters
+    are validated like filters of the export view. Visits are fetched and written in chunks, so memory use doesn't
+    depend on number of exported visits.
+    """
+    help = "Exports visits matching filters as CSV or JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv', help="Format of exported file.")
+        parser.add_argument('--output', help="Output file (by default standard output).")
+        parser.add_argument('--date-from', help="Export visits from this date (YYYY-MM-DD).")
+        parser.add_argument('--date-to', help="Export visits to this date (YYYY-MM-DD).")
+        parser.add_argument('--doctor', type=int, help="Id of doctor.")
+        parser.add_argument('--specialization', type=int, help="Id of specialization.")
+        parser.add_argument('--procedure', type=int, help="Id of procedure.")
+
+    def handle(self, *args, **options):
+        fields = ['format', 'date_from', 'date_to', 'doctor', 'specialization', 'procedure']
+        form = VisitExportForm({field: options[field] for field in fields if options[field] is not None})
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+
+        filters = form.cleaned_data
+        chunks = export_visits(filters.pop('format'), **filters)
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        with open(options['output'], 'w', newline='', encoding='utf-8') as file:
+            file.writelines(chunks)
+        self.stdout.write(self.style.SUCCESS(f"Visits exported to {options['output']}."))
@@ -0,0 +1,40 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from e_clinic_app.functions.term_functions import create_terms, find_colliding_slots, generate_slots
+from e_clinic_app.models import ScheduleTemplate
+
+
+class Command(BaseCommand):
+    """
+    Generates terms from schedule templates for a rolling horizon. Command is incremental and idempotent: it inserts
+    only terms for dates after the last run and skips slots which collide with already existing terms.
+    It's meant to be run periodically (f.e. daily by cron).
+    """
+    help = "Generates terms from schedule templates for the given number of days ahead."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=28, help="Number of days ahead to generate terms for.")
+
+    def handle(self, *args, **options):
+        horizon = datetime.date.today() + datetime.timedelta(days=options['days'])
+        created = skipped = 0
+
+        for template in ScheduleTemplate.objects.select_related('doctor', 'office'):
+            dates = template.dates_to_generate(horizon)
+            slots = generate_slots(dates, template.hour_from, template.hour_to, template.visit_time)
+            collisions = set(find_colliding_slots(slots, template.doctor, template.office))
+            new_slots = [slot for slot in slots if slot not in collisions]
+
+            with transaction.atomic():
+                create_terms(new_slots, template.doctor, template.office)
+                if template.generated_until is None or template.generated_until < horizon:
+                    template.generated_until = horizon
+                    template.save(update_fields=['generated_until'])
+
+            created += len(new_slots)
+            skipped += len(collisions)
+
+        self.stdout.write(self.style.SUCCESS(f"Created {created} terms, skipped {skipped} colliding slots."))
@@ -0,0 +1,77 @@
+import json
+import os
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from e_clinic_app.functions.import_functions import create_people, get_chunks, get_reject, read_rows, validate_people
+from e_clinic_app.functions.password_functions import create_hashing_pool, hash_passwords
+
+
+class Command(BaseCommand):
+    """
+    Imports patients or doctors (users with their profiles, specializations and procedures) from CSV or JSONL file.
+    File is streamed in chunks: every chunk is validated with batch validators and a few queries, passwords are hashed
+    in a pool of worker processes and rows are inserted with bulk inserts in one transaction.
+    Rows which are not valid or can't be read are written to the rejects file (JSONL with row number, row and errors).
+    After every chunk number of processed rows is saved in the checkpoint file, so interrupted import continues where
+    it stopped when run again (rows of a chunk committed just before interruption are rejected as duplicates).
+    """
+    help = "Imports patients or doctors from CSV or JSONL file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['patient', 'doctor'], help="Kind of imported people.")
+        parser.add_argument('path', help="CSV (with header) or JSONL file.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="File format (by default file extension).")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Number of rows imported in one transaction.")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Number of processes hashing passwords (by default number of CPUs).")
+        parser.add_argument('--rejects', help="File for rejected rows (by default <path>.rejects.jsonl).")
+        parser.add_argument('--checkpoint', help="Checkpoint file (by default <path>.checkpoint).")
+
+    def handle(self, *args, **options):
+        kind, path = options['kind'], Path(options['path'])
+        if not path.exists():
+            raise CommandError(f"File {path} doesn't exist.")
+        rejects_path = Path(options['rejects'] or f"{path}.rejects.jsonl")
+        checkpoint_path = Path(options['checkpoint'] or f"{path}.checkpoint")
+
+        progress = {'processed': 0, 'imported': 0, 'rejected': 0}
+        if checkpoint_path.exists():
+            progress = json.loads(checkpoint_path.read_text())
+            self.stdout.write(f"Resuming import after {progress['processed']} rows.")
+
+        rows = islice(read_rows(path, options['format']), progress['processed'], None)
+        with create_hashing_pool(options['workers']) as pool, \
+                open(rejects_path, 'a' if progress['processed'] else 'w', encoding='utf-8') as rejects:
+            for chunk in get_chunks(rows, options['batch_size']):
+                errors, ids = validate_people(kind, chunk)
+                valid_rows = [row for row, row_errors in zip(chunk, errors) if not row_errors]
+                if valid_rows:
+                    password_hashes = hash_passwords([row.get('password') for row in valid_rows], pool)
+                    create_people(kind, valid_rows, password_hashes, ids)
+
+                for number, (row, row_errors) in enumerate(zip(chunk, errors), start=progress['processed'] + 1):
+                    if row_errors:
+                        rejects.write(json.dumps(get_reject(number, row, row_errors)) + '\n')
+                rejects.flush()
+
+                progress['processed'] += len(chunk)
+                progress['imported'] += len(valid_rows)
+                progress['rejected'] += len(chunk) - len(valid_rows)
+                self.save_checkpoint(checkpoint_path, progress)
+                self.stdout.write(f"Processed {progress['processed']} rows.")
+
+        checkpoint_path.unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {progress['imported']} {kind}s, rejected {progress['rejected']} rows"
+            f"{f' (see {rejects_path})' if progress['rejected'] else ''}."
+        ))
+
+    @staticmethod
+    def save_checkpoint(checkpoint_path, progress):
+        """Replaces checkpoint file atomically, so it's never left half written."""
+        temporary_path = checkpoint_path.with_name(f"{checkpoint_path.name}.tmp")
+        temporary_path.write_text(json.dumps(progress))
+        os.replace(temporary_path, checkpoint_path)
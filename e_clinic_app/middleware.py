@@ -0,0 +1,160 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connection
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+
+from e_clinic_app.functions.role_functions import get_profile, resolve_role
+
+logger = logging.getLogger('e_clinic_app.request_stats')
+
+# Recorder of the current request. Async views (also served by WSGI) run queries in worker threads (see
+# database_sync_to_async), which have their own connections, so the recorder is passed to them in context.
+current_recorder = ContextVar('current_recorder', default=None)
+
+
+class RequestStatsStore:
+    """
+    In-process ring buffer with stats of the last requests (size set by REQUEST_STATS_WINDOW setting).
+    Every process (worker) keeps its own stats.
+    """
+
+    def __init__(self, window=1000):
+        self.records = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def add(self, record):
+        with self.lock:
+            self.records.append(record)
+
+    def clear(self):
+        with self.lock:
+            self.records.clear()
+
+    def summary(self, slowest=5):
+        """
+        Returns list of stats grouped by url name (ordered by total time): number of requests, total and db time,
+        number of queries, duplicated queries (same sql and params) and similar queries (same sql, f.e. N+1 problem)
+        and the slowest queries.
+        """
+        with self.lock:
+            records = list(self.records)
+
+        summary = {}
+        for record in records:
+            stats = summary.setdefault(record['url_name'], {
+                'url_name': record['url_name'], 'requests': 0, 'total_ms': 0.0, 'db_ms': 0.0,
+                'queries': 0, 'duplicates': 0, 'similar': 0, 'slowest_queries': [],
+            })
+            stats['requests'] += 1
+            for field in ('total_ms', 'db_ms', 'queries', 'duplicates', 'similar'):
+                stats[field] += record[field]
+            stats['slowest_queries'] = sorted(
+                stats['slowest_queries'] + record['slowest_queries'], key=lambda query: query[0], reverse=True
+            )[:slowest]
+
+        for stats in summary.values():
+            stats['avg_ms'] = stats['total_ms'] / stats['requests']
+            stats['avg_queries'] = stats['queries'] / stats['requests']
+        return sorted(summary.values(), key=lambda stats: stats['total_ms'], reverse=True)
+
+
+request_stats = RequestStatsStore(getattr(settings, 'REQUEST_STATS_WINDOW', 1000))
+
+
+class QueryRecorder:
+    """Database execute wrapper which records sql, params and duration of every query."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, repr(params), (time.perf_counter() - start) * 1000))
+
+
+class RequestStatsMiddleware:
+    """
+    Records time of request, time spent in database, number of queries, duplicated and similar queries and
+    the slowest queries of every request, grouped by url name. Stats are kept in request_stats store and (if
+    REQUEST_STATS_LOG setting is True) logged as json by 'e_clinic_app.request_stats' logger.
+    Middleware supports both WSGI and ASGI. In async requests only queries run by database_sync_to_async are recorded.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Marks the middleware as coroutine function, the same way as Django's MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(recorder):
+                response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.record(request, response, recorder, (time.perf_counter() - start) * 1000)
+        return response
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        self.record(request, response, recorder, (time.perf_counter() - start) * 1000)
+        return response
+
+    def record(self, request, response, recorder, total_ms):
+        """Method adds stats of the request to request_stats store (and logs them if enabled)."""
+        resolver_match = getattr(request, 'resolver_match', None)
+        sql_counter = Counter(sql for sql, _, _ in recorder.queries)
+        query_counter = Counter((sql, params) for sql, params, _ in recorder.queries)
+        record = {
+            'url_name': resolver_match.view_name if resolver_match else '<unresolved>',
+            'status': response.status_code,
+            'total_ms': total_ms,
+            'db_ms': sum(duration for _, _, duration in recorder.queries),
+            'queries': len(recorder.queries),
+            'duplicates': sum(count - 1 for count in query_counter.values()),
+            'similar': sum(count - 1 for count in sql_counter.values()),
+            'slowest_queries': sorted(
+                ((duration, sql) for sql, _, duration in recorder.queries), reverse=True
+            )[:getattr(settings, 'REQUEST_STATS_SLOWEST_QUERIES', 5)],
+        }
+        request_stats.add(record)
+
+        if getattr(settings, 'REQUEST_STATS_LOG', False):
+            logger.info(json.dumps(record))
+
+
+class RoleMiddleware(MiddlewareMixin):
+    """
+    Adds lazy request.role ('doctor', 'patient' or '' for other users) and request.profile (Doctor or Patient object
+    of the user, or None), so views and templates don't look up reverse one-to-one relations of the user (a query for
+    every lookup which misses). Role is cached in the session. Must be placed after AuthenticationMiddleware.
+    """
+
+    def process_request(self, request):
+        request.role = SimpleLazyObject(lambda: resolve_role(request)[0])
+        request.profile = SimpleLazyObject(lambda: get_profile(request))
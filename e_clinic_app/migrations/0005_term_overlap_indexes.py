@@ -0,0 +1,44 @@
+# Generated by Django 4.0.6 on 2026-10-17 17:09
+
+from django.db import migrations, models
+
+OFFICE_OVERLAP_CONSTRAINT = 'term_office_no_overlap'
+
+
+def add_office_overlap_constraint(apps, schema_editor):
+    """
+    On PostgreSQL adds exclusion constraint which doesn't allow to save two intersecting terms in the same office,
+    even if they are inserted concurrently. Other backends rely on TermAddForm validation only.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        f'ALTER TABLE e_clinic_app_term ADD CONSTRAINT {OFFICE_OVERLAP_CONSTRAINT} EXCLUDE USING gist '
+        f'(office_id WITH =, tsrange(date + hour_from, date + hour_to) WITH &&)'
+    )
+
+
+def remove_office_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'ALTER TABLE e_clinic_app_term DROP CONSTRAINT IF EXISTS {OFFICE_OVERLAP_CONSTRAINT}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_clinic_app', '0004_auto_20220708_2302'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='term',
+            index=models.Index(fields=['date', 'office', 'hour_from'], name='term_date_office_hour_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='term',
+            index=models.Index(fields=['date', 'doctor', 'hour_from'], name='term_date_doctor_hour_idx'),
+        ),
+        migrations.RunPython(add_office_overlap_constraint, remove_office_overlap_constraint),
+    ]
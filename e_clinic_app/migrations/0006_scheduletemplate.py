@@ -0,0 +1,30 @@
+# Generated by Django 4.0.6 on 2026-10-17 17:13
+
+import datetime
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_clinic_app', '0005_term_overlap_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.IntegerField(choices=[(1, 'Monday'), (2, 'Tuesday'), (3, 'Wednesday'), (4, 'Thursday'), (5, 'Friday'), (6, 'Saturday')], verbose_name='Weekday')),
+                ('hour_from', models.TimeField(verbose_name='From hour')),
+                ('hour_to', models.TimeField(verbose_name='To hour')),
+                ('visit_time', models.IntegerField(choices=[(20, '20 minutes'), (30, '30 minutes'), (60, '1 hour')], verbose_name='Visit time')),
+                ('valid_from', models.DateField(default=datetime.date.today, verbose_name='Valid from')),
+                ('valid_to', models.DateField(blank=True, null=True, verbose_name='Valid to')),
+                ('generated_until', models.DateField(blank=True, editable=False, null=True, verbose_name='Terms generated until')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='e_clinic_app.doctor', verbose_name='Doctor')),
+                ('office', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='e_clinic_app.office', verbose_name='Office')),
+            ],
+        ),
+    ]
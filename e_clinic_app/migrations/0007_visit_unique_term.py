@@ -0,0 +1,17 @@
+# Generated by Django 4.0.6 on 2026-10-17 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_clinic_app', '0006_scheduletemplate'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='visit',
+            constraint=models.UniqueConstraint(fields=('date',), name='visit_unique_term'),
+        ),
+    ]
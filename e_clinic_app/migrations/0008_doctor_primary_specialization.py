@@ -0,0 +1,29 @@
+# Generated by Django 4.0.6 on 2026-10-17 17:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_primary_specializations(apps, schema_editor):
+    """Sets primary specialization (the one with the lowest id) of all existing doctors."""
+    Doctor = apps.get_model('e_clinic_app', 'Doctor')
+    first_specialization = Doctor.specializations.through.objects.filter(
+        doctor=models.OuterRef('pk')
+    ).order_by('specialization_id').values('specialization_id')[:1]
+    Doctor.objects.update(primary_specialization=models.Subquery(first_specialization))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_clinic_app', '0007_visit_unique_term'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='primary_specialization',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='e_clinic_app.specialization', verbose_name='Primary specialization'),
+        ),
+        migrations.RunPython(backfill_primary_specializations, migrations.RunPython.noop),
+    ]
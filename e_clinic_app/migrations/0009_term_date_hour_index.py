@@ -0,0 +1,17 @@
+# Generated by Django 4.0.6 on 2026-10-17 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_clinic_app', '0008_doctor_primary_specialization'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='term',
+            index=models.Index(fields=['date', 'hour_from'], name='term_date_hour_idx'),
+        ),
+    ]
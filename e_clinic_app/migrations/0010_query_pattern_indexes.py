@@ -0,0 +1,46 @@
+# Generated by Django 4.0.6 on 2026-10-17 18:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_clinic_app', '0009_term_date_hour_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='term',
+            index=models.Index(fields=['doctor', 'date', 'hour_from'], name='term_doctor_date_hour_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visit',
+            index=models.Index(fields=['patient', 'date'], name='visit_patient_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visit',
+            index=models.Index(fields=['doctor', 'date'], name='visit_doctor_date_idx'),
+        ),
+        migrations.AlterField(
+            model_name='term',
+            name='doctor',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='e_clinic_app.doctor', verbose_name='Doctor'),
+        ),
+        migrations.AlterField(
+            model_name='visit',
+            name='date',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='e_clinic_app.term', verbose_name='Visit term'),
+        ),
+        migrations.AlterField(
+            model_name='visit',
+            name='doctor',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='e_clinic_app.doctor', verbose_name='Doctor'),
+        ),
+        migrations.AlterField(
+            model_name='visit',
+            name='patient',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='e_clinic_app.patient', verbose_name='Patient'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.0.6 on 2026-10-17 18:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_clinic_app', '0010_query_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedVisit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('visit_id', models.IntegerField(unique=True, verbose_name='Id of archived visit')),
+                ('date', models.DateField(verbose_name="Day's date")),
+                ('hour_from', models.TimeField(verbose_name='From hour')),
+                ('hour_to', models.TimeField(verbose_name='To hour')),
+                ('office_number', models.IntegerField(verbose_name='Office Number')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=6, verbose_name='treatment price')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Archived at')),
+                ('doctor', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='e_clinic_app.doctor', verbose_name='Doctor')),
+                ('patient', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='e_clinic_app.patient', verbose_name='Patient')),
+                ('procedure', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='e_clinic_app.procedure', verbose_name='Chosen treatment')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedvisit',
+            index=models.Index(fields=['patient', 'date'], name='archivedvisit_patient_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedvisit',
+            index=models.Index(fields=['doctor', 'date'], name='archivedvisit_doctor_date_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.0.6 on 2026-10-17 18:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_clinic_app', '0011_archivedvisit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyUtilization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name="Day's date")),
+                ('terms', models.IntegerField(verbose_name='Number of terms')),
+                ('booked', models.IntegerField(verbose_name='Number of booked terms')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='e_clinic_app.doctor', verbose_name='Doctor')),
+                ('office', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='e_clinic_app.office', verbose_name='Office')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name="Day's date")),
+                ('visits', models.IntegerField(verbose_name='Number of visits')),
+                ('revenue', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Revenue')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='e_clinic_app.doctor', verbose_name='Doctor')),
+                ('procedure', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='e_clinic_app.procedure', verbose_name='Treatment')),
+                ('specialization', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='e_clinic_app.specialization', verbose_name='Primary specialization')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailyutilization',
+            constraint=models.UniqueConstraint(fields=('date', 'doctor', 'office'), name='dailyutilization_unique_day'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrevenue',
+            constraint=models.UniqueConstraint(fields=('date', 'doctor', 'procedure'), name='dailyrevenue_unique_day'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.0.6 on 2026-10-17 18:59
+
+from django.db import migrations, models
+import e_clinic_app.validators
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('e_clinic_app', '0012_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='patient',
+            name='phone_number',
+            field=models.CharField(max_length=15, unique=True, validators=[e_clinic_app.validators.phone_regex_validator], verbose_name='phone number'),
+        ),
+    ]
@@ -4,7 +4,10 @@ from django.contrib.auth.models import User, AbstractUser
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import BooleanField, Exists, ExpressionWrapper, OuterRef, Q, Subquery
+from django.urls import reverse
 
+from e_clinic_app.functions.datetime_functions import WEEKDAYS
 from e_clinic_app.validators import phone_regex_validator, pesel_validator, pwz_validator, date_validator
 
 IDENTIFICATION = [
@@ -20,6 +23,12 @@ TITLES = [
     (5, "prof. dr hab. n. med.")
 ]
 
+VISIT_TIMES = [
+    (20, "20 minutes"),
+    (30, "30 minutes"),
+    (60, "1 hour"),
+]
+
 
 class Person(models.Model):
     """Abstract parent model for Doctor and Patient."""
@@ -76,6 +85,28 @@ class Doctor(Person):
     )
     procedures = models.ManyToManyField(Procedure, verbose_name="Treatments performed by doctor")
 
+    primary_specialization = models.ForeignKey(
+        Specialization, null=True, blank=True, editable=False, on_delete=models.SET_NULL, related_name='+',
+        verbose_name="Primary specialization"
+    )
+
+    def get_schedule_url(self):
+        """
+        Method returns url of doctor's schedule (detail view of primary specialization, which is the one with
+        the lowest id, kept up to date by signals) or url of doctor's details if doctor has no specialization.
+        """
+        if self.primary_specialization_id:
+            return reverse('specialization-detail', kwargs={'pk': self.primary_specialization_id})
+        return reverse('doctor-detail', kwargs={'pk': self.id})
+
+
+def update_primary_specializations(doctors):
+    """Sets primary specialization (the one with the lowest id) of given doctors with a single query."""
+    first_specialization = Doctor.specializations.through.objects.filter(
+        doctor=OuterRef('pk')
+    ).order_by('specialization_id').values('specialization_id')[:1]
+    doctors.update(primary_specialization=Subquery(first_specialization))
+
 
 class Office(models.Model):
     """Represents the room where patient's visit takes place."""
@@ -88,55 +119,224 @@ class Office(models.Model):
         return f"{self.number}"
 
 
+class TermQuerySet(models.QuerySet):
+    """Queryset of Term objects which allows to compute availability of all terms in a single query."""
+
+    def overlapping(self, hour_from, hour_to):
+        """
+        Filters terms which intersect with hour_from - hour_to interval. Terms which only touch the interval
+        (f.e. one ends when the other begins) don't intersect.
+        """
+        return self.filter(hour_from__lt=hour_to, hour_to__gt=hour_from)
+
+    def with_availability(self, now=None):
+        """
+        Annotates terms with values computed once for the whole queryset (for one "now" snapshot):
+        - visit_id: id of visit booked on the term or None,
+        - is_booked: True if there's a visit on the term,
+        - is_past: True if term is from the past.
+        Term methods is_from_past, is_available and find_visit use these values instead of querying database.
+        """
+        now = now or datetime.datetime.now()
+        visits = Visit.objects.filter(date=OuterRef('pk'))
+        return self.annotate(
+            visit_id=Subquery(visits.values('id')[:1]),
+            is_booked=Exists(visits),
+            is_past=ExpressionWrapper(
+                Q(date__lt=now.date()) | Q(date=now.date(), hour_from__lt=now.time()), output_field=BooleanField()
+            ),
+        )
+
+
 class Term(models.Model):
     """Represents the complex info: term, doctor and place where and when patient's visit can take place."""
     date = models.DateField(verbose_name="Day's date", validators=[date_validator])
     hour_from = models.TimeField(verbose_name="From hour")
     hour_to = models.TimeField(verbose_name="To hour")
-    doctor = models.ForeignKey(Doctor, verbose_name="Doctor", on_delete=models.CASCADE)
+    doctor = models.ForeignKey(Doctor, verbose_name="Doctor", on_delete=models.CASCADE, db_index=False)
     office = models.ForeignKey(Office, on_delete=models.CASCADE, verbose_name="Office")
 
+    objects = TermQuerySet.as_manager()
+
     class Meta:
-        """Meta doesn't allow to create a (possible) term with the same office."""
+        """
+        Meta doesn't allow to create a (possible) term with the same office. Indexes are used by overlap checks of
+        an office or a doctor schedule in a given day, by search of the earliest free term and by doctor's schedule
+        (doctor's terms ordered by date and hour, the index replaces the single column index of doctor).
+        """
         unique_together = ['date', 'hour_from', 'hour_to', 'office']
+        indexes = [
+            models.Index(fields=['date', 'office', 'hour_from'], name='term_date_office_hour_idx'),
+            models.Index(fields=['date', 'doctor', 'hour_from'], name='term_date_doctor_hour_idx'),
+            models.Index(fields=['date', 'hour_from'], name='term_date_hour_idx'),
+            models.Index(fields=['doctor', 'date', 'hour_from'], name='term_doctor_date_hour_idx'),
+        ]
 
     @property
     def visit_hour(self):
         """Method allows to display time without seconds."""
         return f"{self.hour_from.strftime('%H:%M')}"
 
-    def is_from_past(self):
+    def is_from_past(self, now=None):
         """
-        Method checks if term is form the past by comparison of actual date and time with the same
-        values of Term object.
+        Method checks if term is form the past by comparison of actual date and time (or given "now" snapshot)
+        with the same values of Term object. Value annotated by TermQuerySet.with_availability is used if present.
         """
-        if self.date < datetime.date.today():
+        if now is None and 'is_past' in self.__dict__:
+            return self.is_past
+
+        now = now or datetime.datetime.now()
+        if self.date < now.date():
             return True
-        elif self.date == datetime.date.today() and self.hour_from < datetime.datetime.now().time():
+        elif self.date == now.date() and self.hour_from < now.time():
             return True
         else:
             return False
 
-    def is_available(self):
-        """Method checks if there's no visit on this term and date is from the past."""
-        return not self.visit_set.exists() and not self.is_from_past()
+    def is_available(self, now=None):
+        """Method checks if there's no visit on this term and date is not from the past."""
+        is_booked = self.is_booked if 'is_booked' in self.__dict__ else self.visit_set.exists()
+        return not is_booked and not self.is_from_past(now)
 
     def __str__(self):
         return f"{self.date}, {self.hour_from}, {self.hour_to}"
 
     def find_visit(self):
         """Method Allows to find a Visit object (by primary key) related to term itself."""
+        if 'visit_id' in self.__dict__:
+            return self.visit_id
         return self.visit_set.first().id
 
 
+class ScheduleTemplate(models.Model):
+    """
+    Represents doctor's recurring work hours in one weekday (f.e. Monday 8:00-14:00, office 12, 20-minute visits).
+    Terms are generated from templates by "generate_terms" management command. Field generated_until keeps the last
+    date which terms were generated for, so the next run inserts only missing ones.
+    """
+    doctor = models.ForeignKey(Doctor, verbose_name="Doctor", on_delete=models.CASCADE)
+    office = models.ForeignKey(Office, on_delete=models.CASCADE, verbose_name="Office")
+    weekday = models.IntegerField(choices=list(WEEKDAYS.items()), verbose_name="Weekday")
+    hour_from = models.TimeField(verbose_name="From hour")
+    hour_to = models.TimeField(verbose_name="To hour")
+    visit_time = models.IntegerField(choices=VISIT_TIMES, verbose_name="Visit time")
+    valid_from = models.DateField(default=datetime.date.today, verbose_name="Valid from")
+    valid_to = models.DateField(null=True, blank=True, verbose_name="Valid to")
+    generated_until = models.DateField(null=True, blank=True, editable=False, verbose_name="Terms generated until")
+
+    def clean(self):
+        if self.hour_from and self.hour_to and self.hour_from >= self.hour_to:
+            raise ValidationError("End must be after beginning of work!")
+        if self.valid_to and self.valid_from and self.valid_to < self.valid_from:
+            raise ValidationError("End of validity must be after its beginning!")
+
+    def dates_to_generate(self, horizon):
+        """Returns dates (matching template's weekday) from last generated date or today up to horizon date."""
+        start = max(self.valid_from, datetime.date.today())
+        if self.generated_until:
+            start = max(start, self.generated_until + datetime.timedelta(days=1))
+        end = min(horizon, self.valid_to) if self.valid_to else horizon
+
+        days_to_weekday = (self.weekday - 1 - start.weekday()) % 7
+        first = start + datetime.timedelta(days=days_to_weekday)
+        return [first + datetime.timedelta(weeks=n) for n in range(max(0, (end - first).days // 7 + 1))]
+
+    def __str__(self):
+        return f"{self.doctor}, {self.get_weekday_display()} {self.hour_from}-{self.hour_to}, office {self.office}"
+
+
 class Visit(models.Model):
     """Represent information about patient's visit through relations between models"""
-    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, verbose_name="Patient")
-    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, verbose_name="Doctor")
-    date = models.ForeignKey(Term, on_delete=models.CASCADE, verbose_name="Visit term")
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, verbose_name="Patient", db_index=False)
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, verbose_name="Doctor", db_index=False)
+    date = models.ForeignKey(Term, on_delete=models.CASCADE, verbose_name="Visit term", db_index=False)
     procedure = models.ForeignKey(Procedure, on_delete=models.CASCADE, verbose_name="Chosen treatment")
 
+    class Meta:
+        """
+        Meta doesn't allow to book more than one visit on the same term (the constraint is also the index of term).
+        Indexes are used by lists of patient's and doctor's visits, they replace single column indexes of patient
+        and doctor.
+        """
+        constraints = [
+            models.UniqueConstraint(fields=['date'], name='visit_unique_term'),
+        ]
+        indexes = [
+            models.Index(fields=['patient', 'date'], name='visit_patient_date_idx'),
+            models.Index(fields=['doctor', 'date'], name='visit_doctor_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.date} {self.patient} u {self.doctor.get_title_or_degree_display()} {self.doctor}"
 
 
+class ArchivedVisit(models.Model):
+    """
+    Represents visit from the past moved out of Visit and Term tables by "archive_past" management command. Term,
+    office and price of procedure are copied, so archived visit doesn't depend on rows which can be deleted or
+    changed later.
+    """
+    visit_id = models.IntegerField(unique=True, verbose_name="Id of archived visit")
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE, verbose_name="Patient", db_index=False)
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, verbose_name="Doctor", db_index=False)
+    procedure = models.ForeignKey(Procedure, on_delete=models.CASCADE, verbose_name="Chosen treatment")
+    date = models.DateField(verbose_name="Day's date")
+    hour_from = models.TimeField(verbose_name="From hour")
+    hour_to = models.TimeField(verbose_name="To hour")
+    office_number = models.IntegerField(verbose_name="Office Number")
+    price = models.DecimalField(max_digits=6, decimal_places=2, verbose_name="treatment price")
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="Archived at")
+
+    class Meta:
+        """Indexes are used by history of patient's and doctor's visits."""
+        indexes = [
+            models.Index(fields=['patient', 'date'], name='archivedvisit_patient_date_idx'),
+            models.Index(fields=['doctor', 'date'], name='archivedvisit_doctor_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date}, {self.hour_from}, {self.hour_to} {self.patient} u {self.doctor}"
+
+
+class DailyRevenue(models.Model):
+    """
+    Daily rollup of visits (current and archived ones) per doctor and procedure, computed by "build_rollups"
+    management command, so reports don't have to aggregate visits. Revenue is attributed to primary specialization
+    of the doctor (at the time of rollup), so it's not counted more than once.
+    """
+    date = models.DateField(verbose_name="Day's date")
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, verbose_name="Doctor")
+    procedure = models.ForeignKey(Procedure, on_delete=models.CASCADE, verbose_name="Treatment")
+    specialization = models.ForeignKey(
+        Specialization, null=True, blank=True, on_delete=models.SET_NULL, verbose_name="Primary specialization"
+    )
+    visits = models.IntegerField(verbose_name="Number of visits")
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Revenue")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'doctor', 'procedure'], name='dailyrevenue_unique_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.doctor}, {self.procedure}: {self.revenue}"
+
+
+class DailyUtilization(models.Model):
+    """
+    Daily rollup of terms per doctor and office (number of all terms and booked ones), computed by "build_rollups"
+    management command.
+    """
+    date = models.DateField(verbose_name="Day's date")
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, verbose_name="Doctor")
+    office = models.ForeignKey(Office, on_delete=models.CASCADE, verbose_name="Office")
+    terms = models.IntegerField(verbose_name="Number of terms")
+    booked = models.IntegerField(verbose_name="Number of booked terms")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'doctor', 'office'], name='dailyutilization_unique_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.doctor}, office {self.office}: {self.booked}/{self.terms}"
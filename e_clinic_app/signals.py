@@ -0,0 +1,135 @@
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from e_clinic_app.functions.cache_functions import (
+    bump_catalog_version, invalidate_specializations, invalidate_week_schedules
+)
+from e_clinic_app.functions.role_functions import bump_role_version, cache_role
+from e_clinic_app.models import (
+    Doctor, Patient, Procedure, Specialization, Term, Visit, update_primary_specializations
+)
+
+
+@receiver([post_save, post_delete], sender=Specialization)
+def specialization_changed(sender, **kwargs):
+    """Invalidates cached list of specializations (displayed in navbar)."""
+    invalidate_specializations()
+
+
+@receiver(m2m_changed, sender=Doctor.specializations.through)
+def doctor_specializations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Updates primary specialization of doctors whose specializations were changed (from either side of relation)."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        update_primary_specializations(Doctor.objects.filter(pk=instance.pk))
+        instance.refresh_from_db(fields=['primary_specialization'])
+    elif action == 'post_clear':
+        update_primary_specializations(Doctor.objects.filter(primary_specialization=instance))
+    else:
+        update_primary_specializations(Doctor.objects.filter(pk__in=pk_set))
+
+
+@receiver(pre_delete, sender=Specialization)
+def remember_specialization_doctors(sender, instance, **kwargs):
+    """Remembers doctors of deleted specialization, their primary specialization is updated after deletion."""
+    instance._doctor_ids = list(instance.doctor_set.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Specialization)
+def specialization_deleted(sender, instance, **kwargs):
+    """Updates primary specialization of doctors of deleted specialization."""
+    update_primary_specializations(Doctor.objects.filter(pk__in=getattr(instance, '_doctor_ids', [])))
+
+
+@receiver([post_save, post_delete], sender=Specialization)
+@receiver([post_save, post_delete], sender=Procedure)
+@receiver([post_save, post_delete], sender=Doctor)
+@receiver(m2m_changed, sender=Doctor.specializations.through)
+@receiver(m2m_changed, sender=Doctor.procedures.through)
+def catalog_changed(sender, **kwargs):
+    """Invalidates cached fragments of catalog pages (specializations, procedures and doctors)."""
+    if kwargs.get('action', 'post_').startswith('post_'):
+        bump_catalog_version()
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Invalidates cached fragments of catalog pages when doctor's name changes. New users aren't doctors yet and logging
+    in changes only last_login. Doctor is queried only if it's not loaded with the user (and is cached on it then).
+    """
+    if created or update_fields and set(update_fields) == {'last_login'}:
+        return
+    if hasattr(instance, 'doctor'):
+        bump_catalog_version()
+
+
+def is_moved(instance, update_fields, fields):
+    """Checks if saved object already exists and the save can change any of the fields."""
+    return not instance._state.adding and (update_fields is None or bool(set(fields) & set(update_fields)))
+
+
+def invalidate_previous_week_schedules(instance, doctor_id, date):
+    """Invalidates cached week schedules of doctor and date of the term before it was moved (see pre_save receivers)."""
+    previous = instance.__dict__.pop('_previous_term', None)
+    if previous and previous != (doctor_id, date):
+        invalidate_week_schedules(previous[0], [previous[1]])
+
+
+@receiver(pre_save, sender=Term)
+def term_moving(sender, instance, update_fields=None, **kwargs):
+    """Remembers doctor and date of existing term before it's saved, so schedules of the old week are invalidated too."""
+    if is_moved(instance, update_fields, ['doctor', 'doctor_id', 'date']):
+        instance._previous_term = Term.objects.filter(pk=instance.pk).values_list('doctor_id', 'date').first()
+
+
+@receiver([post_save, post_delete], sender=Term)
+def term_changed(sender, instance, **kwargs):
+    """Invalidates cached week schedules containing the term (and the term before it was moved)."""
+    invalidate_week_schedules(instance.doctor_id, [instance.date])
+    invalidate_previous_week_schedules(instance, instance.doctor_id, instance.date)
+
+
+@receiver(pre_save, sender=Visit)
+def visit_moving(sender, instance, update_fields=None, **kwargs):
+    """Remembers doctor and date of term of existing visit before it's saved, if the visit can be moved to other term."""
+    if is_moved(instance, update_fields, ['date', 'date_id']):
+        instance._previous_term = Visit.objects.filter(pk=instance.pk).values_list(
+            'date__doctor_id', 'date__date'
+        ).first()
+
+
+@receiver([post_save, post_delete], sender=Visit)
+def visit_changed(sender, instance, **kwargs):
+    """
+    Invalidates cached week schedules containing term of the visit (term deleted with visit has its own signal) and
+    term of the visit before it was moved. Term is queried only if it's not loaded with the visit.
+    """
+    if Visit.date.is_cached(instance):
+        doctor_id, date = instance.date.doctor_id, instance.date.date
+    else:
+        doctor_id, date = Term.objects.filter(pk=instance.date_id).values_list('doctor_id', 'date').first() or (
+            None, None
+        )
+    if doctor_id:
+        invalidate_week_schedules(doctor_id, [date])
+    invalidate_previous_week_schedules(instance, doctor_id, date)
+
+
+@receiver([post_save, post_delete], sender=Doctor)
+@receiver([post_save, post_delete], sender=Patient)
+def profile_changed(sender, instance, created=True, **kwargs):
+    """Makes roles cached in sessions of the user resolve again after the user's profile is created or deleted."""
+    if created:
+        bump_role_version(instance.user_id)
+
+
+@receiver(user_logged_in)
+def user_logged_in_role(sender, request, user, **kwargs):
+    """Caches role of the user in the new session (see RoleMiddleware)."""
+    if request is not None and hasattr(request, 'session'):
+        cache_role(request, user)
@@ -7,12 +7,32 @@ from faker import Faker
 from django.test import Client
 import pytest
 
+from e_clinic_app.functions.async_functions import close_database_executor
+from e_clinic_app.functions.cache_functions import get_cache
+from e_clinic_app.middleware import request_stats
 from e_clinic_app.models import Specialization, Procedure, Doctor, Visit, Term, Patient, Office
 from e_clinic_app.tests.utilities import fake_phone_number
 
 fake = Faker("pl_PL")
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """
+    Cache (and request stats) is cleared before every test, because test database is rolled back without sending
+    signals.
+    """
+    get_cache().clear()
+    request_stats.clear()
+
+
+@pytest.fixture(scope='session', autouse=True)
+def close_async_connections(django_db_setup):
+    """Closes connections of threads running queries of async views before test database is dropped."""
+    yield
+    close_database_executor()
+
+
 @pytest.fixture
 def client():
     client = Client()
@@ -0,0 +1,522 @@
+"""
+Benchmarks seeding large volumes of data. They are skipped by default, run them with: pytest -m benchmark -s
+Volume of seeded data can be changed with environment variables (f.e. BENCHMARK_TERMS=100000 or
+BENCHMARK_SCALE=large for URL benchmarks).
+"""
+import asyncio
+import datetime
+import gc
+import itertools
+import json
+import os
+import random
+import re
+import time
+import tracemalloc
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.db import connection, DatabaseError
+from django.db.models import Max, Min, Q
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, resolve, reverse
+import pytest
+
+from e_clinic_app.functions.export_functions import export_visits
+from e_clinic_app.functions.password_functions import get_hashing_pool, hash_passwords, reset_hashing_pool
+from e_clinic_app.functions.report_functions import build_daily_rollups
+from e_clinic_app.middleware import request_stats
+from e_clinic_app.functions.term_functions import find_earliest_free_term
+from e_clinic_app.functions.visit_functions import book_visit
+from e_clinic_app.models import Term, Visit, Procedure, Patient, Office, Specialization
+from e_clinic_app.validators import has_valid_checksum, validate_pesels, validate_phone_numbers, validate_pwz_numbers
+from e_clinic_app.tests.utilities import fake, fake_doctor, seed_terms, fake_day_terms, run_concurrently, seed_clinic
+
+BENCHMARK_TERMS = int(os.environ.get('BENCHMARK_TERMS', 1_000_000))
+BENCHMARK_DOCTORS = int(os.environ.get('BENCHMARK_DOCTORS', 100))
+BENCHMARK_REPEAT = int(os.environ.get('BENCHMARK_REPEAT', 200))
+BENCHMARK_THREADS = int(os.environ.get('BENCHMARK_THREADS', 16))
+
+BENCHMARK_SCALES = {
+    'small': {'doctors': 20, 'patients': 100, 'terms': 5_000},
+    'medium': {'doctors': 1_000, 'patients': 10_000, 'terms': 100_000},
+    'large': {'doctors': 10_000, 'patients': 100_000, 'terms': 1_000_000},
+}
+BENCHMARK_SCALE = os.environ.get('BENCHMARK_SCALE', 'small')
+BENCHMARK_REQUESTS = int(os.environ.get('BENCHMARK_REQUESTS', 20))
+BENCHMARK_REPORT = Path(os.environ.get('BENCHMARK_REPORT', 'bench_report.json'))
+BENCHMARK_BASELINE = Path(__file__).parent / 'benchmark_baseline.json'
+BENCHMARK_UPDATE_BASELINE = bool(os.environ.get('BENCHMARK_UPDATE_BASELINE'))
+BENCHMARK_LATENCY_TOLERANCE = float(os.environ.get('BENCHMARK_LATENCY_TOLERANCE', 3.0))
+BENCHMARK_SEED = int(os.environ.get('BENCHMARK_SEED', 0))
+BENCHMARK_EARLIEST_TERM_MS = float(os.environ.get('BENCHMARK_EARLIEST_TERM_MS', 10))
+BENCHMARK_CONCURRENCY = int(os.environ.get('BENCHMARK_CONCURRENCY', 16))
+BENCHMARK_FULL_DAYS = int(os.environ.get('BENCHMARK_FULL_DAYS', 2))
+BENCHMARK_BOOKED_RATIO = float(os.environ.get('BENCHMARK_BOOKED_RATIO', 0.3))
+BENCHMARK_SIGNUPS = int(os.environ.get('BENCHMARK_SIGNUPS', 4))
+BENCHMARK_EXPORTED_TERMS = int(os.environ.get('BENCHMARK_EXPORTED_TERMS', 300_000))
+BENCHMARK_VALIDATED_ROWS = int(os.environ.get('BENCHMARK_VALIDATED_ROWS', 300_000))
+
+
+def measure(function, repeat=BENCHMARK_REPEAT):
+    """Returns median time (in milliseconds) of function call."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+@pytest.fixture
+def seeded_terms(db):
+    doctors = [fake_doctor() for _ in range(BENCHMARK_DOCTORS)]
+    start_date = datetime.date.today() + datetime.timedelta(days=1)
+    seed_terms(BENCHMARK_TERMS, doctors, start_date)
+    return doctors
+
+
+@pytest.mark.benchmark
+def test_term_overlap_check_benchmark(seeded_terms):
+    """Compares interval-overlap check used by TermAddForm with the previous OR of four range filters."""
+    doctor = seeded_terms[0]
+    term = Term.objects.filter(doctor=doctor).order_by('-date').first()
+    date, office = term.date, term.office
+    hour_from, hour_to = datetime.time(10, 10), datetime.time(10, 50)
+
+    def overlap_check():
+        return Term.objects.filter(date=date).overlapping(hour_from, hour_to).filter(
+            Q(office=office) | Q(doctor=doctor)
+        ).exists()
+
+    def previous_check():
+        possible_term = Term.objects.filter(date=date)
+        pt = possible_term.filter(hour_from__lte=hour_from, hour_to__gte=hour_to)
+        pt |= possible_term.filter(hour_from__lte=hour_from, hour_to__gt=hour_from, hour_to__lte=hour_to)
+        pt |= possible_term.filter(hour_from__gte=hour_from, hour_from__lte=hour_to, hour_to__gte=hour_to)
+        pt |= possible_term.filter(hour_from__gte=hour_from, hour_to__lte=hour_to)
+        pt2 = pt.filter(office=office)
+        pt2 |= pt.filter(doctor=doctor)
+        return pt2.exists()
+
+    assert overlap_check() and previous_check()
+    overlap_ms, previous_ms = measure(overlap_check), measure(previous_check)
+    print(f"\nOverlap check on {Term.objects.count()} terms: {overlap_ms:.3f} ms (previous: {previous_ms:.3f} ms)")
+
+
+@pytest.mark.benchmark
+def test_earliest_free_term_benchmark(seeded_terms):
+    """
+    Measures search of the earliest free term when the first BENCHMARK_FULL_DAYS days are fully booked and
+    BENCHMARK_BOOKED_RATIO of the next terms are booked at random. Search must take less than
+    BENCHMARK_EARLIEST_TERM_MS milliseconds (median). Search time grows with number of booked terms which have to be
+    skipped before the first free one, not with number of all terms.
+    """
+    random.seed(BENCHMARK_SEED)
+    specialization = Specialization.objects.create(name='Benchmark specialization')
+    procedure = Procedure.objects.create(name='Benchmark procedure', price=100)
+    for doctor in seeded_terms[::10]:
+        doctor.specializations.add(specialization)
+        doctor.procedures.add(procedure)
+    patient = Patient.objects.create(user=User.objects.create_user(username='benchmark_patient'), pesel='00000000000',
+                                     identification_type=1, phone_number='48000000000')
+
+    full_days = Term.objects.order_by('date').values_list('date', flat=True).distinct()[:BENCHMARK_FULL_DAYS]
+    terms = Term.objects.order_by('date', 'hour_from').values_list('id', 'doctor_id', 'date')[:BENCHMARK_TERMS // 10]
+    booked_terms = [
+        (term_id, doctor_id) for term_id, doctor_id, date in terms
+        if date in set(full_days) or random.random() < BENCHMARK_BOOKED_RATIO
+    ]
+    Visit.objects.bulk_create([
+        Visit(date_id=term_id, doctor_id=doctor_id, patient=patient, procedure=procedure)
+        for term_id, doctor_id in booked_terms
+    ], batch_size=10000)
+    # Planner needs statistics (collected by autovacuum on PostgreSQL) to prefer scan of terms in (date, hour) order
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    searches = {
+        'any': {},
+        'specialization': {'specialization': specialization},
+        'specialization and procedure': {'specialization': specialization, 'procedure': procedure},
+        'doctor': {'doctor': seeded_terms[-1]},
+    }
+    print(f"\nEarliest free term on {Term.objects.count()} terms ({len(booked_terms)} booked):")
+    for name, filters in searches.items():
+        assert find_earliest_free_term(**filters) is not None
+        search_ms = measure(lambda: find_earliest_free_term(**filters))
+        print(f"{name:30} {search_ms:.3f} ms")
+        assert search_ms < BENCHMARK_EARLIEST_TERM_MS
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db(transaction=True)
+def test_book_visit_contention_benchmark(set_up):
+    """Measures booking throughput when BENCHMARK_THREADS patients fight for every one of 20 terms."""
+    doctor = fake_doctor(procedures=[Procedure.objects.first()])
+    procedure = doctor.procedures.first()
+    patient = Patient.objects.first()
+    terms = fake_day_terms(doctor, datetime.date.today() + datetime.timedelta(days=1),
+                           Office.objects.create(number=10000), 20)
+
+    start = time.perf_counter()
+    attempts = 0
+    for term in terms:
+        results = run_concurrently(lambda _: book_visit(patient, doctor, term, procedure), range(BENCHMARK_THREADS))
+        attempts += len(results)
+        assert len([result for result in results if isinstance(result, Visit)]) == 1
+    elapsed = time.perf_counter() - start
+
+    assert Visit.objects.filter(date__in=terms).count() == len(terms)
+    print(f"\nBooking under contention ({BENCHMARK_THREADS} threads per term): {attempts / elapsed:.0f} attempts/s, "
+          f"{len(terms) / elapsed:.0f} bookings/s")
+
+
+def get_url_benchmarks(data):
+    """
+    Returns dictionary with url name as key and (url, user) tuple as value for every named route
+    of e_clinic/urls.py. User None means anonymous request.
+    """
+    patient = data['patients'][0]
+    doctor = Visit.objects.filter(patient=patient).select_related('doctor').first().doctor
+    visit = Visit.objects.filter(patient=patient).first()
+    specialization = doctor.specializations.first()
+    free_term = Term.objects.filter(doctor=doctor, date__gt=datetime.date.today(), visit__isnull=True).first()
+
+    staff = User.objects.create_user(username='benchmark_staff', is_staff=True)
+    dates = Term.objects.aggregate(Min('date'), Max('date'))
+    build_daily_rollups(dates['date__min'], dates['date__max'])
+
+    return {
+        'request-stats': (reverse('request-stats'), staff),
+        'report': (reverse('report'), staff),
+        'main-page': (reverse('main-page'), None),
+        'specializations': (reverse('specializations'), None),
+        'specialization-detail': (reverse('specialization-detail', args=[specialization.id]), patient.user),
+        'procedures': (reverse('procedures'), None),
+        'free-term-search': (f"{reverse('free-term-search')}?specialization={specialization.id}", patient.user),
+        'procedure-detail': (reverse('procedure-detail', args=[doctor.procedures.first().id]), None),
+        'doctor-detail': (reverse('doctor-detail', args=[doctor.id]), None),
+        'register_visit': (
+            reverse('register_visit', args=[doctor.id, free_term.date, free_term.hour_from]), patient.user
+        ),
+        'login-page': (reverse('login-page'), None),
+        'logout-page': (reverse('logout-page'), None),
+        'signup': (reverse('signup'), None),
+        'edit-user': (reverse('edit-user'), patient.user),
+        'change-password': (reverse('change-password'), patient.user),
+        'user-visits': (reverse('user-visits'), doctor.user),
+        'visit-details': (reverse('visit-details', args=[visit.id]), patient.user),
+        'visit-cancel': (reverse('visit-cancel', args=[visit.id]), patient.user),
+        'visit-export': (f"{reverse('visit-export')}?doctor={doctor.id}", staff),
+        'add-term': (reverse('add-term'), doctor.user),
+        'add-multiple-term': (reverse('add-multiple-term'), doctor.user),
+        'cancel-term': (reverse('cancel-term', args=[free_term.id]), doctor.user),
+        'api-specialization-availability': (
+            reverse('api-specialization-availability', args=[specialization.id]), None
+        ),
+        'api-doctor-availability': (reverse('api-doctor-availability', args=[doctor.id]), None),
+        'api-report': (reverse('api-report'), staff),
+        'async-specialization-detail': (
+            reverse('async-specialization-detail', args=[specialization.id]), patient.user
+        ),
+        'async-user-visits': (reverse('async-user-visits'), doctor.user),
+        'async-api-specialization-availability': (
+            reverse('async-api-specialization-availability', args=[specialization.id]), None
+        ),
+        'async-api-doctor-availability': (reverse('async-api-doctor-availability', args=[doctor.id]), None),
+    }
+
+
+def get_response(client, url):
+    """Sends GET request. Streamed content is read, so its generation is included in measurements."""
+    response = client.get(url)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def benchmark_url(client, url, user, requests=BENCHMARK_REQUESTS):
+    """Returns query count, p50 and p95 latency (in milliseconds) and peak memory (in KiB) of GET request."""
+    if user:
+        client.force_login(user)
+    else:
+        client.logout()
+    get_response(client, url)
+
+    with CaptureQueriesContext(connection) as queries:
+        response = get_response(client, url)
+    assert response.status_code < 400, f"{url} returned {response.status_code}"
+    query_count = len(queries)
+    if asyncio.iscoroutinefunction(resolve(urlsplit(url).path).func):
+        # Async views run queries in threads with their own connections, only RequestStatsMiddleware records them all
+        query_count = request_stats.records[-1]['queries']
+
+    # Like timeit, garbage collection is disabled during measurement, so its pauses don't make p95 random
+    timings = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(requests):
+            start = time.perf_counter()
+            get_response(client, url)
+            timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        gc.enable()
+    timings.sort()
+
+    tracemalloc.start()
+    get_response(client, url)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'queries': query_count,
+        'p50_ms': round(timings[len(timings) // 2], 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'peak_memory_kib': round(peak_memory / 1024, 1),
+    }
+
+
+def find_regressions(results, baseline):
+    """
+    Compares results with baseline: query count can't grow and p95 latency can't grow more than
+    BENCHMARK_LATENCY_TOLERANCE times (latency depends on machine, so the tolerance is generous by default).
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name, {})
+        if 'queries' in expected and result['queries'] > expected['queries']:
+            regressions.append(f"{name}: {result['queries']} queries (baseline {expected['queries']})")
+        if 'p95_ms' in expected and result['p95_ms'] > expected['p95_ms'] * BENCHMARK_LATENCY_TOLERANCE:
+            regressions.append(f"{name}: p95 {result['p95_ms']} ms (baseline {expected['p95_ms']} ms)")
+    return regressions
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db(transaction=True)
+def test_url_benchmarks(client):
+    """
+    Seeds data of BENCHMARK_SCALE and benchmarks every named route (data is committed, because async views query
+    database in worker threads, with their own connections). Results are saved to BENCHMARK_REPORT (json).
+    Test fails if any view regressed compared to benchmark_baseline.json (for the same scale). Baseline can be
+    updated with BENCHMARK_UPDATE_BASELINE=1.
+    """
+    scale = BENCHMARK_SCALES[BENCHMARK_SCALE]
+    random.seed(BENCHMARK_SEED)
+    fake.seed_instance(BENCHMARK_SEED)
+    data = seed_clinic(**scale)
+    url_benchmarks = get_url_benchmarks(data)
+
+    url_names = {pattern.name for pattern in get_resolver().url_patterns if getattr(pattern, 'name', None)}
+    assert url_names == set(url_benchmarks), "Every named route must be benchmarked"
+
+    results = {name: benchmark_url(client, url, user) for name, (url, user) in url_benchmarks.items()}
+    report = {'scale': BENCHMARK_SCALE, 'volume': scale, 'vendor': connection.vendor, 'results': results}
+    BENCHMARK_REPORT.write_text(json.dumps(report, indent=4))
+    for name, result in results.items():
+        print(f"{name:25} {result['queries']:4} queries  p50 {result['p50_ms']:9.3f} ms  "
+              f"p95 {result['p95_ms']:9.3f} ms  peak {result['peak_memory_kib']:9.1f} KiB")
+
+    baseline = json.loads(BENCHMARK_BASELINE.read_text()) if BENCHMARK_BASELINE.exists() else {}
+    if BENCHMARK_UPDATE_BASELINE:
+        baseline[BENCHMARK_SCALE] = results
+        BENCHMARK_BASELINE.write_text(json.dumps(baseline, indent=4) + '\n')
+        return
+
+    regressions = find_regressions(results, baseline.get(BENCHMARK_SCALE, {}))
+    assert not regressions, "Views regressed:\n" + "\n".join(regressions)
+
+
+def logged_clients(client_class, user, count):
+    """Returns count of clients of client_class (Client or AsyncClient), logged in as user (if not None)."""
+    clients = [client_class() for _ in range(count)]
+    if user:
+        for client in clients:
+            client.force_login(user)
+    return clients
+
+
+def wsgi_throughput(url, user, concurrency=BENCHMARK_CONCURRENCY, requests=BENCHMARK_REQUESTS):
+    """Returns requests per second of concurrency clients sending requests (each in its own thread, like WSGI)."""
+    clients = logged_clients(Client, user, concurrency)
+
+    def send(client):
+        for _ in range(requests):
+            assert client.get(url).status_code == 200
+
+    start = time.perf_counter()
+    results = run_concurrently(send, clients)
+    elapsed = time.perf_counter() - start
+    assert not [result for result in results if isinstance(result, Exception)]
+    return concurrency * requests / elapsed
+
+
+def asgi_throughput(url, user, concurrency=BENCHMARK_CONCURRENCY, requests=BENCHMARK_REQUESTS):
+    """Returns requests per second of concurrency clients sending requests to ASGI handler (one event loop)."""
+    clients = logged_clients(AsyncClient, user, concurrency)
+
+    async def send(client):
+        for _ in range(requests):
+            response = await client.get(url)
+            assert response.status_code == 200
+
+    async def send_concurrently():
+        await asyncio.gather(*(send(client) for client in clients))
+
+    start = time.perf_counter()
+    async_to_sync(send_concurrently)()
+    return concurrency * requests / (time.perf_counter() - start)
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db(transaction=True)
+def test_wsgi_asgi_throughput():
+    """
+    Load test comparing throughput of sync views (WSGI) and their async versions (ASGI) with BENCHMARK_CONCURRENCY
+    concurrent clients sending BENCHMARK_REQUESTS requests each (data of BENCHMARK_SCALE). Results depend heavily on
+    database (SQLite serializes access to the file), so they're only printed.
+    """
+    random.seed(BENCHMARK_SEED)
+    fake.seed_instance(BENCHMARK_SEED)
+    data = seed_clinic(**BENCHMARK_SCALES[BENCHMARK_SCALE])
+    patient = data['patients'][0]
+    doctor = Visit.objects.filter(patient=patient).select_related('doctor').first().doctor
+    specialization = doctor.specializations.first()
+
+    routes = {
+        'specialization-detail': (f'specialization/{specialization.id}/?week=1', patient.user),
+        'user-visits': ('yourvisits/', patient.user),
+        'api-specialization-availability': (f'api/specialization/{specialization.id}/availability/?week=1', None),
+        'api-doctor-availability': (f'api/doctor/{doctor.id}/availability/', None),
+    }
+    print(f"\nThroughput with {BENCHMARK_CONCURRENCY} concurrent clients ({connection.vendor}):")
+    for name, (url, user) in routes.items():
+        wsgi = wsgi_throughput(f'/{url}', user)
+        asgi = asgi_throughput(f'/async/{url}', user)
+        print(f"{name:35} WSGI {wsgi:8.1f} req/s   ASGI {asgi:8.1f} req/s")
+
+
+@pytest.mark.benchmark
+def test_batch_validators_benchmark():
+    """
+    Compares batch validators with the previous per-row validation (Python loop over scalar validators) on
+    BENCHMARK_VALIDATED_ROWS identifiers, part of which are invalid.
+    """
+    def previous_pesel(number):
+        number = str(number)
+        if not re.match(r'^\d{11}$', number):
+            return 'invalid'
+        return '' if has_valid_checksum(number) else 'checksum'
+
+    def previous_pwz(pwz_number):
+        pwz_number = str(pwz_number)
+        if not re.fullmatch(r'\d{7}', pwz_number) or pwz_number.startswith('0'):
+            return 'invalid'
+        checksum = sum(ratio * int(digit) for ratio, digit in zip(range(1, 7), pwz_number[1:])) % 11
+        return '' if checksum == int(pwz_number[0]) else 'checksum'
+
+    def previous_phone(phone_number):
+        return '' if re.fullmatch(r'^\+?1?\d{9,11}$', phone_number) else 'invalid'
+
+    random.seed(BENCHMARK_SEED)
+    fake.seed_instance(BENCHMARK_SEED)
+    sample = [
+        (fake.pesel(), fake.pwz_doctor(), fake.numerify('+48#########'), fake.numerify('## ### ## ##'))
+        for _ in range(1000)
+    ]
+    rows = [random.choice(sample) for _ in range(BENCHMARK_VALIDATED_ROWS)]
+    # Every tenth PESEL has wrong last digit
+    pesels = [pesel if n % 10 else pesel[:-1] + str((int(pesel[-1]) + 1) % 10) for n, (pesel, *_) in enumerate(rows)]
+    pwz_numbers = [pwz for _, pwz, _, _ in rows]
+    phone_numbers = [phone if n % 10 else invalid_phone for n, (_, _, phone, invalid_phone) in enumerate(rows)]
+
+    print(f"\nValidation of {BENCHMARK_VALIDATED_ROWS} rows:")
+    for name, batch_validator, previous_validator, values in [
+        ('PESEL', validate_pesels, previous_pesel, pesels),
+        ('PWZ', validate_pwz_numbers, previous_pwz, pwz_numbers),
+        ('phone number', validate_phone_numbers, previous_phone, phone_numbers),
+    ]:
+        assert batch_validator(values).tolist() == [previous_validator(value) for value in values]
+        batch_ms = measure(lambda: batch_validator(values), repeat=5)
+        previous_ms = measure(lambda: [previous_validator(value) for value in values], repeat=5)
+        print(f"{name:15} batch: {batch_ms:8.1f} ms   per row: {previous_ms:8.1f} ms")
+        assert batch_ms < previous_ms
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db(transaction=True)
+def test_signup_throughput(settings):
+    """
+    Measures signup throughput with BENCHMARK_CONCURRENCY concurrent clients registering BENCHMARK_SIGNUPS patients
+    each, with passwords hashed in the pool of processes (one per CPU) and in request threads.
+    """
+    registrations = itertools.count()
+
+    def register(client):
+        signups = 0
+        while signups < BENCHMARK_SIGNUPS:
+            number = next(registrations)
+            data = {
+                'username': f'signup{number}', 'first_name': 'Jan', 'last_name': 'Kowalski',
+                'email': f'signup{number}@example.com', 'password1': 'superstrongpassword12345',
+                'password2': 'superstrongpassword12345', 'pesel': fake.unique.pesel(), 'identification_type': 1,
+                'phone_number': f'48{number:09d}',
+            }
+            try:
+                response = client.post('/signup/', data)
+            except DatabaseError:
+                # SQLite test database rejects concurrent writes (table is locked), signup is repeated with new data
+                continue
+            assert response.status_code == 302
+            signups += 1
+
+    print(f"\nSignups with {BENCHMARK_CONCURRENCY} concurrent clients:")
+    for name, workers in [('hashing pool', os.cpu_count()), ('request thread', 0)]:
+        settings.PASSWORD_HASHING_WORKERS = workers
+        settings.PASSWORD_HASHING_QUEUE = 4 * workers
+        reset_hashing_pool()
+        pool, _ = get_hashing_pool()
+        if pool:
+            # Workers are started before measurement
+            hash_passwords(['password'] * workers, pool)
+
+        start = time.perf_counter()
+        results = run_concurrently(register, [Client() for _ in range(BENCHMARK_CONCURRENCY)])
+        elapsed = time.perf_counter() - start
+        assert not [result for result in results if isinstance(result, Exception)]
+        print(f"{name:15} {BENCHMARK_CONCURRENCY * BENCHMARK_SIGNUPS / elapsed:6.1f} signups/s")
+    reset_hashing_pool()
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_visit_export_benchmark():
+    """
+    Measures export of visits booked on BENCHMARK_EXPORTED_TERMS terms. Export is streamed, so its peak memory must
+    not grow with number of exported visits (export of all visits is compared with export of the first week).
+    """
+    random.seed(BENCHMARK_SEED)
+    fake.seed_instance(BENCHMARK_SEED)
+    seed_clinic(doctors=100, patients=1000, terms=BENCHMARK_EXPORTED_TERMS)
+    first_week = datetime.date.today() + datetime.timedelta(days=7)
+
+    def export(**filters):
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        size = sum(len(chunk) for chunk in export_visits('csv', **filters))
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+        return size, elapsed, peak
+
+    week_size, week_seconds, week_peak = export(date_to=first_week)
+    size, seconds, peak = export()
+    visits = Visit.objects.count()
+    print(f"\nExport of {visits} visits: {seconds:.2f} s ({visits / seconds:.0f} rows/s, {size / 1024 ** 2:.1f} MiB), "
+          f"peak memory {peak:.0f} KiB (first week: {week_size / 1024 ** 2:.1f} MiB, peak memory {week_peak:.0f} KiB)")
+    assert peak < 2 * week_peak
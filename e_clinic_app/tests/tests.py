@@ -1,11 +1,42 @@
+import csv
+import datetime
+import json
 import random
+from io import StringIO
 
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection, DatabaseError
+from django.db.backends.signals import connection_created
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, RequestFactory
+from django.test.utils import CaptureQueriesContext
 import pytest
 from faker import Faker
 
-from e_clinic_app.models import Specialization, Procedure, Doctor, Visit, Term, Patient, Office
-from e_clinic_app.tests.utilities import fake_term
+from e_clinic_app.functions.datetime_functions import get_week_start_and_end
+from e_clinic_app.context_processors.context_processor import specializations_ctxp
+from e_clinic_app.forms import TermAddForm
+from e_clinic_app.functions.cache_functions import get_week_schedule, get_week_schedule_stats
+from e_clinic_app.functions.schedule_functions import build_week_schedule
+from e_clinic_app.functions.term_functions import create_terms, find_earliest_free_term
+from e_clinic_app.functions.visit_functions import book_visit, TERM_TAKEN_MESSAGE
+from e_clinic_app.middleware import request_stats
+from e_clinic_app.functions.archive_functions import archive_visits
+from e_clinic_app.management.commands import import_people
+from e_clinic_app.functions.password_functions import get_hashing_pool
+from e_clinic_app.functions.report_functions import build_daily_rollups, get_revenue_report, get_utilization_report
+from e_clinic_app.functions.role_functions import ROLE_SESSION_KEY, get_role_version
+from e_clinic_app.models import (
+    Specialization, Procedure, Doctor, Visit, Term, Patient, Office, ScheduleTemplate, ArchivedVisit, DailyRevenue,
+    DailyUtilization
+)
+from e_clinic_app.validators import (
+    pesel_validator, phone_regex_validator, pwz_validator, validate_pesels, validate_phone_numbers, validate_pwz_numbers
+)
+from e_clinic_app.tests.utilities import fake_term, fake_doctor, fake_day_terms, run_concurrently, explain
 
 fake = Faker("pl_PL")
 
@@ -45,6 +76,430 @@ def test_specialization_detail_view_with_offset(client, set_up):
     assert response.context.get('specialization') == specialization
 
 
+@pytest.mark.django_db
+def test_week_schedule_query_count_is_constant(client, set_up):
+    """Tests if number of queries of specialization detail view doesn't grow with number of doctors and terms."""
+    specialization = Specialization.objects.create(name='Schedule test')
+    procedure = Procedure.objects.first()
+    patient = Patient.objects.first()
+    monday, saturday = get_week_start_and_end(0)
+    week = [monday.date() + datetime.timedelta(days=n) for n in range(6)]
+
+    def add_doctor_with_week_terms(terms_per_day):
+        doctor = fake_doctor(specializations=[specialization], procedures=[procedure])
+        office = Office.objects.create(number=1000 + doctor.id)
+        for date in week:
+            terms = fake_day_terms(doctor, date, office, terms_per_day)
+            Visit.objects.create(patient=patient, doctor=doctor, date=terms[0], procedure=procedure)
+
+    def count_queries():
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'/specialization/{specialization.id}/')
+        assert response.status_code == 200
+        return len(queries)
+
+    client.force_login(user=patient.user)
+    count_queries()
+    add_doctor_with_week_terms(terms_per_day=2)
+    queries_for_one_doctor = count_queries()
+    cached_queries_for_one_doctor = count_queries()
+    assert cached_queries_for_one_doctor < queries_for_one_doctor
+
+    for _ in range(4):
+        add_doctor_with_week_terms(terms_per_day=5)
+    assert count_queries() == queries_for_one_doctor
+    assert count_queries() == cached_queries_for_one_doctor
+
+    client.force_login(user=specialization.doctor_set.first().user)
+    count_queries()
+    queries_for_doctor_user = count_queries()
+    add_doctor_with_week_terms(terms_per_day=5)
+    count_queries()
+    assert count_queries() == queries_for_doctor_user
+
+
+@pytest.mark.django_db
+def test_build_week_schedule(set_up):
+    """Tests if schedule grid places terms on the right doctor and day and marks booked terms."""
+    specialization = Specialization.objects.create(name='Schedule test')
+    office = Office.objects.first()
+    doctors = [fake_doctor(specializations=[specialization]) for _ in range(2)]
+    week = [datetime.date.today() + datetime.timedelta(days=n) for n in range(1, 4)]
+    terms = fake_day_terms(doctors[1], week[2], office, 3)
+    visit = Visit.objects.create(patient=Patient.objects.first(), doctor=doctors[1], date=terms[1],
+                                 procedure=Procedure.objects.first())
+
+    with CaptureQueriesContext(connection) as queries:
+        schedule = build_week_schedule(specialization.doctor_set.all(), week)
+    assert len(queries) == 2
+
+    assert schedule[doctors[0]] == [[], [], []]
+    assert schedule[doctors[1]][:2] == [[], []]
+    assert [term.id for term in schedule[doctors[1]][2]] == [term.id for term in terms]
+    assert [term.visit_id for term in schedule[doctors[1]][2]] == [None, visit.id, None]
+    assert [term.is_available() for term in schedule[doctors[1]][2]] == [True, False, True]
+
+
+@pytest.mark.django_db
+def test_week_schedule_cache(set_up):
+    """Tests if week schedule is cached per specialization and week and invalidated only by changes of that week."""
+    specialization = Specialization.objects.create(name='Schedule test')
+    other_specialization = Specialization.objects.create(name='Other schedule test')
+    office = Office.objects.create(number=1000)
+    doctors = [fake_doctor(specializations=[specialization]), fake_doctor(specializations=[other_specialization])]
+    monday, _ = get_week_start_and_end(1)
+    week = [monday.date() + datetime.timedelta(days=n) for n in range(6)]
+    next_week = [date + datetime.timedelta(weeks=1) for date in week]
+    terms = fake_day_terms(doctors[0], week[1], office, 3)
+
+    def get_schedule(spec, dates, now=None):
+        with CaptureQueriesContext(connection) as queries:
+            schedule = get_week_schedule(spec, spec.doctor_set.all(), dates, now)
+        return schedule, len(queries)
+
+    schedule, _ = get_schedule(specialization, week)
+    assert get_week_schedule_stats() == {'hits': 0, 'misses': 1}
+    cached_schedule, queries = get_schedule(specialization, week)
+    assert get_week_schedule_stats() == {'hits': 1, 'misses': 1}
+    assert queries == 1
+    assert [term.id for term in cached_schedule[doctors[0]][1]] == [term.id for term in terms]
+    assert [term.is_available() for term in cached_schedule[doctors[0]][1]] == [True, True, True]
+    assert cached_schedule[doctors[0]][1][0].doctor == doctors[0]
+
+    past_now = datetime.datetime.combine(week[1], datetime.time(8, 30))
+    cached_schedule, _ = get_schedule(specialization, week, past_now)
+    assert [term.is_from_past() for term in cached_schedule[doctors[0]][1]] == [True, True, False]
+
+    get_schedule(specialization, next_week)
+    get_schedule(other_specialization, week)
+    fake_day_terms(doctors[1], week[2], office, 1)
+    get_schedule(specialization, next_week)
+    get_schedule(specialization, week)
+    assert get_week_schedule_stats() == {'hits': 4, 'misses': 3}
+
+    visit = Visit.objects.create(patient=Patient.objects.first(), doctor=doctors[0], date=terms[0],
+                                 procedure=Procedure.objects.first())
+    cached_schedule, _ = get_schedule(specialization, week)
+    assert get_week_schedule_stats()['misses'] == 4
+    assert cached_schedule[doctors[0]][1][0].find_visit() == visit.id
+
+    visit.delete()
+    cached_schedule, _ = get_schedule(specialization, week)
+    assert cached_schedule[doctors[0]][1][0].is_available()
+
+    create_terms([(week[3], datetime.time(8, 0), datetime.time(8, 20))], doctors[0], office)
+    cached_schedule, _ = get_schedule(specialization, week)
+    assert len(cached_schedule[doctors[0]][3]) == 1
+
+    terms[2].delete()
+    cached_schedule, _ = get_schedule(specialization, week)
+    assert len(cached_schedule[doctors[0]][1]) == 2
+
+    new_doctor = fake_doctor(specializations=[specialization])
+    cached_schedule, _ = get_schedule(specialization, week)
+    assert cached_schedule[new_doctor] == [[] for _ in week]
+    assert get_week_schedule_stats() == {'hits': 4, 'misses': 8}
+
+    get_schedule(specialization, next_week)
+    terms[1].date = next_week[1]
+    terms[1].save()
+    cached_schedule, _ = get_schedule(specialization, week)
+    assert [term.id for term in cached_schedule[doctors[0]][1]] == [terms[0].id]
+    cached_schedule, _ = get_schedule(specialization, next_week)
+    assert [term.id for term in cached_schedule[doctors[0]][1]] == [terms[1].id]
+
+    visit = Visit.objects.create(patient=Patient.objects.first(), doctor=doctors[0], date=terms[0],
+                                 procedure=Procedure.objects.first())
+    get_schedule(specialization, week)
+    get_schedule(specialization, next_week)
+    visit = Visit.objects.get(pk=visit.pk)
+    visit.date_id = terms[1].id
+    visit.save()
+    cached_schedule, _ = get_schedule(specialization, week)
+    assert cached_schedule[doctors[0]][1][0].is_available()
+    cached_schedule, _ = get_schedule(specialization, next_week)
+    assert cached_schedule[doctors[0]][1][0].find_visit() == visit.id
+
+
+@pytest.mark.django_db
+def test_availability_api(client, set_up):
+    """Tests if availability API returns columnar terms data and supports conditional requests."""
+    specialization = Specialization.objects.create(name='Schedule test')
+    office = Office.objects.create(number=1000)
+    doctor = fake_doctor(specializations=[specialization])
+    monday, _ = get_week_start_and_end(1)
+    terms = fake_day_terms(doctor, monday.date() + datetime.timedelta(days=2), office, 3)
+    visit = Visit.objects.create(patient=Patient.objects.first(), doctor=doctor, date=terms[1],
+                                 procedure=Procedure.objects.first())
+
+    response = client.get(f'/api/specialization/{specialization.id}/availability/?week=1')
+    assert response.status_code == 200
+    assert 'max-age' in response['Cache-Control']
+    data = response.json()
+    assert data['dates'][0] == monday.date().isoformat()
+    assert len(data['dates']) == 6
+    assert data['doctors'] == [{
+        'id': doctor.id,
+        'name': f"{doctor.get_title_or_degree_display()} {doctor.name}",
+        'term_ids': [term.id for term in terms],
+        'days': [2, 2, 2],
+        'starts': [480, 500, 520],
+        'ends': [500, 520, 540],
+        'booked': [False, True, False],
+    }]
+
+    response = client.get(f'/api/specialization/{specialization.id}/availability/?week=1',
+                          HTTP_IF_NONE_MATCH=response['ETag'])
+    assert response.status_code == 304
+    etag = response['ETag']
+    visit.delete()
+    response = client.get(f'/api/specialization/{specialization.id}/availability/?week=1', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()['doctors'][0]['booked'] == [False, False, False]
+
+    date_from = monday.date() + datetime.timedelta(days=1)
+    response = client.get(f'/api/doctor/{doctor.id}/availability/?from={date_from}&to={date_from}')
+    assert response.json()['doctors'][0]['term_ids'] == []
+    response = client.get(f'/api/doctor/{doctor.id}/availability/?from={date_from}')
+    assert response.json()['doctors'][0]['term_ids'] == [term.id for term in terms]
+    assert response.json()['doctors'][0]['days'] == [1, 1, 1]
+
+    assert client.get(f'/api/doctor/{doctor.id}/availability/?from=tomorrow').status_code == 400
+    assert client.get(f'/api/doctor/{doctor.id}/availability/?from=2030-01-10&to=2030-01-01').status_code == 400
+    assert client.get(f'/api/doctor/{doctor.id}/availability/?from=2030-01-01&to=2030-12-31').status_code == 400
+    assert client.get(f'/api/specialization/{specialization.id}/availability/?week=x').status_code == 400
+    assert client.get('/api/doctor/0/availability/').status_code == 404
+
+
+@pytest.mark.django_db
+def test_find_earliest_free_term(client, set_up):
+    """Tests if the earliest free future term matching filters is found with a single query."""
+    Term.objects.all().delete()
+    specialization, other_specialization = Specialization.objects.all()[:2]
+    procedure = Procedure.objects.first()
+    doctors = [fake_doctor(specializations=[specialization], procedures=[procedure]),
+               fake_doctor(specializations=[other_specialization])]
+    office = Office.objects.create(number=1000)
+    other_office = Office.objects.create(number=1001)
+    today = datetime.date.today()
+    tomorrow, later = today + datetime.timedelta(days=1), today + datetime.timedelta(days=3)
+    today_terms = fake_day_terms(doctors[0], today, office, 3)
+    tomorrow_terms = fake_day_terms(doctors[0], tomorrow, office, 3)
+    later_terms = fake_day_terms(doctors[1], later, other_office, 1)
+    Visit.objects.create(patient=Patient.objects.first(), doctor=doctors[0], date=tomorrow_terms[0],
+                         procedure=procedure)
+    now = datetime.datetime.combine(today, datetime.time(23, 0))
+
+    with CaptureQueriesContext(connection) as queries:
+        term = find_earliest_free_term(now=now)
+        assert term.doctor.name == doctors[0].name
+    assert len(queries) == 1
+    assert term == tomorrow_terms[1]
+
+    now = datetime.datetime.combine(today, datetime.time(8, 10))
+    assert find_earliest_free_term(now=now) == today_terms[1]
+    assert find_earliest_free_term(specialization=other_specialization, now=now) == later_terms[0]
+    assert find_earliest_free_term(doctor=doctors[1], now=now) == later_terms[0]
+    assert find_earliest_free_term(procedure=procedure, date_from=later, now=now) is None
+    assert find_earliest_free_term(date_from=tomorrow, now=now) == tomorrow_terms[1]
+    assert find_earliest_free_term(date_from=tomorrow, date_to=tomorrow, doctor=doctors[1], now=now) is None
+
+    response = client.get('/find_term/')
+    assert response.status_code == 200
+    assert response.context['term'] is None
+    response = client.get(f'/find_term/?specialization={other_specialization.id}&date_from={later}')
+    assert response.context['term'] == later_terms[0]
+    response = client.get(f'/find_term/?date_from={later}&date_to={tomorrow}')
+    assert not response.context['form'].is_valid()
+
+
+@pytest.mark.django_db
+def test_query_plans_use_indexes(set_up):
+    """Tests if queries of schedules, collision checks, free term search and visit lists use matching indexes."""
+    doctor = Doctor.objects.first()
+    patient = Patient.objects.first()
+    office = Office.objects.first()
+    today = datetime.date.today()
+
+    plans = {
+        'term_doctor_date_hour_idx': Term.objects.filter(doctor=doctor, date__gte=today).order_by('date', 'hour_from'),
+        'term_date_office_hour_idx': Term.objects.filter(date=today, office=office).overlapping(
+            datetime.time(8, 0), datetime.time(9, 0)
+        ),
+        'term_date_hour_idx': Term.objects.filter(date__gte=today).order_by('date', 'hour_from'),
+        'visit_patient_date_idx': Visit.objects.filter(patient=patient).values('date'),
+        'visit_doctor_date_idx': Visit.objects.filter(doctor=doctor).values('date'),
+    }
+    for index, queryset in plans.items():
+        assert index in explain(queryset), index
+
+    term_visit_plan = explain(Visit.objects.filter(date=Term.objects.first()))
+    assert 'visit_unique_term' in term_visit_plan or 'sqlite_autoindex_e_clinic_app_visit' in term_visit_plan
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_views(client, set_up):
+    """Tests if async views return the same data as their sync versions and record stats of async requests."""
+    async_client = AsyncClient()
+    specialization = Specialization.objects.create(name='Schedule test')
+    doctor = fake_doctor(specializations=[specialization], procedures=[Procedure.objects.first()])
+    patient = Patient.objects.first()
+    monday, _ = get_week_start_and_end(1)
+    terms = fake_day_terms(doctor, monday.date(), Office.objects.create(number=1000), 3)
+    Visit.objects.create(patient=patient, doctor=doctor, date=terms[0], procedure=Procedure.objects.first())
+
+    def get(url, **extra):
+        async def request():
+            return await async_client.get(url, **extra)
+        return async_to_sync(request)()
+
+    for url in (f'api/specialization/{specialization.id}/availability/?week=1',
+                f'api/doctor/{doctor.id}/availability/?from={monday.date()}'):
+        response = get(f'/async/{url}')
+        assert response.status_code == 200
+        assert response.json() == client.get(f'/{url}').json()
+        assert get(f'/async/{url}', **{'If-None-Match': response['ETag']}).status_code == 304
+    assert get(f'/async/api/specialization/{specialization.id}/availability/?week=x').status_code == 400
+    assert get('/async/api/doctor/0/availability/').status_code == 404
+
+    response = get(f'/async/specialization/{specialization.id}/?week=1')
+    assert response.status_code == 200
+    assert doctor.name in response.content.decode()
+    sync_response = client.get(f'/specialization/{specialization.id}/?week=1')
+    assert [[term.id for term in day] for day in response.context['doctor_week_terms'][doctor]] == \
+        [[term.id for term in day] for day in sync_response.context['doctor_week_terms'][doctor]]
+
+    assert get('/async/yourvisits/').status_code == 302
+    async_client.force_login(user=patient.user)
+    client.force_login(user=patient.user)
+    response = get('/async/yourvisits/')
+    assert response.status_code == 200
+    assert response.context['visit_sections'] == client.get('/yourvisits/').context['visit_sections']
+    assert get(f'/async/specialization/{specialization.id}/').status_code == 200
+
+    stats = {row['url_name']: row for row in request_stats.summary()}
+    assert stats['async-user-visits']['requests'] == 2
+    assert stats['async-user-visits']['queries'] > 0
+
+    connects = []
+
+    def count_connect(sender, connection, **kwargs):
+        connects.append(connection)
+
+    connection_created.connect(count_connect)
+    try:
+        for _ in range(3):
+            assert get('/async/yourvisits/').status_code == 200
+    finally:
+        connection_created.disconnect(count_connect)
+    assert len(connects) <= settings.ASYNC_DATABASE_WORKERS
+
+
+@pytest.mark.django_db
+def test_term_with_availability(set_up):
+    """Tests if annotated availability matches Term methods and doesn't need queries per term."""
+    doctor = Doctor.objects.first()
+    office = Office.objects.create(number=1000)
+    tomorrow = datetime.date.today() + datetime.timedelta(days=1)
+    terms = fake_day_terms(doctor, tomorrow, office, 3)
+    visit = Visit.objects.create(patient=Patient.objects.first(), doctor=doctor, date=terms[0],
+                                 procedure=Procedure.objects.first())
+    now = datetime.datetime.combine(tomorrow, datetime.time(8, 30))
+
+    annotated = list(Term.objects.filter(id__in=[term.id for term in terms]).with_availability(now).order_by('hour_from'))
+    with CaptureQueriesContext(connection) as queries:
+        assert [term.is_booked for term in annotated] == [True, False, False]
+        assert [term.is_from_past() for term in annotated] == [True, True, False]
+        assert [term.is_available() for term in annotated] == [False, False, True]
+        assert annotated[0].find_visit() == visit.id
+    assert len(queries) == 0
+
+    assert [term.is_from_past(now) for term in terms] == [True, True, False]
+    assert [term.is_available(now) for term in terms] == [False, False, True]
+    assert terms[0].find_visit() == visit.id
+
+
+@pytest.mark.django_db
+def test_term_add_form_overlap(set_up):
+    """Tests if form rejects terms intersecting with terms of the same office or doctor but allows adjacent ones."""
+    doctor = Doctor.objects.first()
+    other_doctor = fake_doctor()
+    office = Office.objects.create(number=1000)
+    other_office = Office.objects.create(number=1001)
+    date = datetime.date.today() + datetime.timedelta(days=1)
+    if date.weekday() == 6:
+        date += datetime.timedelta(days=1)
+    fake_day_terms(other_doctor, date, office, 1, visit_time=60)
+
+    def is_valid(hour_from, hour_to, office_id, user):
+        data = {'date': date, 'hour_from': hour_from, 'hour_to': hour_to, 'office': office_id}
+        return TermAddForm(data, user=user).is_valid()
+
+    assert is_valid('07:00', '08:00', office.id, doctor.user)
+    assert is_valid('09:00', '10:00', office.id, doctor.user)
+    assert not is_valid('07:30', '08:30', office.id, doctor.user)
+    assert not is_valid('08:20', '08:40', office.id, doctor.user)
+    assert not is_valid('07:00', '10:00', office.id, doctor.user)
+    assert not is_valid('08:30', '08:30', other_office.id, doctor.user)
+    assert is_valid('08:00', '09:00', other_office.id, doctor.user)
+    assert not is_valid('08:00', '09:00', other_office.id, other_doctor.user)
+
+
+@pytest.mark.django_db
+def test_specializations_context_processor_cache(client, set_up):
+    """Tests if navbar specializations are queried once and cache is invalidated after specialization changes."""
+    def count_specialization_queries():
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/procedures/')
+        assert response.status_code == 200
+        return response, len([query for query in queries if 'e_clinic_app_specialization' in query['sql']])
+
+    response, specialization_queries = count_specialization_queries()
+    assert specialization_queries == 1
+    assert len(list(response.context['specializations_ctxp'])) == 10
+
+    response, specialization_queries = count_specialization_queries()
+    assert specialization_queries == 0
+
+    specialization = Specialization.objects.create(name='Cache test')
+    response, specialization_queries = count_specialization_queries()
+    assert specialization_queries == 1
+    assert specialization in response.context['specializations_ctxp']
+
+    specialization.delete()
+    response, specialization_queries = count_specialization_queries()
+    assert specialization not in response.context['specializations_ctxp']
+
+    request = RequestFactory().get('/')
+    with CaptureQueriesContext(connection) as queries:
+        specializations_ctxp(request)
+    assert len(queries) == 0
+
+
+@pytest.mark.django_db
+def test_request_stats(client, set_up):
+    """Tests if requests are recorded by middleware and stats page is available only for staff."""
+    procedure = Procedure.objects.first()
+    for _ in range(3):
+        client.get(f'/procedure/{procedure.id}/')
+    client.get('/procedures/')
+
+    stats = {row['url_name']: row for row in request_stats.summary()}
+    assert stats['procedure-detail']['requests'] == 3
+    assert stats['procedure-detail']['queries'] >= 3
+    assert stats['procedures']['requests'] == 1
+    assert len(stats['procedure-detail']['slowest_queries']) <= 5
+
+    response = client.get('/admin/request_stats/')
+    assert response.status_code == 302
+
+    staff = User.objects.create_user(username='staff', password='staff', is_staff=True)
+    client.force_login(user=staff)
+    response = client.get('/admin/request_stats/')
+    assert response.status_code == 200
+    assert 'procedure-detail' in [row['url_name'] for row in response.context['stats']]
+
+
 @pytest.mark.django_db
 def test_procedures_list_view(client, set_up):
     response = client.get('/procedures/')
@@ -60,6 +515,128 @@ def test_procedure_detail_view(client, set_up):
     assert response.context.get('procedure') == procedure
 
 
+@pytest.mark.django_db
+def test_procedure_and_doctor_detail_views_query_count(client, set_up):
+    """Tests if number of queries of procedure and doctor detail views doesn't grow with number of doctors."""
+    procedure = Procedure.objects.create(name='Query count test', price=100)
+    specializations = list(Specialization.objects.all()[:3])
+    client.get('/procedures/')
+
+    def count_queries(url):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        assert response.status_code == 200
+        return len(queries)
+
+    doctor = fake_doctor(specializations=specializations, procedures=[procedure])
+    procedure_queries = count_queries(f'/procedure/{procedure.id}/')
+    doctor_queries = count_queries(f'/doctor/{doctor.id}/')
+
+    for _ in range(5):
+        fake_doctor(specializations=specializations[1:], procedures=[procedure])
+    fake_doctor(procedures=[procedure])
+    assert count_queries(f'/procedure/{procedure.id}/') == procedure_queries
+    assert count_queries(f'/doctor/{doctor.id}/') == doctor_queries
+
+    response = client.get(f'/procedure/{procedure.id}/')
+    assert f'/specialization/{min(s.id for s in specializations)}/' in response.content.decode()
+    assert doctor.primary_specialization == doctor.specializations.order_by('id').first()
+
+
+@pytest.mark.django_db
+def test_doctor_primary_specialization(set_up):
+    """Tests if primary specialization is kept in sync with changes of specializations made from both sides."""
+    first, second, third = Specialization.objects.order_by('id')[:3]
+    doctor = fake_doctor(specializations=[second, third])
+    assert doctor.primary_specialization == second
+    assert doctor.get_schedule_url() == f'/specialization/{second.id}/'
+
+    doctor.specializations.add(first)
+    assert doctor.primary_specialization == first
+
+    doctor.specializations.remove(first)
+    assert doctor.primary_specialization == second
+
+    second.doctor_set.remove(doctor)
+    doctor.refresh_from_db()
+    assert doctor.primary_specialization == third
+
+    first.doctor_set.add(doctor)
+    doctor.refresh_from_db()
+    assert doctor.primary_specialization == first
+
+    first.delete()
+    doctor.refresh_from_db()
+    assert doctor.primary_specialization == third
+
+    third.doctor_set.clear()
+    doctor.refresh_from_db()
+    assert doctor.primary_specialization is None
+    assert doctor.get_schedule_url() == f'/doctor/{doctor.id}/'
+
+
+@pytest.mark.django_db
+def test_catalog_views_cache(client, set_up):
+    """Tests if catalog pages are served from cache until catalog changes and conditional GET is supported."""
+    procedure = Procedure.objects.first()
+    doctor = fake_doctor(specializations=Specialization.objects.all()[:2], procedures=[procedure])
+    urls = ['/specializations/', '/procedures/', f'/procedure/{procedure.id}/', f'/doctor/{doctor.id}/']
+
+    def count_queries(url, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url, **headers)
+        return response, len(queries)
+
+    for url in urls:
+        response, queries_on_miss = count_queries(url)
+        assert response.status_code == 200
+        response, queries_on_hit = count_queries(url)
+        assert response.status_code == 200
+        assert queries_on_hit < queries_on_miss
+
+        etag = response['ETag']
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        assert response.status_code == 304
+
+    etag = client.get(f'/procedure/{procedure.id}/')['ETag']
+    doctor.user.last_name = 'Changedname'
+    with CaptureQueriesContext(connection) as queries:
+        doctor.user.save()
+    assert len(queries) == 1
+    with CaptureQueriesContext(connection) as queries:
+        User.objects.create_user(username='new_user')
+    assert len(queries) == 1
+    response = client.get(f'/procedure/{procedure.id}/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert 'Changedname' in response.content.decode()
+
+    procedure.name = 'Changed procedure'
+    procedure.save()
+    assert 'Changed procedure' in client.get(f'/procedure/{procedure.id}/').content.decode()
+    assert 'Changed procedure' in client.get('/procedures/').content.decode()
+
+    specialization = Specialization.objects.create(name='New specialization')
+    doctor.specializations.add(specialization)
+    assert 'New specialization' in client.get(f'/doctor/{doctor.id}/').content.decode()
+    assert 'New specialization' in client.get('/specializations/').content.decode()
+
+    anonymous_etag = client.get('/procedures/')['ETag']
+    client.force_login(user=doctor.user)
+    assert client.get('/procedures/')['ETag'] != anonymous_etag
+
+    doctor = fake_doctor()
+    client.force_login(user=doctor.user)
+    etag = client.get(f'/doctor/{doctor.id}/')['ETag']
+    response = client.post('/add_term/', fake_term(doctor, multiple=False))
+    assert response.url == f'/doctor/{doctor.id}/'
+    response = client.get(response.url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert "Term was added successfully." in response.content.decode()
+    assert client.get(f'/doctor/{doctor.id}/', HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+
 @pytest.mark.django_db
 def test_doctor_detail_view(client, set_up):
     doctor = Doctor.objects.first()
@@ -125,6 +702,44 @@ def test_user_visits_view(client, set_up):
     assert response.context.get('visit_list').count() == 1
 
 
+@pytest.mark.django_db
+def test_user_visits_view_pagination(client, set_up):
+    """Tests if visits are split into upcoming and past ones, paginated by cursor and loaded in constant queries."""
+    patient = Patient.objects.first()
+    doctor = Doctor.objects.first()
+    procedure = Procedure.objects.first()
+    office = Office.objects.create(number=1000)
+    Visit.objects.all().delete()
+    today = datetime.date.today()
+    upcoming = []
+    for days in (1, 2):
+        upcoming += fake_day_terms(doctor, today + datetime.timedelta(days=days), office, 15)
+    past = fake_day_terms(doctor, today - datetime.timedelta(days=1), office, 5)
+    for term in upcoming + past:
+        Visit.objects.create(patient=patient, doctor=doctor, date=term, procedure=procedure)
+
+    client.force_login(user=patient.user)
+    client.get('/yourvisits/')
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get('/yourvisits/')
+    queries_count = len(queries)
+    assert [visit.date for visit in response.context['upcoming_visits']] == upcoming[:20]
+    assert [visit.date for visit in response.context['past_visits']] == past[::-1]
+    assert response.context['past_next_url'] is None
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(f"/yourvisits/{response.context['upcoming_next_url']}")
+    assert len(queries) == queries_count
+    assert [visit.date for visit in response.context['upcoming_visits']] == upcoming[20:]
+    assert response.context['upcoming_next_url'] is None
+    assert response.context['upcoming_first_url'] == '?'
+
+    for cursor in ('invalid_cursor_value', f'{today}_08:00:00_abc', f'{today}_25:00:00_1', '__'):
+        response = client.get(f'/yourvisits/?upcoming={cursor}')
+        assert response.status_code == 200
+        assert [visit.date for visit in response.context['upcoming_visits']] == upcoming[:20]
+
+
 @pytest.mark.django_db
 def test_user_visit_view(client, set_up):
     """Tests if only doctors and patients have permission to see their visit and the display of visit is valid."""
@@ -225,9 +840,9 @@ def test_logout_view(client, set_up):
 @pytest.mark.django_db
 def test_register_visit_view(client, set_up):
     """Tests if visit through view with form was added correctly."""
-    term = Term.objects.first()
     patient = Patient.objects.first()
     doctor = Doctor.objects.first()
+    term = fake_day_terms(doctor, datetime.date.today() + datetime.timedelta(days=1), Office.objects.first(), 1)[0]
 
     response = client.get(f'/register_visit/{doctor.id}/{term.date}/{term.hour_from}/')
     assert response.status_code == 302
@@ -252,6 +867,47 @@ def test_register_visit_view(client, set_up):
     assert count_after_create == count_before_create + 1
 
 
+@pytest.mark.django_db
+def test_register_visit_view_taken_term(client, set_up):
+    """Tests if booking of already booked or past term is rejected and no visit is created."""
+    patient = Patient.objects.first()
+    doctor = Doctor.objects.first()
+    booked_term = Visit.objects.first().date
+    past_term = fake_day_terms(doctor, datetime.date.today() - datetime.timedelta(days=1), Office.objects.first(), 1)[0]
+    procedure = doctor.procedures.first()
+
+    client.force_login(user=patient.user)
+    for term in (booked_term, past_term):
+        count_before_create = Visit.objects.count()
+        post_response = client.post(f'/register_visit/{doctor.id}/{term.date}/{term.hour_from}/',
+                                    {'procedure': procedure.id})
+        assert post_response.status_code == 409
+        assert TERM_TAKEN_MESSAGE in post_response.context['form'].non_field_errors()
+        assert Visit.objects.count() == count_before_create
+
+
+@pytest.mark.django_db(transaction=True)
+def test_book_visit_concurrently(set_up):
+    """Tests if exactly one of many patients booking the same term at the same time gets it."""
+    doctor = Doctor.objects.first()
+    procedure = doctor.procedures.first()
+    term = fake_day_terms(doctor, datetime.date.today() + datetime.timedelta(days=1), Office.objects.first(), 1)[0]
+    patients = [Patient.objects.first()] * 8
+
+    results = run_concurrently(lambda patient: book_visit(patient, doctor, term, procedure), patients)
+    # SQLite (unlike PostgreSQL) may also reject concurrent write transactions with "database table is locked",
+    # such bookings are retried (one by one) like a client would do
+    assert all(isinstance(result, (Visit, ValidationError, DatabaseError)) for result in results)
+    for index, result in enumerate(results):
+        if isinstance(result, DatabaseError):
+            results[index] = run_concurrently(lambda patient: book_visit(patient, doctor, term, procedure),
+                                              [patients[index]])[0]
+
+    assert len([result for result in results if isinstance(result, Visit)]) == 1
+    assert all(isinstance(result, (Visit, ValidationError)) for result in results)
+    assert Visit.objects.filter(date=term).count() == 1
+
+
 @pytest.mark.django_db
 def test_signup_view(client, set_up):
     user_count_before_create = User.objects.count()
@@ -272,7 +928,8 @@ def test_signup_view(client, set_up):
         'phone_number': '48505958860'
     }
 
-    post_response = client.post(f'/signup/', fake_patient)
+    with CaptureQueriesContext(connection) as queries:
+        post_response = client.post(f'/signup/', fake_patient)
 
     assert post_response.status_code == 302
     assert post_response.url == '/login/'
@@ -282,9 +939,16 @@ def test_signup_view(client, set_up):
     assert user_count_after_create == user_count_before_create + 1
     assert patient_count_after_create == patient_count_before_create + 1
 
+    # User is created with a single insert, with password hashed in advance (in the pool of hashing processes)
+    user_writes = [query['sql'] for query in queries if query['sql'].startswith(('INSERT INTO "auth_user"',
+                                                                                 'UPDATE "auth_user"'))]
+    assert len(user_writes) == 1
+    assert User.objects.get(username=fake_patient['username']).check_password('superstrongpassword12345')
+    assert get_hashing_pool()[0] is not None
+
 
 @pytest.mark.django_db
-def test_add_term_view(client, set_up):
+def test_add_term_view(client, set_up, monkeypatch):
     """Tests if term through view with form was added correctly."""
     term_count_before_create = Term.objects.count()
     patient = Patient.objects.first()
@@ -312,6 +976,27 @@ def test_add_term_view(client, set_up):
     assert post_response.url == f'/specialization/{doctor.specializations.first().id}/'
     assert term_count_after_create == term_count_before_create + 1
 
+    other_doctor = fake_doctor()
+    office = Office.objects.create(number=1000)
+    monday = datetime.date.today() + datetime.timedelta(days=7 - datetime.date.today().weekday())
+    data = {'date': monday, 'hour_from': '08:00', 'hour_to': '08:20', 'office': office.id}
+    is_valid = TermAddForm.is_valid
+
+    def is_valid_with_concurrent_insert(form):
+        """Inserts the same term of other doctor after validation, like concurrent request would."""
+        valid = is_valid(form)
+        Term.objects.create(doctor=other_doctor, **form.cleaned_data)
+        return valid
+
+    term_count_before_create = Term.objects.count()
+    monkeypatch.setattr(TermAddForm, 'is_valid', is_valid_with_concurrent_insert)
+    post_response = client.post(f'/add_term/', data)
+    assert post_response.status_code == 200
+    assert post_response.context['form'].non_field_errors() == [
+        "Office was occupied in the meantime, please try again."
+    ]
+    assert Term.objects.count() == term_count_before_create + 1
+
 
 @pytest.mark.django_db
 def test_add_multiple_term_view(client, set_up):
@@ -342,6 +1027,121 @@ def test_add_multiple_term_view(client, set_up):
     assert term_count_after_create == term_count_before_create + int(minutes_for_visits/time_for_visit)
 
 
+@pytest.mark.django_db
+def test_add_multiple_term_view_for_many_days(client, set_up):
+    """Tests if terms are added for every day of the range (except Sundays) at once and collisions are reported."""
+    doctor = Doctor.objects.first()
+    office = Office.objects.create(number=1000)
+    monday = datetime.date.today() + datetime.timedelta(days=7 - datetime.date.today().weekday())
+    data = {'date': monday, 'date_to': monday + datetime.timedelta(days=27), 'hour_from': '08:00',
+            'hour_to': '14:00', 'office': office.id, 'visit_time': 20}
+
+    client.force_login(user=doctor.user)
+    term_count_before_create = Term.objects.count()
+    with CaptureQueriesContext(connection) as queries:
+        post_response = client.post('/add_multiple_term/', data)
+    assert post_response.status_code == 302
+    assert Term.objects.count() == term_count_before_create + 24 * 18
+    assert not doctor.term_set.filter(office=office, date__week_day=1).exists()
+    inserts = [query for query in queries if query['sql'].startswith('INSERT')]
+    assert 0 < len(inserts) < 24
+
+    other_doctor = fake_doctor()
+    other_office = Office.objects.create(number=1001)
+    tuesday = monday + datetime.timedelta(days=1)
+    fake_day_terms(other_doctor, tuesday, other_office, 1, visit_time=60)
+    data.update({'hour_from': '07:00', 'hour_to': '09:00', 'office': other_office.id})
+
+    client.force_login(user=other_doctor.user)
+    term_count_before_create = Term.objects.count()
+    post_response = client.post('/add_multiple_term/', data)
+    assert post_response.status_code == 200
+    assert Term.objects.count() == term_count_before_create
+    errors = post_response.context['form'].non_field_errors()
+    assert len(errors) == 3
+    assert f"Office is already occupied in this term: {tuesday} 08:20-08:40" in errors
+
+    data.update({'hour_from': '10:00', 'hour_to': '10:30', 'visit_time': 60})
+    post_response = client.post('/add_multiple_term/', data)
+    assert post_response.status_code == 200
+    assert Term.objects.count() == term_count_before_create
+    assert post_response.context['form'].non_field_errors() == [
+        "Visit time is longer than the given hours, no terms can be added!"
+    ]
+
+
+@pytest.mark.django_db
+def test_generate_terms_command(set_up):
+    """Tests if terms are generated from schedule templates only once and only for missing dates."""
+    doctor = Doctor.objects.first()
+    office = Office.objects.create(number=1000)
+    ScheduleTemplate.objects.create(doctor=doctor, office=office, weekday=1, hour_from=datetime.time(8, 0),
+                                    hour_to=datetime.time(10, 0), visit_time=30)
+    ScheduleTemplate.objects.create(doctor=doctor, office=office, weekday=3, hour_from=datetime.time(12, 0),
+                                    hour_to=datetime.time(13, 0), visit_time=20)
+    next_monday = datetime.date.today() + datetime.timedelta(days=7 - datetime.date.today().weekday())
+    fake_day_terms(doctor, next_monday, office, 1, visit_time=30)
+
+    def expected_terms(days):
+        dates = [datetime.date.today() + datetime.timedelta(days=n) for n in range(days + 1)]
+        return 4 * len([date for date in dates if date.weekday() == 0]) + \
+            3 * len([date for date in dates if date.weekday() == 2])
+
+    call_command('generate_terms', days=14, stdout=StringIO())
+    assert Term.objects.filter(office=office).count() == expected_terms(14)
+
+    call_command('generate_terms', days=14, stdout=StringIO())
+    assert Term.objects.filter(office=office).count() == expected_terms(14)
+
+    call_command('generate_terms', days=30, stdout=StringIO())
+    assert Term.objects.filter(office=office).count() == expected_terms(30)
+    assert not Term.objects.filter(office=office).exclude(date__week_day__in=[2, 4]).exists()
+
+
+@pytest.mark.django_db
+def test_archive_past_command(set_up):
+    """Tests if old visits are archived and old free terms deleted in batches, leaving recent and future ones."""
+    Term.objects.all().delete()
+    doctor = Doctor.objects.first()
+    patient = Patient.objects.first()
+    procedure = Procedure.objects.first()
+    office = Office.objects.create(number=1000)
+    today = datetime.date.today()
+    old_terms = fake_day_terms(doctor, today - datetime.timedelta(days=100), office, 3) + \
+        fake_day_terms(doctor, today - datetime.timedelta(days=95), office, 3)
+    recent_terms = fake_day_terms(doctor, today - datetime.timedelta(days=10), office, 2)
+    future_terms = fake_day_terms(doctor, today + datetime.timedelta(days=10), office, 2)
+    old_visits = [Visit.objects.create(patient=patient, doctor=doctor, date=term, procedure=procedure)
+                  for term in old_terms[::2]]
+    recent_visit = Visit.objects.create(patient=patient, doctor=doctor, date=recent_terms[0], procedure=procedure)
+
+    with CaptureQueriesContext(connection) as queries:
+        assert archive_visits(today - datetime.timedelta(days=90), batch_size=2) == 2
+    queries_for_batch = len(queries)
+    with CaptureQueriesContext(connection) as queries:
+        assert archive_visits(today - datetime.timedelta(days=90), batch_size=1) == 1
+    assert len(queries) == queries_for_batch
+    assert ArchivedVisit.objects.count() == 2 + 1
+
+    output = StringIO()
+    call_command('archive_past', days=90, batch_size=2, stdout=output)
+    assert "Archived 0 visits and deleted 3 free terms" in output.getvalue()
+    call_command('archive_past', days=90, stdout=output)
+
+    assert not Visit.objects.filter(id__in=[visit.id for visit in old_visits]).exists()
+    assert not Term.objects.filter(id__in=[term.id for term in old_terms]).exists()
+    assert ArchivedVisit.objects.count() == len(old_visits)
+    assert Visit.objects.filter(id=recent_visit.id).exists()
+    assert Term.objects.filter(id__in=[term.id for term in recent_terms + future_terms]).count() == 4
+
+    archived = ArchivedVisit.objects.get(visit_id=old_visits[0].id)
+    assert (archived.patient, archived.doctor, archived.procedure) == (patient, doctor, procedure)
+    assert (archived.date, archived.hour_from, archived.hour_to) == (
+        old_terms[0].date, old_terms[0].hour_from, old_terms[0].hour_to
+    )
+    assert (archived.office_number, archived.price) == (1000, procedure.price)
+
+
 @pytest.mark.django_db
 def test_change_password_view(client, set_up):
     username = 'test_user'
@@ -418,4 +1218,346 @@ def test_edit_user_view(client, set_up):
     assert user.last_name == new_last_name
     assert user.email == new_email
     assert patient.identification_type == new_identification_type
-    assert patient.phone_number == '48505958860'
\ No newline at end of file
+    assert patient.phone_number == '48505958860'
+
+
+@pytest.mark.django_db
+def test_role_middleware(client, set_up):
+    """Tests if role and profile of the user are cached in the session and resolved again after profile changes."""
+    specialization = Specialization.objects.filter(doctor__isnull=False).first()
+    doctor = specialization.doctor_set.first()
+    patient = Patient.objects.first()
+    staff = User.objects.create_user(username='staff', password='staff', is_staff=True)
+
+    response = client.get(f'/specialization/{specialization.id}/')
+    assert response.wsgi_request.role == ''
+    assert ROLE_SESSION_KEY not in client.session
+
+    for user, role, profile in [(patient.user, 'patient', patient), (doctor.user, 'doctor', doctor), (staff, '', None)]:
+        client.force_login(user=user)
+        assert client.session[ROLE_SESSION_KEY] == [user.pk, role, profile and profile.pk, get_role_version(user.pk)]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'/specialization/{specialization.id}/')
+        assert response.status_code == 200
+        assert response.wsgi_request.role == role
+        assert response.wsgi_request.profile == profile
+        # Role is taken from the session, reverse one-to-one relations of the user are not looked up
+        assert not [query for query in queries if '"e_clinic_app_patient"."user_id" =' in query['sql']]
+        assert len([query for query in queries if '"e_clinic_app_doctor"."user_id" =' in query['sql']]) <= 1
+
+    # Role cached for another user is resolved again
+    client.force_login(user=doctor.user)
+    session = client.session
+    session[ROLE_SESSION_KEY] = [patient.user.pk, 'patient', patient.pk]
+    session.save()
+    response = client.get('/yourvisits/')
+    assert response.wsgi_request.role == 'doctor'
+    assert client.session[ROLE_SESSION_KEY][:3] == [doctor.user.pk, 'doctor', doctor.pk]
+
+    # Role is resolved again after profile of the user is deleted or created
+    client.force_login(user=patient.user)
+    assert client.get('/edit_user/').status_code == 200
+    Patient.objects.filter(pk=patient.pk).delete()
+    response = client.get('/edit_user/')
+    assert response.status_code == 302
+    assert response.wsgi_request.role == ''
+    new_doctor = fake_doctor()
+    client.force_login(user=new_doctor.user)
+    Doctor.objects.filter(pk=new_doctor.pk).delete()
+    new_patient = Patient.objects.create(user=new_doctor.user, pesel=fake.unique.pesel(), phone_number='48100000009',
+                                         identification_type=1)
+    response = client.get('/edit_user/')
+    assert response.status_code == 200
+    assert response.wsgi_request.profile == new_patient
+
+    # Profile deleted without bumped version (f.e. in process with other cache) is checked when it's used
+    session = client.session
+    session[ROLE_SESSION_KEY] = [new_doctor.user.pk, 'patient', new_patient.pk, get_role_version(new_doctor.user.pk)]
+    session.save()
+    Patient.objects.filter(pk=new_patient.pk).update(user=staff)
+    assert client.get('/edit_user/').status_code == 302
+
+
+def test_batch_validators():
+    """Tests if batch validators return error codes of all values and scalar validators raise errors with them."""
+    pesels = ['88011227364', '88011227365', '8801122736', '880112273640', '8801122736a', '', None, 88011227364]
+    assert validate_pesels(pesels).tolist() == ['', 'checksum', 'invalid', 'invalid', 'invalid', 'invalid', 'invalid', '']
+
+    pwz_numbers = [1805423, '1805424', '0805423', '180542', '18054230', '18o5423']
+    assert validate_pwz_numbers(pwz_numbers).tolist() == ['', 'checksum', 'invalid', 'invalid', 'invalid', 'invalid']
+
+    phone_numbers = ['505958860', '+48505958860', '+148505958860', '+248505958860', '50595886', '48 505 958 860',
+                     '4850595886+', '']
+    assert validate_phone_numbers(phone_numbers).tolist() == ['', '', '', 'invalid', 'invalid', 'invalid', 'invalid',
+                                                              'invalid']
+    assert validate_pesels([]).tolist() == []
+
+    # Scalar validators raise errors with codes of the batch validators
+    assert pesel_validator('88011227364') == 88011227364
+    assert pwz_validator('1805423') == 1805423
+    assert phone_regex_validator('+48505958860') == '+48505958860'
+    for validator, value, code in [(pesel_validator, '88011227365', 'checksum'), (pesel_validator, '123', 'invalid'),
+                                   (pwz_validator, 1805424, 'checksum'), (phone_regex_validator, '123', 'invalid')]:
+        with pytest.raises(ValidationError) as error:
+            validator(value)
+        assert error.value.code == code
+
+
+@pytest.mark.django_db
+def test_import_people_command(client, set_up, tmp_path):
+    """Tests if valid patients and doctors are imported in chunks, invalid rows rejected and import can be resumed."""
+    pesels = [fake.unique.pesel() for _ in range(5)]
+    wrong_pesel = pesels[4][:-1] + str((int(pesels[4][-1]) + 1) % 10)
+    patient = {'first_name': 'Jan', 'last_name': 'Kowalski', 'email': 'jan@example.com', 'identification_type': '1'}
+    patients = [
+        {**patient, 'username': 'imported1', 'password': 'superstrongpassword12345', 'pesel': pesels[0],
+         'phone_number': '48100000001'},
+        {**patient, 'username': 'imported2', 'password': 'password', 'pesel': wrong_pesel, 'phone_number': '48100000002'},
+        {**patient, 'username': 'imported1', 'password': '', 'pesel': pesels[1], 'phone_number': '48100000003'},
+        {**patient, 'username': 'imported3', 'password': '', 'pesel': pesels[1], 'phone_number': '48100000004'},
+        {**patient, 'username': 'imported4', 'password': '', 'pesel': pesels[2], 'phone_number': '48100000005'},
+        {**patient, 'username': 'imported5', 'password': '', 'pesel': pesels[3], 'phone_number': '48100000005'},
+    ]
+    path = tmp_path / 'patients.csv'
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=patients[0].keys())
+        writer.writeheader()
+        writer.writerows(patients)
+
+    output = StringIO()
+    call_command('import_people', 'patient', str(path), batch_size=2, workers=2, stdout=output)
+    assert "Imported 3 patients, rejected 3 rows" in output.getvalue()
+    assert set(User.objects.filter(username__startswith='imported').values_list('username', flat=True)) == {
+        'imported1', 'imported3', 'imported4'
+    }
+    assert Patient.objects.get(user__username='imported4').phone_number == '48100000005'
+    assert client.login(username='imported1', password='superstrongpassword12345')
+    assert not User.objects.get(username='imported3').has_usable_password()
+
+    rejects = [json.loads(line) for line in (tmp_path / 'patients.csv.rejects.jsonl').read_text().splitlines()]
+    assert [(reject['row'], list(reject['errors'])) for reject in rejects] == [
+        (2, ['pesel']), (3, ['username']), (6, ['phone_number'])
+    ]
+    assert not (tmp_path / 'patients.csv.checkpoint').exists()
+
+    specialization, other_specialization = Specialization.objects.all()[:2]
+    procedures = Procedure.objects.all()[:2]
+    doctor = {'first_name': 'Anna', 'last_name': 'Nowak', 'email': 'anna@example.com', 'title_or_degree': 3,
+              'procedures': ';'.join(procedure.name for procedure in procedures)}
+    doctors = [
+        {**doctor, 'username': 'doctor1', 'pesel': pesels[4], 'pwz': 1805423, 'specializations': [specialization.name]},
+        {**doctor, 'username': 'doctor2', 'pesel': pesels[4], 'pwz': 1805423,
+         'specializations': [other_specialization.name, specialization.name]},
+        {**doctor, 'username': 'doctor3', 'pesel': fake.unique.pesel(), 'pwz': 6000001, 'specializations': ['Unknown']},
+    ]
+    path = tmp_path / 'doctors.jsonl'
+    path.write_text(''.join(json.dumps(row) + '\n' for row in doctors))
+    # Import is resumed after the first row
+    (tmp_path / 'doctors.jsonl.checkpoint').write_text(json.dumps({'processed': 1, 'imported': 0, 'rejected': 1}))
+
+    call_command('import_people', 'doctor', str(path), workers=1, stdout=output)
+    assert "Imported 1 doctors, rejected 2 rows" in output.getvalue()
+    assert not User.objects.filter(username__in=['doctor1', 'doctor3']).exists()
+    imported = Doctor.objects.get(user__username='doctor2')
+    assert imported.pwz == 1805423
+    assert set(imported.specializations.all()) == {specialization, other_specialization}
+    assert set(imported.procedures.all()) == set(procedures)
+    assert imported.primary_specialization_id == min(specialization.id, other_specialization.id)
+
+
+@pytest.mark.django_db
+def test_import_people_command_empty_file(tmp_path):
+    """Tests if files without rows (empty or with header only) are imported without errors."""
+    empty_path = tmp_path / 'patients.jsonl'
+    empty_path.write_text('')
+    header_path = tmp_path / 'patients.csv'
+    header_path.write_text('username,first_name,last_name,email,pesel,identification_type,phone_number\n')
+
+    for path in (empty_path, header_path):
+        output = StringIO()
+        call_command('import_people', 'patient', str(path), workers=1, stdout=output)
+        assert "Imported 0 patients, rejected 0 rows." in output.getvalue()
+        assert not (tmp_path / f'{path.name}.checkpoint').exists()
+        assert (tmp_path / f'{path.name}.rejects.jsonl').read_text() == ''
+
+
+@pytest.mark.django_db
+def test_import_people_command_malformed_rows(set_up, tmp_path, monkeypatch):
+    """
+    Tests if malformed lines are rejected (with their line numbers) without stopping the import, and if rejects and
+    checkpoint files are right when import is interrupted after a rejected row.
+    """
+    patient = {'first_name': 'Jan', 'last_name': 'Kowalski', 'email': 'jan@example.com', 'identification_type': 1}
+    rows = [{**patient, 'username': f'imported{n}', 'pesel': fake.unique.pesel(), 'phone_number': f'4810000000{n}'}
+            for n in range(3)]
+    path = tmp_path / 'patients.jsonl'
+    path.write_text('\n'.join([json.dumps(rows[0]), '{"username": "broken"', '', '[1, 2]', json.dumps(rows[1]),
+                               json.dumps(rows[2])]) + '\n')
+    rejects_path = tmp_path / 'patients.jsonl.rejects.jsonl'
+    checkpoint_path = tmp_path / 'patients.jsonl.checkpoint'
+
+    def interrupt(*args):
+        raise KeyboardInterrupt
+
+    # The second chunk is interrupted, so the first one (with the first malformed row) stays committed
+    chunks = iter([import_people.create_people, interrupt])
+    monkeypatch.setattr(import_people, 'create_people', lambda *args: next(chunks)(*args))
+    with pytest.raises(KeyboardInterrupt):
+        call_command('import_people', 'patient', str(path), batch_size=2, workers=1, stdout=StringIO())
+    assert json.loads(checkpoint_path.read_text()) == {'processed': 2, 'imported': 1, 'rejected': 1}
+    rejects = [json.loads(line) for line in rejects_path.read_text().splitlines()]
+    assert rejects == [{'row': 2, 'line': 2, 'data': '{"username": "broken"',
+                        'errors': {'row': rejects[0]['errors']['row']}}]
+    assert rejects[0]['errors']['row'].startswith("Malformed row: invalid JSON")
+
+    monkeypatch.undo()
+    output = StringIO()
+    call_command('import_people', 'patient', str(path), batch_size=2, workers=1, stdout=output)
+    assert "Imported 3 patients, rejected 2 rows" in output.getvalue()
+    assert set(User.objects.filter(username__startswith='imported').values_list('username', flat=True)) == {
+        'imported0', 'imported1', 'imported2'
+    }
+    rejects = [json.loads(line) for line in rejects_path.read_text().splitlines()]
+    assert [(reject['row'], reject['line'], reject['data']) for reject in rejects] == [
+        (2, 2, '{"username": "broken"'), (3, 4, '[1, 2]')
+    ]
+    assert rejects[1]['errors'] == {'row': "Malformed row: JSON object expected."}
+    assert not checkpoint_path.exists()
+
+    path = tmp_path / 'patients.csv'
+    path.write_text('username,first_name\nimported3,Jan,Kowalski\n')
+    call_command('import_people', 'patient', str(path), workers=1, stdout=StringIO())
+    rejects = [json.loads(line) for line in (tmp_path / 'patients.csv.rejects.jsonl').read_text().splitlines()]
+    assert rejects == [{
+        'row': 1, 'line': 2, 'data': {'username': 'imported3', 'first_name': 'Jan', 'null': ['Kowalski']},
+        'errors': {'row': "Malformed row: more values than columns in header."},
+    }]
+
+
+@pytest.mark.django_db
+def test_visit_export(client, set_up, tmp_path):
+    """Tests if archived and current visits matching filters are streamed to staff as CSV or JSONL."""
+    Term.objects.all().delete()
+    doctor = Doctor.objects.filter(specializations__isnull=False).first()
+    other_doctor = fake_doctor()
+    patient = Patient.objects.first()
+    procedure = Procedure.objects.first()
+    office = Office.objects.create(number=1000)
+    today = datetime.date.today()
+    old_term = fake_day_terms(doctor, today - datetime.timedelta(days=100), office, 1)[0]
+    terms = fake_day_terms(doctor, today + datetime.timedelta(days=1), office, 2)
+    other_term = fake_day_terms(other_doctor, today + datetime.timedelta(days=2), office, 1)[0]
+    old_visit = Visit.objects.create(patient=patient, doctor=doctor, date=old_term, procedure=procedure)
+    visits = [Visit.objects.create(patient=patient, doctor=doctor, date=term, procedure=procedure) for term in terms]
+    Visit.objects.create(patient=patient, doctor=other_doctor, date=other_term, procedure=procedure)
+    archive_visits(today - datetime.timedelta(days=90), batch_size=10)
+
+    response = client.get(f'/export/visits/?doctor={doctor.id}')
+    assert response.status_code == 302
+
+    staff = User.objects.create_user(username='staff', password='staff', is_staff=True)
+    client.force_login(user=staff)
+    response = client.get(f'/export/visits/?doctor={doctor.id}')
+    assert response.streaming
+    assert response['Content-Type'] == 'text/csv'
+    rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+    assert [int(row['visit_id']) for row in rows] == [old_visit.id] + [visit.id for visit in visits]
+    assert [row['archived'] for row in rows] == ['True', 'False', 'False']
+    assert rows[1] == {
+        'visit_id': str(visits[0].id), 'date': str(terms[0].date), 'hour_from': str(terms[0].hour_from),
+        'hour_to': str(terms[0].hour_to), 'doctor': doctor.name, 'patient': patient.name, 'procedure': procedure.name,
+        'price': str(procedure.price), 'office': '1000', 'archived': 'False',
+    }
+
+    specialization = doctor.specializations.first()
+    response = client.get(f'/export/visits/?format=jsonl&specialization={specialization.id}&date_from={today}')
+    assert response['Content-Type'] == 'application/x-ndjson'
+    rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+    expected = Visit.objects.filter(doctor__specializations=specialization, date__date__gte=today)
+    assert [row['visit_id'] for row in rows] == list(expected.order_by('date__date', 'date__hour_from', 'id')
+                                                     .values_list('id', flat=True))
+
+    response = client.get('/export/visits/?date_from=2022-02-02&date_to=2022-01-01')
+    assert response.status_code == 400
+
+    path = tmp_path / 'visits.jsonl'
+    call_command('export_visits', format='jsonl', output=str(path), doctor=doctor.id, date_to=str(today),
+                 stdout=StringIO())
+    assert [json.loads(line)['visit_id'] for line in path.read_text().splitlines()] == [old_visit.id]
+
+
+@pytest.mark.django_db
+def test_report(client, set_up):
+    """
+    Tests if daily rollups are built from current and archived visits and terms, and if reports computed from them
+    (with window functions) are served to staff as JSON and admin page.
+    """
+    Term.objects.all().delete()
+    specialization = Specialization.objects.first()
+    doctor = fake_doctor([specialization])
+    other_doctor = fake_doctor([specialization])
+    patient = Patient.objects.first()
+    procedure = Procedure.objects.create(name='Report procedure', price=100)
+    other_procedure = Procedure.objects.create(name='Other report procedure', price=50)
+    office = Office.objects.create(number=1000)
+    other_office = Office.objects.create(number=1001)
+    today = datetime.date.today()
+    old_date = today - datetime.timedelta(days=100)
+    tomorrow = today + datetime.timedelta(days=1)
+    old_term = fake_day_terms(doctor, old_date, office, 1)[0]
+    terms = fake_day_terms(doctor, tomorrow, office, 3)
+    other_term = fake_day_terms(other_doctor, tomorrow, other_office, 1)[0]
+    Visit.objects.create(patient=patient, doctor=doctor, date=old_term, procedure=procedure)
+    Visit.objects.create(patient=patient, doctor=doctor, date=terms[0], procedure=procedure)
+    Visit.objects.create(patient=patient, doctor=doctor, date=terms[1], procedure=other_procedure)
+    Visit.objects.create(patient=patient, doctor=other_doctor, date=other_term, procedure=procedure)
+
+    assert build_daily_rollups(old_date, tomorrow) == (4, 3)
+    archive_visits(today - datetime.timedelta(days=90), batch_size=10)
+    assert build_daily_rollups(old_date, tomorrow) == (4, 2)
+    assert DailyRevenue.objects.get(date=old_date).revenue == 100
+    assert DailyUtilization.objects.filter(date__range=(old_date, tomorrow)).count() == 3
+
+    with CaptureQueriesContext(connection) as queries:
+        rows = get_revenue_report('doctor')
+    assert len(queries) == 1
+    assert [(row['group_id'], row['visits'], row['revenue'], row['month_revenue'], row['rank'], row['running_revenue'])
+            for row in rows] == [
+        (doctor.id, 1, 100, 100, 1, 100),
+        (doctor.id, 2, 150, 250, 1, 250),
+        (other_doctor.id, 1, 100, 250, 2, 100),
+    ]
+    assert rows[0]['name'] == doctor.name
+    rows = get_revenue_report('specialization', date_from=today)
+    assert [(row['name'], row['revenue']) for row in rows] == [(specialization.name, 250)]
+    rows = get_revenue_report('procedure', date_from=today)
+    assert [(row['group_id'], row['revenue'], row['rank']) for row in rows] == [(procedure.id, 200, 1),
+                                                                          (other_procedure.id, 50, 2)]
+    rows = get_utilization_report('doctor')
+    assert [(row['group_id'], row['terms'], row['booked'], row['utilization'], row['rank']) for row in rows] == [
+        (other_doctor.id, 1, 1, 1.0, 1),
+        (doctor.id, 4, 3, 0.75, 2),
+    ]
+    rows = get_utilization_report('office', date_to=today)
+    assert [(row['name'], row['terms'], row['booked']) for row in rows] == [(1000, 1, 1)]
+
+    response = client.get('/api/report/')
+    assert response.status_code == 302
+
+    staff = User.objects.create_user(username='staff', password='staff', is_staff=True)
+    client.force_login(user=staff)
+    response = client.get(f'/api/report/?date_from={today}')
+    assert response.status_code == 200
+    report = response.json()
+    assert [float(row['revenue']) for row in report['revenue']['doctor']] == [150, 100]
+    assert [row['utilization'] for row in report['utilization']['office']] == [1.0, 2 / 3]
+    response = client.get('/api/report/?date_from=2022-02-02&date_to=2022-01-01')
+    assert response.status_code == 400
+
+    response = client.get('/admin/report/')
+    assert response.status_code == 200
+    assert 'Revenue per specialization' in response.content.decode()
+
+    call_command('build_rollups', days=0, ahead=0, stdout=StringIO())
+    assert not DailyRevenue.objects.filter(date=today).exists()
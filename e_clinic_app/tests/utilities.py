@@ -1,8 +1,12 @@
+import itertools
 import random
 import datetime
+import threading
+from django.contrib.auth.models import User
+from django.db import connection
 from faker import Faker
 
-from e_clinic_app.models import Term, Office
+from e_clinic_app.models import Term, Office, Doctor, Patient, Specialization, Procedure, Visit
 
 fake = Faker("pl_PL")
 
@@ -11,6 +15,152 @@ def fake_phone_number():
     return fake.phone_number().replace(' ', '')
 
 
+def fake_doctor(specializations=(), procedures=()):
+    """Creates Doctor object (and related User object) with given specializations and procedures."""
+    user = User.objects.create(is_superuser=0, username=fake.unique.user_name(), email=fake.email(),
+                               last_name=fake.last_name(), first_name=fake.first_name())
+    doctor = Doctor.objects.create(user=user, pesel=fake.unique.pesel(),
+                                   pwz=fake.unique.pwz_doctor(), title_or_degree=random.randint(1, 5))
+    doctor.specializations.set(specializations)
+    doctor.procedures.set(procedures)
+    return doctor
+
+
+def fake_day_terms(doctor, date, office, count, visit_time=20):
+    """Creates count of consecutive terms (each visit_time minutes long) for doctor starting at 8:00."""
+    start = datetime.datetime.combine(date, datetime.time(8, 0))
+    terms = []
+    for n in range(count):
+        hour_from = start + datetime.timedelta(minutes=n * visit_time)
+        hour_to = hour_from + datetime.timedelta(minutes=visit_time)
+        terms.append(Term.objects.create(date=date, hour_from=hour_from.time(), hour_to=hour_to.time(),
+                                         office=office, doctor=doctor))
+    return terms
+
+
+def seed_terms(count, doctors, start_date, day_start=datetime.time(8, 0), visit_time=20, slots_per_day=24,
+               batch_size=10000):
+    """
+    Bulk creates count of terms for benchmarks. Every doctor gets his own office (numbered from 10000) and
+    consecutive slots from day_start, day after day (except Sundays) starting at start_date.
+    """
+    offices = [Office.objects.get_or_create(number=10000 + n)[0] for n in range(len(doctors))]
+    day_start = datetime.datetime.combine(start_date, day_start)
+    slots = [(day_start + datetime.timedelta(minutes=n * visit_time)).time() for n in range(slots_per_day + 1)]
+
+    def generate():
+        date = start_date
+        created = 0
+        while True:
+            if date.weekday() != 6:
+                for doctor, office in zip(doctors, offices):
+                    for n in range(slots_per_day):
+                        if created == count:
+                            return
+                        yield Term(date=date, hour_from=slots[n], hour_to=slots[n + 1], office=office, doctor=doctor)
+                        created += 1
+            date += datetime.timedelta(days=1)
+
+    terms = generate()
+    while True:
+        batch = list(itertools.islice(terms, batch_size))
+        if not batch:
+            break
+        Term.objects.bulk_create(batch, batch_size=batch_size)
+
+
+def seed_clinic(doctors, patients, terms, specializations=20, procedures=30, booked_ratio=0.3, batch_size=10000):
+    """
+    Bulk creates realistic volume of data for benchmarks: specializations, procedures, doctors (each with 1-3
+    specializations and 2-4 procedures), patients, terms (starting at monday of the current week, see seed_terms)
+    and visits booked on booked_ratio of terms. Returns dictionary with lists of created doctors and patients.
+    """
+    specializations = Specialization.objects.bulk_create(
+        [Specialization(name=f"{fake.unique.job()[:90]}") for _ in range(specializations)]
+    )
+    procedures = Procedure.objects.bulk_create(
+        [Procedure(name=f"{fake.unique.catch_phrase()[:60]}", price=round(random.uniform(50, 1000), 2))
+         for _ in range(procedures)]
+    )
+
+    def create_users(count):
+        return User.objects.bulk_create([
+            User(username=fake.unique.user_name(), email=fake.email(), first_name=fake.first_name(),
+                 last_name=fake.last_name(), password='!') for _ in range(count)
+        ], batch_size=batch_size)
+
+    doctors = Doctor.objects.bulk_create([
+        Doctor(user=user, pesel=fake.unique.pesel(), pwz=fake.unique.pwz_doctor(), title_or_degree=random.randint(1, 5))
+        for user in create_users(doctors)
+    ], batch_size=batch_size)
+    Doctor.specializations.through.objects.bulk_create([
+        Doctor.specializations.through(doctor=doctor, specialization=specialization)
+        for doctor in doctors for specialization in random.sample(specializations, random.randint(1, 3))
+    ], batch_size=batch_size)
+    Doctor.procedures.through.objects.bulk_create([
+        Doctor.procedures.through(doctor=doctor, procedure=procedure)
+        for doctor in doctors for procedure in random.sample(procedures, random.randint(2, 4))
+    ], batch_size=batch_size)
+
+    patients = Patient.objects.bulk_create([
+        Patient(user=user, pesel=fake.unique.pesel(), identification_type=random.randint(1, 2),
+                phone_number=fake.unique.numerify('48#########'))
+        for user in create_users(patients)
+    ], batch_size=batch_size)
+
+    today = datetime.date.today()
+    seed_terms(terms, doctors, today - datetime.timedelta(days=today.weekday()), batch_size=batch_size)
+
+    booked_terms = Term.objects.values_list('id', 'doctor_id').iterator(chunk_size=batch_size)
+    visits = (
+        Visit(date_id=term_id, doctor_id=doctor_id, patient=random.choice(patients), procedure=random.choice(procedures))
+        for term_id, doctor_id in booked_terms if random.random() < booked_ratio
+    )
+    while True:
+        batch = list(itertools.islice(visits, batch_size))
+        if not batch:
+            break
+        Visit.objects.bulk_create(batch, batch_size=batch_size)
+
+    return {'doctors': doctors, 'patients': patients}
+
+
+def run_concurrently(function, arguments):
+    """
+    Calls function with every argument in a separate thread, all started at the same moment. Returns list of results
+    (or raised exceptions) in order of arguments. Every thread closes its own database connection.
+    """
+    barrier = threading.Barrier(len(arguments))
+    results = [None] * len(arguments)
+
+    def worker(index, argument):
+        barrier.wait()
+        try:
+            results[index] = function(argument)
+        except Exception as error:
+            results[index] = error
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(index, argument)) for index, argument in enumerate(arguments)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def explain(queryset):
+    """
+    Returns query plan of queryset. On PostgreSQL sequential scans are disabled (for the current transaction),
+    because planner would prefer them on tables as small as test ones, even if a matching index exists.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+    return queryset.explain()
+
+
 def fake_term(doctor, multiple=False):
 
     """
@@ -1,12 +1,57 @@
 import datetime
-import re
 
+import numpy as np
 from django.core.exceptions import ValidationError
 
 default_error_messages = {
     'invalid': 'National Identification Number consists of 11 digits.',
     'checksum': 'Wrong checksum for the National Identification Number.',
 }
+pwz_error_messages = {
+    'invalid': "PWZ number must contain 7 digits!",
+    'checksum': "Invalid number!",
+}
+phone_error_messages = {
+    'invalid': "Phone number must be entered in the format: '+999999999'. Up to 11 digits allowed.",
+}
+
+PESEL_WEIGHTS = np.array([1, 3, 7, 9, 1, 3, 7, 9, 1, 3, 1])
+PWZ_WEIGHTS = np.array([1, 2, 3, 4, 5, 6])
+PHONE_MAX_LENGTH = 13
+
+
+def to_code_points(values, width):
+    """
+    Converts values (strings or integers) into (n, width + 1) matrix of unicode code points, shorter values are padded
+    with zeros. The extra column is non-zero only for values longer than width.
+    """
+    strings = np.asarray(values, dtype=f'U{width + 1}')
+    return strings.view(np.int32).reshape(len(strings), width + 1)
+
+
+def to_digits(values, length):
+    """
+    Converts values into (n, length) matrix of digits and boolean array which is True for values consisting of
+    exactly length digits. Digits of other values are undefined.
+    """
+    code_points = to_code_points(values, length)
+    digits = code_points[:, :length] - ord('0')
+    is_number = ((digits >= 0) & (digits <= 9)).all(axis=1) & (code_points[:, length] == 0)
+    return digits, is_number
+
+
+def get_error_codes(*checks):
+    """
+    Returns array of error codes: for every row code of the first failed check ('' if all passed). Checks are
+    (code, boolean array which is True for valid rows) tuples.
+    """
+    return np.select([~valid for _, valid in checks], [code for code, _ in checks], '')
+
+
+def raise_error(code, error_messages):
+    """Raises ValidationError with the message of error code (if any) returned by the batch validator."""
+    if code:
+        raise ValidationError(error_messages[code], code=str(code))
 
 
 def person_name_validator(name):
@@ -21,22 +66,45 @@ def person_name_validator(name):
     return name
 
 
+def validate_pwz_numbers(numbers):
+    """
+    Batch version of pwz_validator: returns array of error codes ('invalid', 'checksum' or '' for valid numbers),
+    one for every number. All checksums are computed at once with NumPy arithmetic.
+    """
+    digits, is_number = to_digits(numbers, 7)
+    return get_error_codes(
+        ('invalid', is_number & (digits[:, 0] != 0)),
+        ('checksum', digits[:, 1:] @ PWZ_WEIGHTS % 11 == digits[:, 0]),
+    )
+
+
 def pwz_validator(pwz_number):
     """Checks if pwz number contains 7 digits and has valid checksum"""
-    pwz_number = str(pwz_number)
-    if not len(pwz_number):
-        raise ValidationError("PWZ number must contain 7 digits!")
-    if pwz_number.startswith("0"):
-        raise ValidationError("PWZ number must contain 7 digits!")
-    if sum(ratio * int(digit) for ratio, digit in zip(range(1, 7), pwz_number[1:])) % 11 != int(pwz_number[0]):
-        raise ValidationError("Invalid number!")
+    raise_error(validate_pwz_numbers([pwz_number])[0], pwz_error_messages)
     return int(pwz_number)
 
 
+def validate_phone_numbers(phone_numbers):
+    """
+    Batch version of phone_regex_validator: returns array of error codes ('invalid' or '' for valid numbers), one for
+    every number. Valid number is optional "+" followed by 9 to 11 digits (or by "1" and 11 digits).
+    """
+    code_points = to_code_points(phone_numbers, PHONE_MAX_LENGTH)
+    rows = np.arange(len(code_points))
+    has_plus = (code_points[:, 0] == ord('+')).astype(np.int64)
+    is_digit = (code_points >= ord('0')) & (code_points <= ord('9'))
+    digits_count = is_digit.sum(axis=1)
+    first_digit = code_points[rows, has_plus]
+    return get_error_codes((
+        'invalid',
+        ((code_points != 0).sum(axis=1) == digits_count + has_plus)
+        & (((digits_count >= 9) & (digits_count <= 11)) | ((digits_count == 12) & (first_digit == ord('1')))),
+    ))
+
+
 def phone_regex_validator(phone_number):
     """Checks if phone number is propper formated"""
-    if not re.fullmatch(r'^\+?1?\d{9,11}$', phone_number):
-        raise ValidationError("Phone number must be entered in the format: '+999999999'. Up to 11 digits allowed.")
+    raise_error(validate_phone_numbers([phone_number])[0], phone_error_messages)
     return phone_number
 
 
@@ -49,17 +117,21 @@ def has_valid_checksum(number):
     return result % 10 == 0
 
 
+def validate_pesels(numbers):
+    """
+    Batch version of pesel_validator: returns array of error codes ('invalid', 'checksum' or '' for valid numbers),
+    one for every number. All checksums are computed at once with NumPy arithmetic.
+    """
+    digits, is_number = to_digits(numbers, 11)
+    return get_error_codes(
+        ('invalid', is_number),
+        ('checksum', digits @ PESEL_WEIGHTS % 10 == 0),
+    )
+
+
 def pesel_validator(number):
     """Check if pesell contains 11 digits and has valid checksum"""
-    try:
-        number = str(number)
-    except TypeError:
-        raise ValidationError(default_error_messages['invalid'], code='invalid')
-    if not re.match(r'^\d{11}$', number):
-        print('123')
-        raise ValidationError(default_error_messages['invalid'], code='invalid')
-    if not has_valid_checksum(str(number)):
-        raise ValidationError(default_error_messages['checksum'], code='checksum')
+    raise_error(validate_pesels([number])[0], default_error_messages)
     return int(number)
 
 
@@ -1,14 +1,23 @@
+import asyncio
 import datetime
 
-from django.contrib import messages
+from django.conf import settings
+from django.contrib import admin, messages
 from django.contrib.auth import login, logout
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.models import User
-from django.contrib.auth.views import PasswordChangeView
+from django.contrib.auth.views import PasswordChangeView, redirect_to_login
 from django.contrib.messages.views import SuccessMessageMixin
-from django.http import Http404
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
+from django.utils.functional import SimpleLazyObject
+from django.utils.cache import get_conditional_response, patch_cache_control, set_response_etag
+from django.views.decorators.http import condition
 
 from . import forms
 from django.shortcuts import render, get_object_or_404, redirect
@@ -16,9 +25,26 @@ from django.views import View
 from django.views.generic import ListView, DetailView, DeleteView
 
 from .functions.specializations_list_display_functions import prepare_table_rows
+from .functions.async_functions import database_sync_to_async
+from .functions.cache_functions import (
+    catalog_etag, catalog_last_modified, get_catalog_version, get_specializations, get_week_schedule,
+    get_week_schedule_stats
+)
+from .functions.export_functions import EXPORT_FORMATS, export_visits
+from .functions.pagination_functions import keyset_page
+from .functions.password_functions import hash_password
+from .functions.report_functions import get_report
+from .functions.role_functions import resolve_role
+from .functions.schedule_functions import build_week_schedule, week_schedule_to_columns
+from .middleware import request_stats
+from .functions.term_functions import create_terms, find_earliest_free_term, get_dates_between
+from .functions.visit_functions import book_visit
 from .models import Specialization, Doctor, Procedure, Visit, Patient, Term
-from .functions.datetime_functions import get_week_start_and_end, get_weekdays_names
-from .forms import RegisterFormUser, RegisterFormPatient, TermAddForm, MultipleTermAddForm, EditFormUser
+from .functions.datetime_functions import get_week_dates, get_weekdays_names
+from .forms import (
+    RegisterFormUser, RegisterFormPatient, TermAddForm, MultipleTermAddForm, EditFormUser, FreeTermSearchForm,
+    VisitExportForm, DateRangeForm
+)
 
 
 class LandingPage(View):
@@ -28,15 +54,39 @@ class LandingPage(View):
         return render(request, 'index.html')
 
 
-class SpecializationList(ListView):
+class CatalogCacheMixin:
+    """
+    Mixin of public catalog views. It adds catalog version to context (it's a part of key of cached template
+    fragments, so templates don't query database until catalog changes) and supports conditional GET
+    (ETag and Last-Modified headers). Pages with pending flash messages are always rendered, as validators don't
+    cover messages.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if len(messages.get_messages(request)):
+            return super().dispatch(request, *args, **kwargs)
+        return self.conditional_dispatch(request, *args, **kwargs)
+
+    @method_decorator(condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified))
+    def conditional_dispatch(self, request, *args, **kwargs):
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['catalog_version'] = get_catalog_version()
+        context['catalog_cache_timeout'] = getattr(settings, 'CATALOG_CACHE_TIMEOUT', None)
+        return context
+
+
+class SpecializationList(CatalogCacheMixin, ListView):
     """List (in form of matrix) of specialization with urls which leads to views which contain details about itself."""
     model = Specialization
     template_name = 'specialization_list.html'
 
     def get_context_data(self, **kwargs):
-        """Method transform queryset into list of lists (matrix)"""
+        """Method transform queryset into list of lists (matrix). Matrix is evaluated only if template needs it."""
         context = super().get_context_data(**kwargs)
-        context['specializations_matrix'] = prepare_table_rows(self.object_list, col=4)
+        context['specializations_matrix'] = SimpleLazyObject(lambda: prepare_table_rows(self.object_list, col=4))
         return context
 
 
@@ -49,60 +99,119 @@ class SpecializationDetails(DetailView):
     model = Specialization
     template_name = 'specialization_detail.html'
 
-    def generate_terms(self, offset):
-        """Method generate weekdays dates based on week offset (for example next week => 1, 2 weeks after => 2 etc.)"""
-        start, end = get_week_start_and_end(offset)
-        return [start + datetime.timedelta(days=n) for n in range(0, (end - start).days + 1)]
-
-    def get_context_data(self, **kwargs):
+    def get_schedule_context(self, specialization, week=None):
         """
-        Method take week offset as integer argument to get terms of specialization's doctors for the selected week.
+        Method take week offset (value of 'week' url parameter) to get terms of specialization's doctors for
+        the selected week.
         """
-        context = super().get_context_data(**kwargs)
-        spec_doctors = self.object.doctor_set.all().order_by('user__last_name').order_by('user__first_name')
-
-        week_offset = 0 if self.request.GET.get('week') is None else int(self.request.GET.get('week'))
-        context['offset'] = 0 if week_offset <= 0 else week_offset
-        context['is_offset'] = context.get('offset') > 0
-
-        dates_in_offset_week = self.generate_terms(context.get('offset'))
-        week_terms = {}
-        for spec_doctor in spec_doctors:
-            temp = []
-            for date in dates_in_offset_week:
-                temp.append(spec_doctor.term_set.filter(date=date).order_by('date'))
-            week_terms[spec_doctor] = temp
-
-        context['doctor_week_terms'] = week_terms
-        context['weekdays'] = get_weekdays_names(dates_in_offset_week)
+        spec_doctors = specialization.doctor_set.select_related('user').order_by('user__last_name', 'user__first_name')
+        week_offset = 0 if week is None else int(week)
+        offset = 0 if week_offset <= 0 else week_offset
+
+        dates_in_offset_week = get_week_dates(offset)
+        return {
+            'offset': offset,
+            'is_offset': offset > 0,
+            'doctor_week_terms': get_week_schedule(specialization, spec_doctors, dates_in_offset_week),
+            'weekdays': get_weekdays_names(dates_in_offset_week),
+        }
 
+    def get_context_data(self, **kwargs):
+        """Method adds schedule of the week selected by 'week' url parameter to context."""
+        context = super().get_context_data(**kwargs)
+        context.update(self.get_schedule_context(self.object, self.request.GET.get('week')))
         return context
 
 
-class ProcedureList(ListView):
+class ProcedureList(CatalogCacheMixin, ListView):
     """List (in form of matrix) of procedures with urls which leads to views which contain details about itself."""
     model = Procedure
     template_name = 'procedure_list.html'
 
     def get_context_data(self, **kwargs):
-        """Method transform queryset into list of lists (matrix)."""
+        """Method transform queryset into list of lists (matrix). Matrix is evaluated only if template needs it."""
         context = super().get_context_data(**kwargs)
-        context['procedures_matrix'] = prepare_table_rows(self.object_list, col=4)
+        context['procedures_matrix'] = SimpleLazyObject(lambda: prepare_table_rows(self.object_list, col=4))
         return context
 
 
-class ProcedureDetails(DetailView):
+class ProcedureDetails(CatalogCacheMixin, DetailView):
     """List of procedure's details f.e. price, performed by doctors..."""
     model = Procedure
     template_name = 'procedure_detail.html'
 
+    def get_context_data(self, **kwargs):
+        """Method adds doctors performing the procedure, loaded together with their users."""
+        context = super().get_context_data(**kwargs)
+        context['doctors'] = self.object.doctor_set.select_related('user').order_by(
+            'user__last_name', 'user__first_name'
+        )
+        return context
+
 
-class DoctorDetails(DetailView):
+class DoctorDetails(CatalogCacheMixin, DetailView):
     """List of doctor's details f.e. specializations, pwz number..."""
-    model = Doctor
+    queryset = Doctor.objects.select_related('user')
     template_name = 'doctor_detail.html'
 
 
+class FreeTermSearch(View):
+    """
+    View finds the earliest free term of doctors matching selected specialization, procedure, doctor and date range,
+    so patients don't have to browse schedules week by week.
+    """
+
+    def get(self, request):
+        """Method searches for the term only if any filter was submitted (form is sent with GET method)."""
+        form = FreeTermSearchForm(request.GET or None)
+        term = None
+        if form.is_bound and form.is_valid():
+            term = find_earliest_free_term(**form.cleaned_data)
+        return render(request, 'free_term_search.html', {'form': form, 'term': term})
+
+
+class VisitExport(UserPassesTestMixin, View):
+    """
+    View streams visits (archived and current ones) matching filters as CSV or JSONL file for staff members (f.e.
+    finance reports). File is generated while it's sent, so memory use doesn't depend on number of visits.
+    """
+
+    def test_func(self):
+        """Method checks if logged-in user is staff member."""
+        return self.request.user.is_staff
+
+    def get(self, request):
+        """Method returns errors of filters (status 400) or streaming response with the file."""
+        form = VisitExportForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+
+        filters = form.cleaned_data
+        file_format = filters.pop('format')
+        response = StreamingHttpResponse(export_visits(file_format, **filters),
+                                         content_type=EXPORT_FORMATS[file_format])
+        response['Content-Disposition'] = f'attachment; filename="visits.{file_format}"'
+        return response
+
+
+class ReportApi(UserPassesTestMixin, View):
+    """
+    JSON view with revenue (per month and doctor, procedure or specialization) and utilization of terms (per doctor
+    and office) for staff members. Report is computed from daily rollups (see "build_rollups" management command).
+    """
+
+    def test_func(self):
+        """Method checks if logged-in user is staff member."""
+        return self.request.user.is_staff
+
+    def get(self, request):
+        """Method returns errors of date range (status 400) or the report."""
+        form = DateRangeForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        return JsonResponse(get_report(**form.cleaned_data))
+
+
 class VisitAdd(UserPassesTestMixin, View):
     """
     View allows to make an appointment by a logged-in patient, based on term she/he selected (displayed as url)
@@ -112,8 +221,7 @@ class VisitAdd(UserPassesTestMixin, View):
 
     def test_func(self):
         """Method checks if logged-in user is patient."""
-        user = self.request.user
-        return getattr(user, 'patient', False)
+        return self.request.role == 'patient'
 
     def get(self, request, doc_id, date, hour):
         """Method gets data from url parameters. Rendered form ask only for procedure choice."""
@@ -130,7 +238,7 @@ class VisitAdd(UserPassesTestMixin, View):
         return render(request, 'visit_add.html', {'form': form, 'doctor': doctor, 'date': date, 'patient': patient})
 
     def post(self, request, doc_id, date, hour):
-        """Method creates Visit object."""
+        """Method creates Visit object. If the term was taken in the meantime, form is rendered with an error."""
         user = request.user
         patient = get_object_or_404(Patient, user=user)
         doctor = get_object_or_404(Doctor, id=doc_id)
@@ -141,12 +249,17 @@ class VisitAdd(UserPassesTestMixin, View):
             data = form.cleaned_data
             procedure = data.get('procedure')
 
-            Visit.objects.create(patient=patient, doctor=doctor, date=date, procedure=procedure)
+            try:
+                book_visit(patient, doctor, date, procedure)
+            except ValidationError as error:
+                form.add_error(None, error)
+                context = {'form': form, 'doctor': doctor, 'date': date, 'patient': patient}
+                return render(request, 'visit_add.html', context, status=409)
 
             messages.success(request, "Appointment was made successfully.")
             return redirect('user-visits')
 
-        return render(request, 'visit_add.html', {'form': form})
+        return render(request, 'visit_add.html', {'form': form, 'doctor': doctor, 'date': date, 'patient': patient})
 
 
 class SignUpView(UserPassesTestMixin, View):
@@ -166,7 +279,10 @@ class SignUpView(UserPassesTestMixin, View):
         return render(request, "registration/signup.html", {'form_user': form_user, 'form_patient': form_patient})
 
     def post(self, request):
-        """Method creates both User and Patient object. Both related to each other."""
+        """
+        Method creates both User and Patient object. Both related to each other. User is created with a single insert,
+        with password hashed in advance.
+        """
         form_user = forms.RegisterFormUser(request.POST)
         form_patient = forms.RegisterFormPatient(request.POST)
 
@@ -184,18 +300,18 @@ class SignUpView(UserPassesTestMixin, View):
                 identification_type = data.get('identification_type')
                 phone_number = data.get('phone_number')
 
-                user = User.objects.create(
-                    is_superuser=0, username=username, email=email,
-                    last_name=last_name, first_name=first_name
-                )
-                user.set_password(password)
-                user.save()
-
-                Patient.objects.create(
-                    user=user, pesel=pesel,
-                    identification_type=identification_type,
-                    phone_number=phone_number
-                )
+                # Password is hashed before the transaction, in the pool of hashing processes
+                password_hash = hash_password(password)
+                with transaction.atomic():
+                    user = User.objects.create(
+                        is_superuser=0, username=username, email=email,
+                        last_name=last_name, first_name=first_name, password=password_hash
+                    )
+                    Patient.objects.create(
+                        user=user, pesel=pesel,
+                        identification_type=identification_type,
+                        phone_number=phone_number
+                    )
 
                 messages.success(request, "Thank you for joining. Now you can log in.")
                 return redirect('login-page')
@@ -210,8 +326,8 @@ class EditUserView(UserPassesTestMixin, View):
     """
 
     def test_func(self):
-        user = self.request.user
-        return getattr(user, 'patient', False)
+        """Method checks if logged-in user is patient (profile is checked too, in case it was deleted meanwhile)."""
+        return self.request.role == 'patient' and bool(self.request.profile)
 
     def handle_no_permission(self):
         """Method redirects to main page if user is not a patient"""
@@ -265,28 +381,76 @@ class EditUserView(UserPassesTestMixin, View):
 
 
 class UserVisits(LoginRequiredMixin, ListView):
-    """View alows both logged-in patient and doctors to see their planned visit"""
+    """
+    View alows both logged-in patient and doctors to see their visits, split into upcoming and past ones. Both lists
+    are paginated with keyset pagination (cursors are passed in 'upcoming' and 'past' url parameters).
+    """
     model = Visit
     template_name = 'patient_visits.html'
     login_url = reverse_lazy('login-page')
+    page_size = 20
+    order_fields = ['date__date', 'date__hour_from', 'id']
 
     def get_queryset(self):
         """
         Method allows to display appropriate set of views:
         - for patient, their own visits
         -for doctors, their patients visits
+        Visits are loaded together with their terms, doctors and patients.
         """
-        user = self.request.user
+        role, profile_id = resolve_role(self.request)
+        visits = Visit.objects.select_related('date', 'doctor__user', 'patient__user').order_by(*self.order_fields)
+
+        if role == 'patient':
+            return visits.filter(patient_id=profile_id)
+
+        elif role == 'doctor':
+            return visits.filter(doctor_id=profile_id)
+
+        return visits.none()
+
+    def get_page_url(self, param, cursor=None):
+        """Method builds url parameters of the page (first page if cursor is None), keeping cursor of the other list."""
+        params = self.request.GET.copy()
+        if cursor:
+            params[param] = cursor
+        else:
+            params.pop(param, None)
+        return f"?{params.urlencode()}"
+
+    def get_sections(self):
+        """Method returns name, filter condition and order (descending or not) of upcoming and past visits."""
+        now = datetime.datetime.now()
+        is_upcoming = Q(date__date__gt=now.date()) | Q(date__date=now.date(), date__hour_from__gte=now.time())
+        return [('upcoming', is_upcoming, False), ('past', ~is_upcoming, True)]
+
+    def get_section_context(self, name, condition, descending):
+        """Method returns page of visits of the section (selected by cursor from url) and urls of other pages."""
+        visits, next_cursor = keyset_page(
+            self.object_list.filter(condition), self.order_fields, self.request.GET.get(name),
+            size=self.page_size, descending=descending
+        )
+        return {
+            f'{name}_visits': visits,
+            f'{name}_next_url': self.get_page_url(name, next_cursor) if next_cursor else None,
+            f'{name}_first_url': self.get_page_url(name) if self.request.GET.get(name) else None,
+        }
 
-        if getattr(user, 'patient', False):
-            patient = get_object_or_404(Patient, user=self.request.user)
-            visits = Visit.objects.filter(patient=patient)
-            return visits
+    def get_context_data(self, **kwargs):
+        """Method adds pages of upcoming (ascending) and past (descending) visits to context."""
+        context = super().get_context_data(**kwargs)
+        for section in self.get_sections():
+            context.update(self.get_section_context(*section))
+        context['visit_sections'] = self.get_visit_sections(context)
+        return context
 
-        elif getattr(user, 'doctor', False):
-            doctor = get_object_or_404(Doctor, user=self.request.user)
-            visits = Visit.objects.filter(doctor=doctor)
-            return visits
+    @staticmethod
+    def get_visit_sections(context):
+        """Method returns title, visits and urls of pages of every section, in order of display."""
+        return [
+            (title, context[f'{name}_visits'], context[f'{name}_first_url'], context[f'{name}_next_url'])
+            for name, title in (('upcoming', "Upcoming visits"), ('past', "Past visits"))
+        ]
 
 
 class VisitDetails(LoginRequiredMixin, DetailView):
@@ -316,8 +480,7 @@ class TermAdd(UserPassesTestMixin, View):
 
     def test_func(self):
         """Method checks if logged-in usser is doctor."""
-        user = self.request.user
-        return getattr(user, 'doctor', False)
+        return self.request.role == 'doctor'
 
     def get(self, request):
         """Method renders Add Term Form."""
@@ -336,9 +499,15 @@ class TermAdd(UserPassesTestMixin, View):
             hour_to = data.get('hour_to')
             office = data.get('office')
 
-            Term.objects.create(date=date, hour_from=hour_from, hour_to=hour_to, office=office, doctor=doctor)
+            try:
+                with transaction.atomic():
+                    Term.objects.create(date=date, hour_from=hour_from, hour_to=hour_to, office=office, doctor=doctor)
+            except IntegrityError:
+                form.add_error(None, "Office was occupied in the meantime, please try again.")
+                return render(request, 'term_add.html', {'form': form})
+
             messages.success(request, "Term was added successfully.")
-            return redirect('specialization-detail', pk=doctor.specializations.all().first().id)
+            return redirect(doctor.get_schedule_url())
 
         return render(request, 'term_add.html', {'form': form})
 
@@ -352,12 +521,11 @@ class TermCancel(SuccessMessageMixin, UserPassesTestMixin, DeleteView):
 
     def test_func(self):
         """Method checks if logged-in usser is doctor."""
-        user = self.request.user
-        return getattr(user, 'doctor', False)
+        return self.request.role == 'doctor'
 
     def get_success_url(self):
         """Method redirects to doctor's specialization detail ciew after successfully deleting of term."""
-        return reverse_lazy('specialization-detail', kwargs={'pk': self.object.doctor.specializations.first().id})
+        return self.object.doctor.get_schedule_url()
 
     def delete(self, request, *args, **kwargs):
         """Method enables to show succes message after deleting object"""
@@ -374,8 +542,7 @@ class MultipleTermAdd(UserPassesTestMixin, View):
 
     def test_func(self):
         """Method checks if logged-in usser is doctor."""
-        user = self.request.user
-        return getattr(user, 'doctor', False)
+        return self.request.role == 'doctor'
 
     def get(self, request):
         """Method renders form which is extension of TermAddForm and has an additional field "visit time"."""
@@ -383,31 +550,23 @@ class MultipleTermAdd(UserPassesTestMixin, View):
         return render(request, 'multiple_term_add.html', {'form': form})
 
     def post(self, request):
-        """Methods create multiple Term object basing on doctor's day work hours and visit time length"""
+        """
+        Methods create multiple Term object basing on doctor's day work hours and visit time length. All slots are
+        validated by the form and inserted at once.
+        """
         doctor = get_object_or_404(Doctor, user=request.user)
         form = MultipleTermAddForm(request.POST, user=request.user)
 
         if form.is_valid():
-            data = form.cleaned_data
-            date = data.get('date')
-            hour_from = data.get('hour_from')
-            hour_to = data.get('hour_to')
-            office = data.get('office')
-            visit_time = int(data.get('visit_time'))
-
-            day_hour_to = datetime.datetime.combine(date.today(), hour_to)
-            day_hour_from = datetime.datetime.combine(date.today(), hour_from)
-            minutes = (day_hour_to - day_hour_from).total_seconds() / 60.0
-
-            for _ in range(int(minutes / visit_time)):
-                final_time = day_hour_from + datetime.timedelta(minutes=visit_time)
-                Term.objects.create(
-                    date=date, hour_from=day_hour_from.time(), hour_to=final_time.time(), office=office, doctor=doctor
-                )
-                day_hour_from = final_time
+            office = form.cleaned_data.get('office')
+            try:
+                create_terms(form.slots, doctor, office)
+            except IntegrityError:
+                form.add_error(None, "Office was occupied in the meantime, please try again.")
+                return render(request, 'multiple_term_add.html', {'form': form})
 
             messages.success(request, "Terms was added successfully.")
-            return redirect('specialization-detail', pk=doctor.specializations.all().first().id)
+            return redirect(doctor.get_schedule_url())
 
         return render(request, 'multiple_term_add.html', {'form': form})
 
@@ -423,3 +582,184 @@ class CustomPasswordChangeView(SuccessMessageMixin, LoginRequiredMixin, Password
         """Method forces loggin-out users accaouts and redirects to log-in View"""
         logout(self.request)
         return reverse_lazy('login-page')
+
+
+class RequestStats(View):
+    """
+    Admin page with stats of the last requests grouped by url name (see RequestStatsMiddleware). Access is checked
+    by admin_view wrapper in urls.
+    """
+
+    def get(self, request):
+        context = {
+            **admin.site.each_context(request),
+            'title': "Request stats",
+            'stats': request_stats.summary(),
+            'window': request_stats.records.maxlen,
+            'week_schedule_cache': get_week_schedule_stats(),
+        }
+        return render(request, 'admin/request_stats.html', context)
+
+
+class Report(View):
+    """
+    Admin page with revenue and utilization report for optional date range (see ReportApi). Access is checked
+    by admin_view wrapper in urls.
+    """
+
+    def get(self, request):
+        form = DateRangeForm(request.GET)
+        context = {
+            **admin.site.each_context(request),
+            'title': "Revenue and utilization report",
+            'form': form,
+            'report': get_report(**form.cleaned_data) if form.is_valid() else None,
+        }
+        return render(request, 'admin/report.html', context)
+
+
+def conditional_json_response(request, data):
+    """
+    Returns JSON response which can be cached by clients and proxies for AVAILABILITY_API_MAX_AGE seconds. ETag is
+    computed from content and conditional requests are answered with 304 (Not Modified).
+    """
+    response = JsonResponse(data)
+    patch_cache_control(response, max_age=getattr(settings, 'AVAILABILITY_API_MAX_AGE', 0))
+    set_response_etag(response)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
+class AvailabilityApiMixin:
+    """
+    Mixin of read-only JSON views with availability of terms. Responses don't depend on user, so they can be cached
+    (see conditional_json_response). Parameters are validated by get_params and data are returned by get_data, so
+    async views can reuse them.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except ValidationError as error:
+            return JsonResponse({'error': error.messages}, status=400)
+
+    def get(self, request, pk):
+        return conditional_json_response(request, self.get_data(pk, **self.get_params(request)))
+
+
+class SpecializationAvailability(AvailabilityApiMixin, View):
+    """Terms of specialization's doctors in the week selected by "week" parameter (week offset, 0 by default)."""
+
+    def get_params(self, request):
+        try:
+            return {'week_offset': max(int(request.GET.get('week', 0)), 0)}
+        except ValueError:
+            raise ValidationError("Week must be an integer!")
+
+    def get_data(self, pk, week_offset):
+        specialization = get_object_or_404(Specialization, pk=pk)
+        doctors = specialization.doctor_set.select_related('user').order_by('user__last_name', 'user__first_name')
+        dates = get_week_dates(week_offset)
+        data = week_schedule_to_columns(get_week_schedule(specialization, doctors, dates), dates)
+        return {'specialization': specialization.id, 'week': week_offset, **data}
+
+
+class DoctorAvailability(AvailabilityApiMixin, View):
+    """
+    Terms of doctor between "from" and "to" dates (ISO format, both included, Sundays skipped). By default it returns
+    terms of the next 7 days, the range can't be longer than MAX_DAYS.
+    """
+    MAX_DAYS = 62
+
+    def get_params(self, request):
+        try:
+            date_from = datetime.date.fromisoformat(request.GET.get('from', datetime.date.today().isoformat()))
+            date_to = datetime.date.fromisoformat(
+                request.GET.get('to', (date_from + datetime.timedelta(days=6)).isoformat())
+            )
+        except ValueError:
+            raise ValidationError("Dates must be in YYYY-MM-DD format!")
+        if date_to < date_from:
+            raise ValidationError("End date must be after start date!")
+        if (date_to - date_from).days >= self.MAX_DAYS:
+            raise ValidationError(f"Date range can't be longer than {self.MAX_DAYS} days!")
+        return {'date_from': date_from, 'date_to': date_to}
+
+    def get_data(self, pk, date_from, date_to):
+        doctor = get_object_or_404(Doctor.objects.select_related('user'), pk=pk)
+        dates = get_dates_between(date_from, date_to)
+        data = week_schedule_to_columns(build_week_schedule([doctor], dates), dates)
+        return {'doctor': doctor.id, **data}
+
+
+# Async (ASGI) versions of read-heavy views. They reuse methods of class-based views above, but independent queries
+# run concurrently in worker threads (see database_sync_to_async), so requests don't block a thread while waiting.
+# Django 4.0 has neither async ORM nor async class-based views, so they are function views.
+
+async def resolve_user(request):
+    """
+    Loads user and role of the request (session and user queries) in worker thread, so they can be used in async code.
+    """
+    def load_user():
+        resolve_role(request)
+        return request.user
+
+    return await database_sync_to_async(load_user)()
+
+
+async def async_specialization_details(request, pk):
+    """Async version of SpecializationDetails. Specialization, schedule, user and navbar are loaded concurrently."""
+    view = SpecializationDetails()
+    view.setup(request, pk=pk)
+    specialization, schedule_context, _, specializations = await asyncio.gather(
+        database_sync_to_async(get_object_or_404)(Specialization, pk=pk),
+        database_sync_to_async(view.get_schedule_context)(Specialization(pk=pk), request.GET.get('week')),
+        resolve_user(request),
+        database_sync_to_async(get_specializations)(),
+    )
+    context = {
+        'object': specialization, 'specialization': specialization, 'view': view,
+        'specializations_ctxp': specializations, **schedule_context,
+    }
+    return await database_sync_to_async(render)(request, view.template_name, context)
+
+
+async def async_user_visits(request):
+    """Async version of UserVisits. Pages of upcoming and past visits are loaded concurrently."""
+    user = await resolve_user(request)
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path(), UserVisits.login_url)
+
+    view = UserVisits()
+    view.setup(request)
+    view.object_list, specializations = await asyncio.gather(
+        database_sync_to_async(view.get_queryset)(),
+        database_sync_to_async(get_specializations)(),
+    )
+    sections = await asyncio.gather(*(
+        database_sync_to_async(view.get_section_context)(*section) for section in view.get_sections()
+    ))
+    context = {'view': view, 'specializations_ctxp': specializations}
+    for section_context in sections:
+        context.update(section_context)
+    context['visit_sections'] = view.get_visit_sections(context)
+    return await database_sync_to_async(render)(request, view.template_name, context)
+
+
+async def async_availability(view, request, pk):
+    """Returns response of availability API view (SpecializationAvailability or DoctorAvailability) asynchronously."""
+    try:
+        params = view.get_params(request)
+    except ValidationError as error:
+        return JsonResponse({'error': error.messages}, status=400)
+    data = await database_sync_to_async(view.get_data)(pk, **params)
+    return conditional_json_response(request, data)
+
+
+async def async_specialization_availability(request, pk):
+    """Async version of SpecializationAvailability."""
+    return await async_availability(SpecializationAvailability(), request, pk)
+
+
+async def async_doctor_availability(request, pk):
+    """Async version of DoctorAvailability."""
+    return await async_availability(DoctorAvailability(), request, pk)